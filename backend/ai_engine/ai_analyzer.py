@@ -1,7 +1,4 @@
 import numpy as np
-import tensorflow as tf
-from transformers import pipeline, AutoTokenizer, AutoModel
-import torch
 from typing import Dict, List, Any, Tuple
 import json
 import asyncio
@@ -9,172 +6,177 @@ from datetime import datetime, timedelta
 from django.conf import settings
 import logging
 
+from ai_engine.model_loader import get_model
+from perfmaster.anomaly import baseline_scores
+
 logger = logging.getLogger(__name__)
 
+# (metrics key, scale) for each column of the core metrics matrix
+CORE_METRICS = (
+    ('lcp', 1 / 1000),  # Normalize to seconds
+    ('fid', 1 / 100),   # Normalize FID
+    ('cls', 100),       # Scale CLS
+    ('fcp', 1 / 1000),  # Normalize to seconds
+    ('ttfb', 1 / 1000), # Normalize to seconds
+    ('memory_usage', 1 / (1024 * 1024)),  # Convert to MB
+    ('cpu_usage', 1 / 100),  # Normalize percentage
+    ('bundle_size', 1 / (1024 * 1024)),  # Convert to MB
+    ('render_time', 1 / 1000),  # Normalize to seconds
+    ('network_requests', 1 / 100)  # Normalize request count
+)
+CORE_METRIC_SCALES = np.array([scale for _, scale in CORE_METRICS], dtype=np.float32)
+
+# Output columns of the optimization model
+OPTIMIZATION_CATEGORIES = [
+    'code_splitting', 'image_optimization', 'caching_strategy',
+    'bundle_optimization', 'lazy_loading', 'cdn_implementation',
+    'database_optimization', 'api_optimization', 'memory_management',
+    'render_optimization'
+]
+# Weight of the first core metrics in the performance score, by importance
+SCORE_WEIGHTS = np.array([0.25, 0.20, 0.15, 0.15, 0.10, 0.05, 0.05, 0.03, 0.02])
+
 class PerformanceAIAnalyzer:
-    def __init__(self):
-        self.performance_model = None
-        self.code_analyzer = None
-        self.anomaly_detector = None
-        self.optimization_engine = None
-        self._initialize_models()
+    """Models are loaded per capability on first use (see ai_engine.model_loader)"""
+
+    @property
+    def code_analyzer(self):
+        return get_model('code_analysis')
+
+    @property
+    def optimization_engine(self):
+        return get_model('optimization')
     
-    def _initialize_models(self):
-        """Initialize AI models for performance analysis"""
+    async def analyze_performance_metrics(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze performance metrics and provide insights. Runs in the inference
+        pool, where concurrent callers share one model call.
+        """
+        from ai_engine.inference import inference_service  # Import inside method
         try:
-            # Load pre-trained models for code analysis
-            self.code_analyzer = pipeline(
-                "text-classification",
-                model="microsoft/codebert-base",
-                tokenizer="microsoft/codebert-base"
-            )
-            
-            # Initialize anomaly detection model
-            self.anomaly_detector = self._create_anomaly_model()
-            
-            # Initialize optimization engine
-            self.optimization_engine = self._create_optimization_model()
-            
-            logger.info("AI models initialized successfully")
+            return await inference_service.analyze(metrics)
         except Exception as e:
-            logger.error(f"Failed to initialize AI models: {e}")
-    
-    def _create_anomaly_model(self):
-        """Create anomaly detection model for performance metrics"""
-        model = tf.keras.Sequential([
-            tf.keras.layers.Dense(64, activation='relu', input_shape=(10,)),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(32, activation='relu'),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(16, activation='relu'),
-            tf.keras.layers.Dense(1, activation='sigmoid')
-        ])
-        model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-        return model
-    
-    def _create_optimization_model(self):
-        """Create optimization suggestion model"""
-        model = tf.keras.Sequential([
-            tf.keras.layers.Dense(128, activation='relu', input_shape=(15,)),
-            tf.keras.layers.Dropout(0.3),
-            tf.keras.layers.Dense(64, activation='relu'),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(32, activation='relu'),
-            tf.keras.layers.Dense(10, activation='softmax')  # 10 optimization categories
-        ])
-        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-        return model
+            logger.error(f"Performance analysis failed: {e}")
+            return {'error': str(e)}
     
-    async def analyze_performance_metrics(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze performance metrics and provide insights"""
+    def analyze_performance_metrics_batch(self, metrics_list: List[Dict[str, Any]],
+                                          anomalies: List[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Analyze many metrics dicts with one model call per batch; results are in input order.
+        ``anomalies`` (one list per input) are passed in when this runs in an inference pool
+        process, so pool processes never query the database; otherwise they are scored here.
+        """
+        results = [None] * len(metrics_list)
+        rows = []
+        valid = []
+        for index, metrics in enumerate(metrics_list):
+            try:
+                rows.append(self._core_metric_values(metrics))
+                valid.append(index)
+            except (AttributeError, TypeError, ValueError) as e:
+                results[index] = {'error': f'Invalid metrics: {e}'}
+        if not valid:
+            return results
+        if anomalies is None:
+            anomalies = self._detect_anomalies_batch(metrics_list)
+        
         try:
-            # Extract key performance indicators
-            core_metrics = self._extract_core_metrics(metrics)
-            
-            # Detect anomalies
-            anomalies = await self._detect_anomalies(core_metrics)
+            # Extract key performance indicators, one row per input
+            core_metrics = self._extract_core_metrics(rows)
             
             # Generate optimization suggestions
-            optimizations = await self._generate_optimizations(core_metrics)
+            optimizations = self._generate_optimizations(core_metrics)
             
-            # Calculate performance score
-            performance_score = self._calculate_performance_score(core_metrics)
+            # Calculate performance scores
+            performance_scores = self._calculate_performance_scores(core_metrics)
             
             # Predict future performance trends
-            trends = await self._predict_trends(core_metrics)
+            trends = self._predict_trends(core_metrics, performance_scores)
             
-            return {
-                'performance_score': performance_score,
-                'anomalies': anomalies,
-                'optimizations': optimizations,
-                'trends': trends,
-                'analysis_timestamp': datetime.now().isoformat(),
-                'confidence_level': self._calculate_confidence(core_metrics)
-            }
+            confidence_levels = self._calculate_confidence(core_metrics)
+            analysis_timestamp = datetime.now().isoformat()
+            for row, index in enumerate(valid):
+                results[index] = {
+                    'performance_score': float(performance_scores[row]),
+                    'anomalies': anomalies[index],
+                    'optimizations': optimizations[row],
+                    'trends': trends[row],
+                    'analysis_timestamp': analysis_timestamp,
+                    'confidence_level': float(confidence_levels[row])
+                }
         except Exception as e:
-            logger.error(f"Performance analysis failed: {e}")
-            return {'error': str(e)}
+            logger.error(f"Performance analysis failed for a batch of {len(valid)}: {e}")
+            for index in valid:
+                results[index] = {'error': str(e)}
+        return results
     
-    def _extract_core_metrics(self, metrics: Dict[str, Any]) -> np.ndarray:
-        """Extract and normalize core performance metrics"""
-        core_values = [
-            metrics.get('lcp', 0) / 1000,  # Normalize to seconds
-            metrics.get('fid', 0) / 100,   # Normalize FID
-            metrics.get('cls', 0) * 100,   # Scale CLS
-            metrics.get('fcp', 0) / 1000,  # Normalize to seconds
-            metrics.get('ttfb', 0) / 1000, # Normalize to seconds
-            metrics.get('memory_usage', 0) / (1024 * 1024),  # Convert to MB
-            metrics.get('cpu_usage', 0) / 100,  # Normalize percentage
-            metrics.get('bundle_size', 0) / (1024 * 1024),  # Convert to MB
-            metrics.get('render_time', 0) / 1000,  # Normalize to seconds
-            metrics.get('network_requests', 0) / 100  # Normalize request count
-        ]
-        return np.array(core_values, dtype=np.float32)
+    def _core_metric_values(self, metrics: Dict[str, Any]) -> List[float]:
+        return [float(metrics.get(key) or 0) for key, _ in CORE_METRICS]
     
-    async def _detect_anomalies(self, metrics: np.ndarray) -> List[Dict[str, Any]]:
-        """Detect performance anomalies using AI model"""
+    def _extract_core_metrics(self, rows: List[List[float]]) -> np.ndarray:
+        """Normalize raw core metric values into a (B, 10) matrix"""
+        return np.array(rows, dtype=np.float32).reshape(-1, len(CORE_METRICS)) * CORE_METRIC_SCALES
+    
+    def _detect_anomalies_batch(self, metrics_list: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Score every sample against the shared rollups of its (project, component, metric) series"""
         try:
-            # Reshape for model input
-            input_data = metrics.reshape(1, -1)
-            
-            # Predict anomaly probability
-            anomaly_prob = self.anomaly_detector.predict(input_data)[0][0]
-            
+            all_scores = baseline_scores(metrics_list)
+        except Exception as e:
+            logger.error(f"Anomaly detection failed: {e}")
+            return [[] for _ in metrics_list]
+        
+        results = []
+        for scores in all_scores:
+            affected = sorted((metric for metric, score in scores.items() if score > 3.5), key=scores.get, reverse=True)
             anomalies = []
-            if anomaly_prob > 0.7:  # High anomaly threshold
+            if affected:
+                top_score = scores[affected[0]]
                 anomalies.append({
                     'type': 'performance_degradation',
-                    'severity': 'high' if anomaly_prob > 0.9 else 'medium',
-                    'probability': float(anomaly_prob),
-                    'description': 'Significant performance degradation detected',
-                    'affected_metrics': self._identify_problematic_metrics(metrics)
+                    'severity': 'high' if top_score > 6 else 'medium',
+                    'score': top_score,
+                    'description': 'Metrics far outside their recent range for this component',
+                    'affected_metrics': affected
                 })
-            
-            return anomalies
-        except Exception as e:
-            logger.error(f"Anomaly detection failed: {e}")
-            return []
+            results.append(anomalies)
+        return results
     
-    async def _generate_optimizations(self, metrics: np.ndarray) -> List[Dict[str, Any]]:
-        """Generate AI-powered optimization suggestions"""
+    def _generate_optimizations(self, metrics: np.ndarray) -> List[List[Dict[str, Any]]]:
+        """Generate AI-powered optimization suggestions for every row with one model call"""
         try:
+            optimization_engine = self.optimization_engine
+            if optimization_engine is None:
+                return [[] for _ in range(len(metrics))]
+            
             # Extend metrics for optimization model
-            extended_metrics = np.concatenate([
+            mean = metrics.mean(axis=1, keepdims=True)
+            extended_metrics = np.hstack([
                 metrics,
-                [
-                    np.mean(metrics),  # Average performance
-                    np.std(metrics),   # Performance variance
-                    np.max(metrics),   # Worst metric
-                    np.min(metrics),   # Best metric
-                    len([m for m in metrics if m > np.mean(metrics)])  # Count of above-average metrics
-                ]
+                mean,  # Average performance
+                metrics.std(axis=1, keepdims=True),  # Performance variance
+                metrics.max(axis=1, keepdims=True),  # Worst metric
+                metrics.min(axis=1, keepdims=True),  # Best metric
+                (metrics > mean).sum(axis=1, keepdims=True)  # Count of above-average metrics
             ])
             
             # Predict optimization categories
-            input_data = extended_metrics.reshape(1, -1)
-            optimization_probs = self.optimization_engine.predict(input_data)[0]
+            optimization_probs = np.asarray(optimization_engine.predict(extended_metrics))
             
             # Map predictions to optimization suggestions
-            optimization_categories = [
-                'code_splitting', 'image_optimization', 'caching_strategy',
-                'bundle_optimization', 'lazy_loading', 'cdn_implementation',
-                'database_optimization', 'api_optimization', 'memory_management',
-                'render_optimization'
-            ]
-            
             suggestions = []
-            for i, prob in enumerate(optimization_probs):
-                if prob > 0.3:  # Threshold for suggestion relevance
-                    suggestion = self._get_optimization_details(optimization_categories[i], prob, metrics)
-                    suggestions.append(suggestion)
-            
-            # Sort by priority (probability)
-            suggestions.sort(key=lambda x: x['priority'], reverse=True)
-            return suggestions[:5]  # Return top 5 suggestions
+            for row, probs in enumerate(optimization_probs):
+                relevant = [
+                    self._get_optimization_details(OPTIMIZATION_CATEGORIES[i], probs[i], metrics[row])
+                    for i in np.flatnonzero(probs > 0.3)  # Threshold for suggestion relevance
+                ]
+                # Sort by priority (probability), top 5
+                relevant.sort(key=lambda x: x['priority'], reverse=True)
+                suggestions.append(relevant[:5])
+            return suggestions
             
         except Exception as e:
             logger.error(f"Optimization generation failed: {e}")
-            return []
+            return [[] for _ in range(len(metrics))]
     
     def _get_optimization_details(self, category: str, probability: float, metrics: np.ndarray) -> Dict[str, Any]:
         """Get detailed optimization suggestions for each category"""
@@ -283,37 +285,38 @@ const observer = new IntersectionObserver((entries) => {
             'estimated_improvement': f"{int(probability * 30)}%"
         }
     
-    def _calculate_performance_score(self, metrics: np.ndarray) -> float:
-        """Calculate overall performance score (0-100)"""
-        # Weight different metrics based on importance
-        weights = np.array([0.25, 0.20, 0.15, 0.15, 0.10, 0.05, 0.05, 0.03, 0.02])
-        
+    def _calculate_performance_scores(self, metrics: np.ndarray) -> np.ndarray:
+        """Calculate overall performance score (0-100) of every row"""
         # Normalize metrics to 0-1 scale (lower is better for most metrics)
-        normalized = np.clip(1 - metrics[:len(weights)], 0, 1)
+        normalized = np.clip(1 - metrics[:, :len(SCORE_WEIGHTS)], 0, 1)
         
         # Calculate weighted score
-        score = np.sum(normalized * weights) * 100
-        return float(np.clip(score, 0, 100))
+        scores = normalized @ SCORE_WEIGHTS * 100
+        return np.clip(scores, 0, 100)
     
-    async def _predict_trends(self, metrics: np.ndarray) -> Dict[str, Any]:
+    def _predict_trends(self, metrics: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
         """Predict performance trends"""
         try:
             # Simple trend analysis (in production, use time series models)
-            current_score = self._calculate_performance_score(metrics)
+            directions = np.where(scores > 70, 'improving', np.where(scores < 50, 'declining', 'stable'))
             
             # Simulate trend prediction
-            trend_direction = 'improving' if current_score > 70 else 'declining' if current_score < 50 else 'stable'
+            predicted_24h = scores + np.random.uniform(-5, 5, len(scores))
+            predicted_7d = scores + np.random.uniform(-10, 10, len(scores))
             
-            return {
-                'direction': trend_direction,
-                'predicted_score_24h': current_score + np.random.uniform(-5, 5),
-                'predicted_score_7d': current_score + np.random.uniform(-10, 10),
-                'confidence': 0.85,
-                'key_factors': self._identify_trend_factors(metrics)
-            }
+            return [
+                {
+                    'direction': str(directions[row]),
+                    'predicted_score_24h': float(predicted_24h[row]),
+                    'predicted_score_7d': float(predicted_7d[row]),
+                    'confidence': 0.85,
+                    'key_factors': self._identify_trend_factors(metrics[row])
+                }
+                for row in range(len(scores))
+            ]
         except Exception as e:
             logger.error(f"Trend prediction failed: {e}")
-            return {'direction': 'unknown', 'confidence': 0.0}
+            return [{'direction': 'unknown', 'confidence': 0.0} for _ in range(len(scores))]
     
     def _identify_problematic_metrics(self, metrics: np.ndarray) -> List[str]:
         """Identify which metrics are problematic"""
@@ -340,12 +343,12 @@ const observer = new IntersectionObserver((entries) => {
         
         return factors[:3]  # Return top 3 factors
     
-    def _calculate_confidence(self, metrics: np.ndarray) -> float:
-        """Calculate confidence level of the analysis"""
+    def _calculate_confidence(self, metrics: np.ndarray) -> np.ndarray:
+        """Calculate confidence level of the analysis of every row"""
         # Higher confidence for more complete data
-        non_zero_metrics = np.count_nonzero(metrics)
-        confidence = min(non_zero_metrics / len(metrics), 1.0) * 0.9 + 0.1
-        return float(confidence)
+        non_zero_metrics = np.count_nonzero(metrics, axis=1)
+        return np.minimum(non_zero_metrics / metrics.shape[1], 1.0) * 0.9 + 0.1
 
-# Initialize global analyzer instance
+# Global analyzer instance; cheap to create, models load on first use
 ai_analyzer = PerformanceAIAnalyzer()
+
@@ -0,0 +1,163 @@
+"""
+Repository-wide batch analysis.
+
+``POST /api/v1/analysis/analyze_batch/`` takes the files of one project, either
+as a JSON list of ``{path, source_code}`` or as a tarball upload (``archive``),
+and records one ``AnalysisJob``. The files are split into chunks of
+``BATCH_ANALYSIS['CHUNK_SIZE']``; each chunk is one ``analyze_component_chunk``
+task that writes its rows in bulk and adds its counts to the job, so progress
+is read from a single row at ``/api/v1/jobs/<job_id>/``.
+
+With ``incremental`` the files are taken to be the project's whole tree: files
+whose content hash and analyzer version match their ``ComponentAnalysis`` row
+are skipped, and components missing from the upload are marked removed. The
+job reports how many files were skipped and the analysis time that saved.
+
+Archives are read in memory, never extracted to disk. Only files with
+``BATCH_ANALYSIS['EXTENSIONS']`` outside ``SKIPPED_DIRECTORIES`` are analyzed;
+files larger than ``MAX_FILE_BYTES`` or with paths longer than
+``ComponentAnalysis.file_path`` allows are skipped. A path given more than once
+is analyzed once, with its last contents.
+"""
+import logging
+import posixpath
+import tarfile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from perfmaster.models import AnalysisJob, ComponentAnalysis
+
+from . import result_cache
+
+logger = logging.getLogger(__name__)
+
+SKIPPED_DIRECTORIES = {'node_modules', 'dist', 'build', 'coverage'}
+MAX_PATH_LENGTH = ComponentAnalysis._meta.get_field('file_path').max_length
+
+
+class ArchiveError(ValueError):
+    """Raised for uploads that are not a readable tarball or exceed the batch limits"""
+
+
+def batch_settings():
+    config = {
+        'CHUNK_SIZE': 50,
+        'MAX_FILES': 5000,
+        'MAX_FILE_BYTES': 512 * 1024,
+        'MAX_ARCHIVE_BYTES': 200 * 1024 * 1024,
+        'EXTENSIONS': ('.js', '.jsx', '.ts', '.tsx', '.vue'),
+    }
+    config.update(getattr(settings, 'BATCH_ANALYSIS', {}))
+    return config
+
+
+def _wanted(path, extensions):
+    parts = path.split('/')
+    if any(part in SKIPPED_DIRECTORIES or part.startswith('.') for part in parts[:-1]):
+        return False
+    return parts[-1].endswith(tuple(extensions))
+
+
+def unique_files(files):
+    """``files`` with one entry per path, the last one given"""
+    return list({file['path']: file for file in files}.values())
+
+
+def read_archive(fileobj):
+    """
+    ``([{path, source_code}], skipped)`` for the source files of a tar archive (any compression)
+    """
+    config = batch_settings()
+    files = {}
+    skipped = 0
+    total_bytes = 0
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r:*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                path = posixpath.normpath(member.name).lstrip('/')
+                if path.startswith('..') or not _wanted(path, config['EXTENSIONS']):
+                    continue
+                if member.size > config['MAX_FILE_BYTES'] or len(path) > MAX_PATH_LENGTH:
+                    skipped += 1
+                    continue
+                total_bytes += member.size
+                if total_bytes > config['MAX_ARCHIVE_BYTES']:
+                    raise ArchiveError(f"Archive sources exceed {config['MAX_ARCHIVE_BYTES']} bytes")
+                if len(files) >= config['MAX_FILES'] and path not in files:
+                    raise ArchiveError(f"Archive has more than {config['MAX_FILES']} source files")
+                source = archive.extractfile(member).read().decode('utf-8', errors='replace')
+                # Later members replace earlier ones with the same path, as when extracting
+                files[path] = {'path': path, 'source_code': source}
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f'Could not read archive: {e}')
+    return list(files.values()), skipped
+
+
+def plan_incremental(project, files, framework_version, analysis_type):
+    """
+    Split ``files`` against the project's component fingerprints: returns the files to
+    analyze, how many are unchanged, the active file paths missing from ``files``, and
+    the seconds the unchanged files took when last analyzed
+    """
+    known = {
+        row['file_path']: row
+        for row in ComponentAnalysis.objects.filter(project=project).values(
+            'file_path', 'content_hash', 'analyzer_version', 'processing_time', 'removed_at'
+        )
+    }
+    changed = []
+    skipped = 0
+    time_saved = 0.0
+    for file in files:
+        row = known.get(file['path'])
+        key = result_cache.content_hash(file['source_code'], framework_version, analysis_type)
+        if (
+            row is not None and row['removed_at'] is None and row['content_hash'] == key
+            and row['analyzer_version'] == result_cache.ANALYZER_VERSION
+        ):
+            skipped += 1
+            time_saved += row['processing_time'] or 0.0
+        else:
+            changed.append(file)
+    present = {file['path'] for file in files}
+    removed = [path for path, row in known.items() if row['removed_at'] is None and path not in present]
+    return changed, skipped, removed, time_saved
+
+
+def start_job(project, files, framework_version='React 18', analysis_type='full', chunk_size=None, incremental=False):
+    """Record an AnalysisJob for ``files`` and queue one chunk task per ``chunk_size`` files"""
+    from .tasks import analyze_component_chunk  # Import inside function
+
+    files = unique_files(files)
+    skipped, removed, time_saved = 0, [], 0.0
+    if incremental:
+        files, skipped, removed, time_saved = plan_incremental(project, files, framework_version, analysis_type)
+        if removed:
+            ComponentAnalysis.objects.filter(project=project, file_path__in=removed).update(removed_at=timezone.now())
+
+    chunk_size = chunk_size or batch_settings()['CHUNK_SIZE']
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    job = AnalysisJob.objects.create(
+        project=project,
+        framework_version=framework_version,
+        analysis_type=analysis_type,
+        incremental=incremental,
+        skipped_files=skipped,
+        removed_files=len(removed),
+        time_saved=time_saved,
+        total_files=len(files),
+        total_chunks=len(chunks),
+        status='pending' if chunks else 'completed',
+        completed_at=None if chunks else timezone.now(),
+    )
+    for chunk in chunks:
+        transaction.on_commit(lambda chunk=chunk: analyze_component_chunk.delay(str(job.job_id), chunk))
+    logger.info(
+        f"Queued analysis job {job.job_id}: {len(files)} files in {len(chunks)} chunks"
+        + (f", {skipped} unchanged, {len(removed)} removed" if incremental else '')
+    )
+    return job
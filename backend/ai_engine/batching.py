@@ -0,0 +1,71 @@
+"""
+Async micro-batching for model inference.
+
+Every ``analyze_performance_metrics`` call used to run the models on a single
+row. ``MicroBatcher`` collects the calls that arrive within
+``AI_ENGINE['BATCH_WINDOW_MS']`` (or until ``AI_ENGINE['MAX_BATCH_SIZE']`` are
+waiting), runs the batch function once in a worker thread and hands each
+caller its own result.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Groups concurrent ``submit(item)`` calls into ``process_batch(items) -> results`` calls"""
+
+    def __init__(self, process_batch, max_batch_size=64, window_ms=5):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.window_ms = window_ms
+        # Pending (item, future) pairs per event loop
+        self._pending = {}
+        self.counters = {
+            'submitted': 0,
+            'batches': 0,
+            'largest_batch': 0,
+            'failed_batches': 0,
+        }
+
+    def stats(self):
+        return {**self.counters, 'waiting': sum(len(pending) for pending in self._pending.values())}
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.get(loop)
+        if pending is None:
+            pending = self._pending[loop] = []
+            loop.call_later(self.window_ms / 1000, self._flush, loop, pending)
+        pending.append((item, future))
+        self.counters['submitted'] += 1
+        if len(pending) >= self.max_batch_size:
+            self._flush(loop, pending)
+        return await future
+
+    def _flush(self, loop, pending):
+        # The timer of a batch that already filled up finds it gone
+        if self._pending.get(loop) is not pending:
+            return
+        del self._pending[loop]
+        loop.create_task(self._run(pending))
+
+    async def _run(self, pending):
+        items = [item for item, _ in pending]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self.process_batch, items)
+        except Exception as e:
+            self.counters['failed_batches'] += 1
+            logger.error(f"Batch of {len(items)} failed: {e}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.counters['batches'] += 1
+        self.counters['largest_batch'] = max(self.counters['largest_batch'], len(items))
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
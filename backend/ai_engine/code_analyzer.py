@@ -0,0 +1,429 @@
+"""
+Single-pass analyzer for JS/TS/JSX component source.
+
+The rule-based analysis used to rescan the whole source once per check with
+``in``, ``.count``, ``.find`` and separate regexes, and reported character
+offsets as line numbers. ``analyze_source_code`` lexes the source once and
+feeds each token to the rules subscribed to it; the result holds every
+bottleneck with 1-based line/column positions, the component name and the
+imported modules.
+
+Rules are pluggable: subclass ``Rule``, list the token values and kinds it
+wants in ``values``/``kinds``, and decorate it with ``@register_rule``. A
+rule instance lives for one analysis; ``finish()`` returns its findings.
+Bump ``ANALYZER_VERSION`` whenever a rule's output changes, so cached results
+and incremental fingerprints are recomputed.
+
+The lexer is deliberately forgiving: it never fails on odd input, strings
+cannot run past the end of their line, and ``/`` is read as a regex literal
+only where an operand is expected. ``manage.py bench_code_analyzer`` reports
+its throughput per MB of source.
+"""
+import re
+from bisect import bisect_right
+
+ANALYZER_VERSION = 'rule_based_analyzer_v3'
+
+# Locations kept per finding; ``occurrences`` still counts all of them
+MAX_LOCATIONS = 20
+
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<comment>//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))
+      | (?P<string>'(?:[^'\\\n]|\\[\s\S])*'?|"(?:[^"\\\n]|\\[\s\S])*"?)
+      | (?P<template>`(?:[^`\\]|\\[\s\S])*`?)
+      | (?P<ident>(?:[^\W\d]|\$)[\w$]*)
+      | (?P<number>\.?\d[\w.]*)
+      | (?P<punct>=>|\.\.\.|\?\.|\?\?=?|===?|!==?|&&=?|\|\|=?|\*\*=?|\+\+|--|<<=?|>>>?=?|/>|[-+*/%&|^<>]=?|[{}()\[\];,.:?!~=@#])
+      | (?P<other>\S)
+    )''', re.VERBOSE)
+
+_REGEX_RE = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*')
+
+# After these a ``/`` starts a regex literal rather than a division
+_REGEX_PREFIX = {
+    None, '(', ',', '=', ':', '[', '!', '&', '|', '?', '{', ';', '&&', '||', '??', '=>',
+    '==', '===', '!=', '!==', '+', '-', '*', '%', '~', '^', '+=', '-=', '*=', '%=',
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'yield', 'await',
+}
+
+_OPENERS = {'(': ')', '[': ']', '{': '}'}
+_CLOSERS = {')', ']', '}'}
+
+KEYWORDS = {
+    'break', 'case', 'catch', 'class', 'const', 'continue', 'default', 'do', 'else', 'export',
+    'extends', 'finally', 'for', 'function', 'if', 'import', 'in', 'instanceof', 'let', 'new',
+    'of', 'return', 'switch', 'throw', 'try', 'typeof', 'var', 'void', 'while', 'yield', 'await',
+}
+
+
+def _kind_of(value):
+    """Token kind the lexer gives ``value`` on its own"""
+    match = _TOKEN_RE.fullmatch(value)
+    return match.lastgroup if match else None
+
+
+class AnalysisContext:
+    """
+    Walker state shared with the rules: source, bracket depth, the three previous
+    tokens and where the previous one starts
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.depth = 0
+        self.prev_kind = self.prev_value = self.prev_start = None
+        self.prev2_kind = self.prev2_value = None
+        self.prev3_kind = self.prev3_value = None
+        self.component_name = None
+        self.dependencies = []
+        self._line_starts = None
+
+    def position(self, offset):
+        """1-based (line, column) of a character offset"""
+        if self._line_starts is None:
+            self._line_starts = [0] + [match.end() for match in re.finditer('\n', self.source)]
+        line = bisect_right(self._line_starts, offset)
+        return line, offset - self._line_starts[line - 1] + 1
+
+
+class Rule:
+    """
+    Base class of analyzer rules. ``on_token(kind, value, start)`` is called for every
+    token whose value is in ``values`` or whose kind is in ``kinds``; the context's
+    ``depth`` counts open brackets, with an opening bracket and its match seeing the same depth.
+    """
+    values = ()
+    kinds = ()
+
+    def __init__(self, context):
+        self.context = context
+
+    def on_token(self, kind, value, start):
+        pass
+
+    def finish(self):
+        """Findings of this rule for the analyzed source"""
+        return []
+
+
+class FindingRule(Rule):
+    """Rule reporting one finding of ``finding`` type with every location it occurs at"""
+    finding = None  # {'type', 'severity', 'description', 'suggestion'}
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.locations = []
+        self.occurrences = 0
+
+    def report(self, start):
+        self.occurrences += 1
+        if len(self.locations) < MAX_LOCATIONS:
+            line, column = self.context.position(start)
+            self.locations.append({'line': line, 'column': column})
+
+    def finish(self):
+        if not self.occurrences:
+            return []
+        return [{
+            **self.finding,
+            'line_number': self.locations[0]['line'],
+            'column': self.locations[0]['column'],
+            'occurrences': self.occurrences,
+            'locations': self.locations,
+        }]
+
+
+RULES = []
+
+
+def register_rule(rule_class):
+    """Class decorator adding a rule to the ones every analysis runs"""
+    RULES.append(rule_class)
+    return rule_class
+
+
+@register_rule
+class EffectDependenciesRule(FindingRule):
+    """``useEffect(fn)`` / ``useLayoutEffect(fn)`` without a dependency array"""
+    values = ('(', ',', ')')
+    finding = {
+        'type': 'missing_dependencies',
+        'severity': 'medium',
+        'description': 'useEffect hook missing dependency array',
+        'suggestion': 'Add dependency array to useEffect',
+    }
+    HOOKS = {'useEffect', 'useLayoutEffect'}
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.calls = []  # [depth, arguments separated so far, start of the hook name]
+
+    def on_token(self, kind, value, start):
+        context = self.context
+        if value == '(':
+            if context.prev_value in self.HOOKS:
+                self.calls.append([context.depth, 0, context.prev_start])
+        elif self.calls and context.depth == self.calls[-1][0]:
+            if value == ',':
+                self.calls[-1][1] += 1
+            else:
+                _, commas, hook_start = self.calls.pop()
+                if not commas:
+                    self.report(hook_start)
+
+
+@register_rule
+class ExcessiveStateRule(FindingRule):
+    """More than ``MAX_STATE_HOOKS`` ``useState`` calls in one file"""
+    values = ('useState',)
+    finding = {
+        'type': 'excessive_state',
+        'severity': 'medium',
+        'description': 'Component has too many useState hooks',
+        'suggestion': 'Consider using useReducer or state management library',
+    }
+    MAX_STATE_HOOKS = 5
+    # A call, including TypeScript's useState<T>(...); import specifiers are not
+    _CALL_RE = re.compile(r'\s*[(<]')
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.calls = []
+
+    def on_token(self, kind, value, start):
+        if kind == 'ident' and self._CALL_RE.match(self.context.source, start + len(value)):
+            self.calls.append(start)
+
+    def finish(self):
+        if len(self.calls) > self.MAX_STATE_HOOKS:
+            for start in self.calls:
+                self.report(start)
+        return super().finish()
+
+
+@register_rule
+class ListKeysRule(FindingRule):
+    """``.map(...)`` callbacks that render JSX without a ``key`` attribute"""
+    values = ('(', ')', '<', 'key')
+    finding = {
+        'type': 'missing_keys',
+        'severity': 'high',
+        'description': 'Missing keys in list rendering',
+        'suggestion': 'Add unique keys to list items',
+    }
+    _ATTRIBUTE_RE = re.compile(r'\s*=(?!=)')
+    _JSX_START_RE = re.compile(r'[A-Za-z>]')
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.calls = []  # [depth, renders JSX, has key, start of "map"]
+
+    def on_token(self, kind, value, start):
+        context = self.context
+        if value == '(':
+            if context.prev_value == 'map' and context.prev2_value in ('.', '?.'):
+                self.calls.append([context.depth, False, False, context.prev_start])
+        elif not self.calls:
+            return
+        elif value == ')':
+            if context.depth == self.calls[-1][0]:
+                _, renders_jsx, has_key, map_start = self.calls.pop()
+                if renders_jsx and not has_key:
+                    self.report(map_start)
+        elif value == '<':
+            # JSX opens where an operand is expected (after an operator, bracket or keyword
+            # such as return) and the tag name follows without a space
+            if (
+                (context.prev_kind not in ('ident', 'number', 'string') or context.prev_value in KEYWORDS)
+                and context.prev_value not in (')', ']')
+                and self._JSX_START_RE.match(context.source, start + 1)
+            ):
+                self.calls[-1][1] = True
+        elif (
+            kind == 'ident' and context.prev_value not in ('const', 'let', 'var', '.')
+            and self._ATTRIBUTE_RE.match(context.source, start + len(value))
+        ):
+            self.calls[-1][2] = True
+
+
+@register_rule
+class InlineHandlerRule(FindingRule):
+    """Arrow functions and ``.bind`` calls inside JSX attribute expressions"""
+    values = ('{', '}', '=>', 'bind')
+    finding = {
+        'type': 'inline_functions',
+        'severity': 'low',
+        'description': 'Inline functions in render may cause unnecessary re-renders',
+        'suggestion': 'Move functions outside render or use useCallback',
+    }
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.attributes = []  # [depth, already reported]
+
+    def on_token(self, kind, value, start):
+        context = self.context
+        if value == '{':
+            # attr={ ... } inside a tag: the attribute name follows the tag name, another
+            # attribute or a string; "const x = {" and "a.b = {" do not match
+            if (
+                context.prev_value == '=' and context.prev2_kind == 'ident'
+                and (
+                    (context.prev3_kind == 'ident' and context.prev3_value not in KEYWORDS)
+                    or context.prev3_kind == 'string' or context.prev3_value == '}'
+                )
+            ):
+                self.attributes.append([context.depth, False])
+        elif not self.attributes:
+            return
+        elif value == '}':
+            if context.depth == self.attributes[-1][0]:
+                self.attributes.pop()
+        elif not self.attributes[-1][1] and (value == '=>' or context.prev_value == '.'):
+            self.attributes[-1][1] = True
+            self.report(start)
+
+
+@register_rule
+class ImportsRule(Rule):
+    """Modules named by ``import ... from``, bare ``import``, ``export ... from``, ``import()`` and ``require()``"""
+    kinds = ('string',)
+
+    def on_token(self, kind, value, start):
+        context = self.context
+        if context.prev_value in ('from', 'import') or (
+            context.prev_value == '(' and context.prev2_value in ('require', 'import')
+        ):
+            module = value[1:-1]
+            if module and module not in context.dependencies:
+                context.dependencies.append(module)
+
+
+@register_rule
+class ComponentNameRule(Rule):
+    """
+    Name of the component: the default export if named, else the first capitalized
+    function, class or const, else the first function or const name
+    """
+    values = ('function', 'class', 'const', 'let', 'var')
+    _NAME_RE = re.compile(r'\s*(?:\*\s*)?((?:[^\W\d]|\$)[\w$]*)')
+    _ASSIGNED_NAME_RE = re.compile(r'\s*((?:[^\W\d]|\$)[\w$]*)\s*(?::[^=;\n]*)?=(?![=>])')
+
+    def __init__(self, context):
+        super().__init__(context)
+        # candidates by priority, lowest first: 0 default export, 1 capitalized, 2 function, 3 const
+        self.candidates = {}
+
+    def on_token(self, kind, value, start):
+        context = self.context
+        if context.prev_value == '.':
+            return
+        if value in ('function', 'class'):
+            match = self._NAME_RE.match(context.source, start + len(value))
+            is_function = True
+        else:
+            match = self._ASSIGNED_NAME_RE.match(context.source, start + len(value))
+            is_function = False
+        if not match:
+            return
+        name = match.group(1)
+        if name in KEYWORDS:
+            return
+        if is_function and context.prev_value == 'default':
+            self.candidates.setdefault(0, name)
+        elif name[0].isupper() and not name.isupper():
+            self.candidates.setdefault(1, name)
+        self.candidates.setdefault(2 if is_function else 3, name)
+
+    def finish(self):
+        if self.candidates:
+            self.context.component_name = self.candidates[min(self.candidates)]
+        return []
+
+
+class CodeAnalysis:
+    """Result of one ``analyze_source_code`` call"""
+
+    def __init__(self, bottlenecks, component_name, dependencies, tokens, lines):
+        self.bottlenecks = bottlenecks
+        self.component_name = component_name
+        self.dependencies = dependencies
+        self.tokens = tokens
+        self.lines = lines
+
+
+def analyze_source_code(source, rules=None):
+    """Lex ``source`` once, running ``rules`` (the registered ones by default) over its tokens"""
+    context = AnalysisContext(source)
+    instances = [rule_class(context) for rule_class in (RULES if rules is None else rules)]
+    by_value = {}
+    by_kind = {}
+    for rule in instances:
+        for value in rule.values:
+            by_value.setdefault(value, []).append(rule.on_token)
+        for kind in rule.kinds:
+            by_kind.setdefault(kind, []).append(rule.on_token)
+    # A token is dispatched once, to its value's subscribers followed by its kind's
+    for value, handlers in by_value.items():
+        for kind, kind_handlers in by_kind.items():
+            if _kind_of(value) == kind:
+                handlers.extend(kind_handlers)
+
+    match_token = _TOKEN_RE.match
+    match_regex = _REGEX_RE.match
+    depth = 0
+    position = 0
+    tokens = 0
+    end = len(source)
+    # The previous tokens live in locals and are copied to the context only before dispatch
+    prev_kind = prev_value = prev_start = prev2_kind = prev2_value = prev3_kind = prev3_value = None
+    while position < end:
+        match = match_token(source, position)
+        if match is None:
+            break  # trailing whitespace
+        kind = match.lastgroup
+        value = match.group(kind)
+        start = match.start(kind)
+        position = match.end()
+        if kind == 'comment':
+            continue
+        token_depth = depth
+        if kind == 'punct':
+            if value in _OPENERS:
+                depth += 1
+                token_depth = depth
+            elif value in _CLOSERS:
+                depth -= 1
+            elif value[0] == '/' and value != '/>' and prev_value in _REGEX_PREFIX:
+                regex = match_regex(source, start)
+                if regex:
+                    kind = 'regex'
+                    value = regex.group()
+                    position = regex.end()
+        tokens += 1
+
+        handlers = by_value.get(value) or by_kind.get(kind)
+        if handlers:
+            context.depth = token_depth
+            context.prev_kind, context.prev_value, context.prev_start = prev_kind, prev_value, prev_start
+            context.prev2_kind, context.prev2_value = prev2_kind, prev2_value
+            context.prev3_kind, context.prev3_value = prev3_kind, prev3_value
+            for handler in handlers:
+                handler(kind, value, start)
+
+        prev3_kind, prev3_value = prev2_kind, prev2_value
+        prev2_kind, prev2_value = prev_kind, prev_value
+        prev_kind, prev_value, prev_start = kind, value, start
+
+    bottlenecks = []
+    for rule in instances:
+        bottlenecks.extend(rule.finish())
+    return CodeAnalysis(
+        bottlenecks=bottlenecks,
+        component_name=context.component_name or 'UnknownComponent',
+        dependencies=context.dependencies,
+        tokens=tokens,
+        lines=source.count('\n') + 1 if source else 0,
+    )
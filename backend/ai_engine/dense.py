@@ -0,0 +1,117 @@
+"""
+Pure-NumPy forward pass for the small dense networks of the analyzer.
+
+The optimization model is a few ``Dense`` layers, so scoring a batch is a few
+matmuls; TensorFlow is only needed to train it. ``manage.py export_ai_models``
+writes a Keras model's weights to ``<AI_ENGINE['MODEL_DIR']>/<name>.npz``
+and ``DenseNetwork.load`` reads them back for inference (the default
+``AI_ENGINE['BACKEND']``). Dropout layers are identity at inference and are
+not exported.
+"""
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def _softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    return x / x.sum(axis=1, keepdims=True)
+
+
+def _linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    'relu': _relu,
+    'sigmoid': _sigmoid,
+    'softmax': _softmax,
+    'linear': _linear,
+}
+
+
+class DenseNetwork:
+    """Stack of ``activation(x @ kernel + bias)`` layers with a Keras-like ``predict``"""
+
+    def __init__(self, layers):
+        # [(kernel, bias, activation name)]
+        for _, _, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f'Unsupported activation: {activation}')
+        self.layers = [
+            (np.ascontiguousarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32), activation)
+            for kernel, bias, activation in layers
+        ]
+
+    @property
+    def input_size(self):
+        return self.layers[0][0].shape[0]
+
+    def predict(self, x):
+        x = np.asarray(x, dtype=np.float32).reshape(-1, self.input_size)
+        for kernel, bias, activation in self.layers:
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return x
+
+    @classmethod
+    def initialized(cls, input_size, layers, seed=0):
+        """
+        Untrained network of ``[(units, activation)]`` layers, initialized like
+        Keras ``Dense`` (Glorot uniform kernels, zero biases). The fixed seed
+        gives every process the same weights.
+        """
+        rng = np.random.default_rng(seed)
+        weights = []
+        for units, activation in layers:
+            limit = np.sqrt(6 / (input_size + units))
+            weights.append((rng.uniform(-limit, limit, (input_size, units)), np.zeros(units), activation))
+            input_size = units
+        return cls(weights)
+
+    @classmethod
+    def from_keras(cls, model):
+        """Weights of a Keras Sequential model made of Dense (and Dropout) layers"""
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            if kind == 'Dropout':
+                continue
+            if kind != 'Dense':
+                raise ValueError(f'Cannot export {kind} layers')
+            kernel, bias = layer.get_weights()
+            layers.append((kernel, bias, layer.get_config()['activation']))
+        return cls(layers)
+
+    def save(self, path):
+        arrays = {'format_version': np.array(FORMAT_VERSION)}
+        for index, (kernel, bias, activation) in enumerate(self.layers):
+            arrays[f'kernel_{index}'] = kernel
+            arrays[f'bias_{index}'] = bias
+            arrays[f'activation_{index}'] = np.array(activation)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            version = int(arrays['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f'{path} has format version {version}, expected {FORMAT_VERSION}')
+            layers = []
+            index = 0
+            while f'kernel_{index}' in arrays:
+                layers.append((
+                    arrays[f'kernel_{index}'], arrays[f'bias_{index}'], str(arrays[f'activation_{index}'])
+                ))
+                index += 1
+        if not layers:
+            raise ValueError(f'{path} contains no layers')
+        return cls(layers)
@@ -0,0 +1,434 @@
+"""
+Shared inference server.
+
+Model inference used to run in whichever process asked for it, blocking the
+event loop of consumers and loading a copy of every model into each web and
+Celery worker. It now runs in one pool of ``AI_ENGINE['INFERENCE_WORKERS']``
+spawned processes per host, each loading the models once when it starts.
+``manage.py run_inference_server`` (started by ``start.sh``) owns that pool
+and serves it on the Unix socket ``AI_ENGINE['INFERENCE_SOCKET']``; web
+workers and Celery processes are clients of the server, so the number of
+model copies no longer grows with the number of worker processes. Requests
+from one process are pipelined over one connection.
+
+- ``await inference_service.analyze(metrics)`` for async callers; concurrent
+  calls are micro-batched into one request (see ``ai_engine.batching``)
+- ``inference_service.analyze_many(metrics_list)`` for views and Celery tasks
+
+Without a socket configured, each process starts its own pool on first use,
+except daemonic processes such as Celery prefork children, which may not have
+children and run inference in the calling process instead.
+``INFERENCE_WORKERS = 0`` always runs it in the calling process.
+
+At most ``AI_ENGINE['INFERENCE_QUEUE_DEPTH']`` requests are in flight per
+process; beyond that ``InferenceQueueFull`` is raised so callers can shed load
+instead of queueing without bound. ``stats()`` reports request latency
+percentiles over the last ``LATENCY_WINDOW`` requests.
+
+The pool only runs the models. Anomalies are scored against the shared metric
+rollups (``perfmaster.anomaly.baseline_scores``) in the calling process, with
+one query per request, and sent along with it, so pool processes never open
+database connections.
+"""
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import AuthenticationError, Client, Listener, answer_challenge, deliver_challenge
+
+import numpy as np
+from django.conf import settings
+
+from ai_engine.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+# Capabilities every inference worker loads at start
+INFERENCE_CAPABILITIES = ('optimization',)
+LATENCY_WINDOW = 1000
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when AI_ENGINE['INFERENCE_QUEUE_DEPTH'] requests are already in flight"""
+
+
+class InferenceUnavailable(RuntimeError):
+    """Raised when the inference server cannot be reached"""
+
+
+def _initialize_worker():
+    """Pool process start: set up Django and load the models once"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'perfmaster.settings')
+    import django  # Import inside function
+    django.setup()
+
+    from ai_engine.model_loader import warm_up  # Import inside function
+    warm_up(INFERENCE_CAPABILITIES)
+
+
+def _analyze_batch(metrics_list, anomalies=None):
+    from ai_engine.ai_analyzer import ai_analyzer  # Import inside function
+    return ai_analyzer.analyze_performance_metrics_batch(metrics_list, anomalies)
+
+
+def _score_anomalies(metrics_list):
+    """Anomalies of each metrics dict, scored against the shared metric rollups"""
+    from ai_engine.ai_analyzer import ai_analyzer  # Import inside function
+    return ai_analyzer._detect_anomalies_batch(metrics_list)
+
+
+def server_authkey():
+    """Key clients and server prove to each other, derived from SECRET_KEY"""
+    return hashlib.sha256(f'inference:{settings.SECRET_KEY}'.encode()).digest()
+
+
+class InferencePool:
+    """Spawned model processes, started on first use; a broken pool is replaced on the next request"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.restarts = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._executor is not None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: pool processes must not inherit the parent's threads and event loop
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_initialize_worker,
+                )
+                logger.info(f"Started inference pool with {self.workers} workers")
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, metrics_list, anomalies):
+        """Future of one batch; a broken pool is replaced once"""
+        executor = self._pool()
+        try:
+            future = executor.submit(_analyze_batch, metrics_list, anomalies)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self._pool()
+            future = executor.submit(_analyze_batch, metrics_list, anomalies)
+        future.add_done_callback(lambda done: self._check(executor, done))
+        return future
+
+    def _check(self, executor, future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._discard(executor)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class InferenceClient:
+    """One process's connection to the inference server; replies are matched to requests by id"""
+
+    def __init__(self, address):
+        self.address = address
+        self._connection = None
+        self._pending = {}
+        self._pid = None
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self._connection is not None and self._pid == os.getpid()
+
+    def _connect(self):
+        # Forked children (Celery prefork) inherit the object but not the reader thread
+        if self._pid != os.getpid():
+            self._connection, self._pending, self._pid = None, {}, os.getpid()
+        if self._connection is None:
+            try:
+                connection = Client(self.address, family='AF_UNIX', authkey=server_authkey())
+            except (OSError, EOFError, AuthenticationError) as e:
+                raise InferenceUnavailable(f'Inference server at {self.address} is unavailable: {e}')
+            self._connection, self._pending = connection, {}
+            threading.Thread(
+                target=self._read, args=(connection, self._pending), name='inference-client', daemon=True
+            ).start()
+        return self._connection
+
+    def submit(self, metrics_list, anomalies):
+        """Future of one batch sent to the server"""
+        future = Future()
+        with self._lock:
+            connection = self._connect()
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            try:
+                connection.send((request_id, metrics_list, anomalies))
+            except (OSError, EOFError) as e:
+                del self._pending[request_id]
+                if self._connection is connection:
+                    self._connection = None
+                connection.close()
+                raise InferenceUnavailable(f'Lost the inference server at {self.address}: {e}')
+        return future
+
+    def _read(self, connection, pending):
+        try:
+            while True:
+                request_id, succeeded, value = connection.recv()
+                with self._lock:
+                    future = pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if succeeded:
+                    future.set_result(value)
+                else:
+                    future.set_exception(RuntimeError(value))
+        except (OSError, EOFError):
+            pass
+        with self._lock:
+            if self._connection is connection:
+                self._connection = None
+            lost = list(pending.values())
+            pending.clear()
+        for future in lost:
+            future.set_exception(InferenceUnavailable(f'Lost the inference server at {self.address}'))
+
+
+class InferenceServer:
+    """Serves one ``InferencePool`` to every process of the host on a Unix socket"""
+
+    def __init__(self, address, workers):
+        self.address = address
+        self.pool = InferencePool(workers)
+        self._inode = None
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        # Start the pool before accepting requests
+        self.pool.submit([], None).result()
+        # Clients are authenticated on their own thread, so a stalled handshake cannot block accept()
+        with Listener(self.address, family='AF_UNIX') as listener:
+            self._inode = os.stat(self.address).st_ino
+            logger.info(f"Inference server listening on {self.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except OSError as e:
+                    logger.warning(f"Failed to accept an inference client: {e}")
+                    continue
+                threading.Thread(target=self._serve, args=(connection,), name='inference-server', daemon=True).start()
+
+    def _serve(self, connection):
+        """Authenticate one client, then read its requests and reply to each as its batch finishes"""
+        try:
+            authkey = server_authkey()
+            deliver_challenge(connection, authkey)
+            answer_challenge(connection, authkey)
+        except (AuthenticationError, EOFError, OSError) as e:
+            logger.warning(f"Rejected inference client: {e}")
+            connection.close()
+            return
+
+        send_lock = threading.Lock()
+
+        def reply(request_id, future):
+            try:
+                message = (request_id, True, future.result())
+            except Exception as e:
+                message = (request_id, False, f'{type(e).__name__}: {e}')
+            with send_lock:
+                try:
+                    connection.send(message)
+                except (OSError, EOFError):
+                    pass  # Client went away
+
+        try:
+            while True:
+                request_id, metrics_list, anomalies = connection.recv()
+                try:
+                    future = self.pool.submit(metrics_list, anomalies)
+                except Exception as e:
+                    future = Future()
+                    future.set_exception(e)
+                future.add_done_callback(lambda done, request_id=request_id: reply(request_id, done))
+        except (OSError, EOFError):
+            pass
+        finally:
+            with send_lock:
+                connection.close()
+
+    def shutdown(self):
+        self.pool.shutdown()
+        # Leave the socket alone if a newer server has replaced it meanwhile
+        try:
+            if self._inode is not None and os.stat(self.address).st_ino == self._inode:
+                os.unlink(self.address)
+        except FileNotFoundError:
+            pass
+
+
+class InferenceService:
+    """
+    Process-wide inference client: of the server at ``address`` when given,
+    else of a pool of ``workers`` processes; ``workers=0`` runs inference in the calling process
+    """
+
+    def __init__(self, workers=2, address=None, queue_depth=256, timeout=30, max_batch_size=64, window_ms=5):
+        self.workers = workers
+        self.address = address
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.batcher = MicroBatcher(self._run_batch, max_batch_size=max_batch_size, window_ms=window_ms)
+        self.client = InferenceClient(address) if address else None
+        self.pool = InferencePool(workers)
+        self._in_flight = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'timeouts': 0,
+        }
+
+    @property
+    def mode(self):
+        """``server``, ``pool`` or ``in_process``"""
+        if self.client is not None:
+            return 'server'
+        # Daemonic processes (Celery prefork children) may not start a pool
+        if not self.workers or multiprocessing.current_process().daemon:
+            return 'in_process'
+        return 'pool'
+
+    def _submit(self, metrics_list):
+        """Future of one request to the server or the pool"""
+        anomalies = _score_anomalies(metrics_list)
+        if self.client is not None:
+            return self.client.submit(metrics_list, anomalies)
+        return self.pool.submit(metrics_list, anomalies)
+
+    def _result(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self.counters['timeouts'] += 1
+            raise
+
+    def _run_batch(self, metrics_list):
+        if self.mode == 'in_process':
+            return _analyze_batch(metrics_list)
+        return self._result(self._submit(metrics_list))
+
+    def _admit(self, count):
+        with self._lock:
+            if self._in_flight + count > self.queue_depth:
+                self.counters['rejected'] += count
+                raise InferenceQueueFull(
+                    f'Inference queue is full ({self._in_flight} of {self.queue_depth} requests in flight)'
+                )
+            self._in_flight += count
+            self.counters['requests'] += count
+
+    def _finish(self, count, started, failed):
+        latency = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= count
+            self.counters['failed' if failed else 'completed'] += count
+            self._latencies.extend([latency] * count)
+
+    async def analyze(self, metrics):
+        """Analysis of one metrics dict, sharing a request with concurrent callers"""
+        self._admit(1)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await self.batcher.submit(metrics)
+            failed = False
+            return result
+        finally:
+            self._finish(1, started, failed)
+
+    def analyze_many(self, metrics_list):
+        """Blocking analysis of a list of metrics dicts, split into requests of max_batch_size"""
+        count = len(metrics_list)
+        if not count:
+            return []
+        self._admit(count)
+        started = time.perf_counter()
+        failed = True
+        try:
+            chunks = [metrics_list[i:i + self.max_batch_size] for i in range(0, count, self.max_batch_size)]
+            if self.mode == 'in_process':
+                results = [result for chunk in chunks for result in _analyze_batch(chunk)]
+            else:
+                futures = [self._submit(chunk) for chunk in chunks]
+                results = [result for future in futures for result in self._result(future)]
+            failed = False
+            return results
+        finally:
+            self._finish(count, started, failed)
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            stats = {
+                **self.counters,
+                'mode': self.mode,
+                'workers': self.workers,
+                'pool_started': self.pool.started,
+                'pool_restarts': self.pool.restarts,
+                'in_flight': self._in_flight,
+                'queue_depth': self.queue_depth,
+            }
+        if self.client is not None:
+            stats['server'] = {'address': self.address, 'connected': self.client.connected}
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            stats['latency_ms'] = {
+                'p50': round(float(p50), 2),
+                'p95': round(float(p95), 2),
+                'p99': round(float(p99), 2),
+                'max': round(float(latencies.max()), 2),
+                'samples': int(latencies.size),
+            }
+        stats['batcher'] = self.batcher.stats()
+        return stats
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+_ai_config = getattr(settings, 'AI_ENGINE', {})
+inference_service = InferenceService(
+    workers=_ai_config.get('INFERENCE_WORKERS', 2),
+    address=_ai_config.get('INFERENCE_SOCKET') or None,
+    queue_depth=_ai_config.get('INFERENCE_QUEUE_DEPTH', 256),
+    timeout=_ai_config.get('INFERENCE_TIMEOUT', 30),
+    max_batch_size=_ai_config.get('MAX_BATCH_SIZE', 64),
+    window_ms=_ai_config.get('BATCH_WINDOW_MS', 5),
+)
@@ -0,0 +1,121 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.batch_analysis import batch_settings
+from ai_engine.code_analyzer import ANALYZER_VERSION, analyze_source_code
+
+COMPONENT_TEMPLATE = '''import React, {{ useState, useEffect, useCallback }} from 'react';
+import {{ fetchItems }} from '../api/items{index}';
+import './Panel{index}.css';
+
+// Panel {index}: list with filters, don't touch the "legacy" props
+export function Panel{index}({{ items, onSelect, filter }}) {{
+  const [selected, setSelected] = useState(null);
+  const [query, setQuery] = useState('');
+  const pattern = /^[a-z]+\\/{index}$/i;
+  const ratio = items.length / {index} / 2;
+
+  useEffect(() => {{
+    document.title = `Panel {index}: ${{query}}`;
+  }});
+
+  const handleSelect = useCallback((item) => {{
+    setSelected(item.id);
+    onSelect(item);
+  }}, [onSelect]);
+
+  return (
+    <div className="panel-{index}" style={{{{ opacity: ratio }}}}>
+      <input value={{query}} onChange={{(e) => setQuery(e.target.value)}} />
+      <ul>
+        {{items.filter(item => pattern.test(item.name)).map(item => (
+          <li key={{item.id}} onClick={{() => handleSelect(item)}}>{{item.name}}</li>
+        ))}}
+      </ul>
+      {{items.map(item => <span>{{item.label}}</span>)}}
+    </div>
+  );
+}}
+
+'''
+
+
+def synthetic_component(size_bytes, seed=0):
+    """A component file of about ``size_bytes``, made of many small components"""
+    parts = []
+    total = 0
+    index = seed * 100000
+    while total < size_bytes:
+        part = COMPONENT_TEMPLATE.format(index=index)
+        parts.append(part)
+        total += len(part)
+        index += 1
+    return ''.join(parts)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the single-pass code analyzer over a corpus of component files and report throughput per MB'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Files or directories of JS/TS/JSX sources; a synthetic corpus is generated if omitted'
+        )
+        parser.add_argument('--files', type=int, default=20, help='Synthetic corpus: number of files (default 20)')
+        parser.add_argument('--file-kb', type=int, default=256, help='Synthetic corpus: size of each file in KB (default 256)')
+        parser.add_argument('--repeat', type=int, default=3, help='Passes over the corpus; the fastest is reported (default 3)')
+
+    def load_corpus(self, paths):
+        extensions = tuple(batch_settings()['EXTENSIONS'])
+        corpus = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, names in os.walk(path):
+                    dirs[:] = [name for name in dirs if name != 'node_modules' and not name.startswith('.')]
+                    corpus.extend(os.path.join(root, name) for name in names if name.endswith(extensions))
+            elif os.path.isfile(path):
+                corpus.append(path)
+            else:
+                raise CommandError(f'No such file or directory: {path}')
+        sources = []
+        for file_path in sorted(corpus):
+            with open(file_path, encoding='utf-8', errors='replace') as source_file:
+                sources.append(source_file.read())
+        return sources
+
+    def handle(self, *args, **options):
+        if options['paths']:
+            sources = self.load_corpus(options['paths'])
+        else:
+            sources = [synthetic_component(options['file_kb'] * 1024, seed) for seed in range(options['files'])]
+        if not sources:
+            raise CommandError('The corpus has no source files')
+
+        megabytes = sum(len(source.encode('utf-8')) for source in sources) / (1024 * 1024)
+        best = None
+        for _ in range(max(1, options['repeat'])):
+            file_seconds = []
+            tokens = findings = 0
+            for source in sources:
+                start_time = time.perf_counter()
+                analysis = analyze_source_code(source)
+                file_seconds.append(time.perf_counter() - start_time)
+                tokens += analysis.tokens
+                findings += sum(bottleneck['occurrences'] for bottleneck in analysis.bottlenecks)
+            if best is None or sum(file_seconds) < sum(best):
+                best = file_seconds
+        total_seconds = sum(best)
+        per_file_ms = np.array(best) * 1000
+
+        self.stdout.write(f'Analyzer: {ANALYZER_VERSION}')
+        self.stdout.write(f'Corpus: {len(sources)} files, {megabytes:.2f} MB, {tokens} tokens, {findings} findings')
+        self.stdout.write(f'Total: {total_seconds:.3f}s (best of {max(1, options["repeat"])})')
+        self.stdout.write(f'Throughput: {megabytes / total_seconds:.2f} MB/s, {total_seconds / megabytes * 1000:.1f} ms per MB')
+        self.stdout.write(f'Tokens: {tokens / total_seconds / 1e6:.2f} M tokens/s')
+        self.stdout.write(
+            f'Per file: p50 {np.percentile(per_file_ms, 50):.1f} ms, '
+            f'p95 {np.percentile(per_file_ms, 95):.1f} ms, max {per_file_ms.max():.1f} ms'
+        )
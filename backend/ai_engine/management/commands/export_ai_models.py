@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.model_loader import build_optimization_model, model_path
+
+
+class Command(BaseCommand):
+    help = (
+        'Export the optimization model weights to a .npz file for the NumPy inference backend '
+        '(needs TensorFlow; inference does not)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keras-model',
+            help='Trained Keras model to export (.keras/.h5); defaults to a freshly built, untrained model'
+        )
+        parser.add_argument('--output', help='Output .npz path; defaults to the path the NumPy backend loads')
+
+    def handle(self, *args, **options):
+        try:
+            import tensorflow as tf
+        except ImportError:
+            raise CommandError('Exporting needs TensorFlow installed')
+        from ai_engine.dense import DenseNetwork
+
+        if options['keras_model']:
+            model = tf.keras.models.load_model(options['keras_model'])
+        else:
+            self.stdout.write(self.style.WARNING('No --keras-model given, exporting an untrained model'))
+            model = build_optimization_model()
+
+        try:
+            network = DenseNetwork.from_keras(model)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Both runtimes must agree before the weights are used for inference
+        sample = np.random.default_rng(0).random((64, network.input_size), dtype=np.float32)
+        difference = float(np.abs(model.predict(sample, verbose=0) - network.predict(sample)).max())
+        if difference > 1e-4:
+            raise CommandError(f'NumPy forward pass differs from Keras by {difference:g}')
+
+        output = options['output'] or model_path('optimization')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        network.save(output)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(network.layers)} layers to {output} '
+            f'({os.path.getsize(output) / 1024:.1f} KB, max difference {difference:.2g})'
+        ))
@@ -0,0 +1,39 @@
+import signal
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.inference import InferenceServer
+
+
+class Command(BaseCommand):
+    help = 'Serve model inference to the web and Celery processes of this host on a Unix socket'
+
+    def add_arguments(self, parser):
+        ai_config = getattr(settings, 'AI_ENGINE', {})
+        parser.add_argument(
+            '--socket', default=ai_config.get('INFERENCE_SOCKET'),
+            help='Unix socket to listen on (AI_ENGINE INFERENCE_SOCKET by default)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=ai_config.get('INFERENCE_WORKERS', 2),
+            help='Model processes in the pool (AI_ENGINE INFERENCE_WORKERS by default)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError('No socket given and AI_ENGINE INFERENCE_SOCKET is not set')
+        if options['workers'] < 1:
+            raise CommandError('The inference server needs at least one worker')
+
+        server = InferenceServer(options['socket'], options['workers'])
+        # Stop the pool and remove the socket when the container stops
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.stdout.write(f"Serving inference on {options['socket']} with {options['workers']} workers")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
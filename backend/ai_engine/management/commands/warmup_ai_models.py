@@ -0,0 +1,50 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.model_loader import CAPABILITIES, load_report, warm_up
+
+HEAVY_MODULES = ('tensorflow', 'torch', 'transformers')
+
+
+class Command(BaseCommand):
+    help = 'Load AI models ahead of first use and report how long each capability took to load'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'capabilities', nargs='*', metavar='capability',
+            help=f"Capabilities to load ({', '.join(CAPABILITIES)}); all by default"
+        )
+        parser.add_argument(
+            '--report-only', action='store_true',
+            help='Report without loading anything, e.g. to check that a plain boot imports no ML libraries'
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['capabilities']) - set(CAPABILITIES)
+        if unknown:
+            raise CommandError(f"Unknown capabilities: {', '.join(sorted(unknown))}")
+
+        if options['report_only']:
+            report = load_report()
+        else:
+            start_time = time.perf_counter()
+            report = warm_up(options['capabilities'] or None)
+            self.stdout.write(f'Warm-up took {time.perf_counter() - start_time:.2f}s')
+
+        self.stdout.write(f"{'capability':<16} {'status':<8} {'load time':>10}")
+        for capability, entry in report.items():
+            if entry['error']:
+                status = 'failed'
+            else:
+                status = 'loaded' if entry['loaded'] else 'lazy'
+            load_time = f"{entry['load_seconds']:.2f}s" if entry['load_seconds'] is not None else '-'
+            self.stdout.write(f'{capability:<16} {status:<8} {load_time:>10}')
+            if entry['error']:
+                self.stderr.write(f'  {entry["error"]}')
+
+        imported = [name for name in HEAVY_MODULES if name in sys.modules]
+        self.stdout.write(f"Heavy ML modules imported: {', '.join(imported) or 'none'}")
+        if any(entry['error'] for entry in report.values()):
+            raise CommandError('Some AI models failed to load')
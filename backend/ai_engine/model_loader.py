@@ -0,0 +1,175 @@
+"""
+Lazy, per-capability loading of the AI models.
+
+Importing ``ai_engine.ai_analyzer`` used to import TensorFlow, torch and
+transformers and build every model in every process, web workers included.
+Models are now registered here by capability and loaded on first use, once
+per process. Celery worker pools that serve AI tasks list the capabilities to
+load at process start in ``AI_ENGINE['PRELOAD']`` (``AI_PRELOAD`` env var);
+``manage.py warmup_ai_models`` loads them on demand and prints the load-time
+report.
+
+The optimization model runs on the pure-NumPy runtime in ``ai_engine.dense``
+by default (``AI_ENGINE['BACKEND'] = 'numpy'``), from weights exported with
+``manage.py export_ai_models``; ``'tensorflow'`` builds the Keras model instead.
+While no exported weights exist, the NumPy backend serves an untrained network
+of the same architecture, so TensorFlow is never imported unless configured.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModel:
+    """A model built by ``loader()`` on first ``get()``; a failed load is remembered, not retried per call"""
+
+    def __init__(self, capability, loader):
+        self.capability = capability
+        self.loader = loader
+        self._model = None
+        self._error = None
+        self._load_seconds = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        if self._model is not None or self._error is not None:
+            return self._model
+        with self._lock:
+            if self._model is None and self._error is None:
+                start_time = time.perf_counter()
+                try:
+                    self._model = self.loader()
+                except Exception as e:
+                    self._error = str(e)
+                    logger.error(f"Failed to load AI model for {self.capability}: {e}")
+                self._load_seconds = time.perf_counter() - start_time
+                self._loaded_at = time.time()
+                if self._model is not None:
+                    logger.info(f"Loaded AI model for {self.capability} in {self._load_seconds:.2f}s")
+        return self._model
+
+    def reset(self):
+        """Forget the model (or the failure) so the next ``get()`` loads again"""
+        with self._lock:
+            self._model = None
+            self._error = None
+            self._load_seconds = None
+            self._loaded_at = None
+
+    def report(self):
+        return {
+            'loaded': self.loaded,
+            'load_seconds': round(self._load_seconds, 3) if self._load_seconds is not None else None,
+            'loaded_at': self._loaded_at,
+            'error': self._error,
+        }
+
+
+def _load_code_classifier():
+    from transformers import pipeline  # Import inside function
+
+    return pipeline(
+        "text-classification",
+        model="microsoft/codebert-base",
+        tokenizer="microsoft/codebert-base"
+    )
+
+
+def model_path(name):
+    return os.path.join(getattr(settings, 'AI_ENGINE', {}).get('MODEL_DIR', 'ai_models'), f'{name}.npz')
+
+
+# Input size and Dense layers of build_optimization_model, for the untrained NumPy fallback
+OPTIMIZATION_INPUTS = 15
+OPTIMIZATION_LAYERS = ((128, 'relu'), (64, 'relu'), (32, 'relu'), (10, 'softmax'))
+
+
+def build_optimization_model():
+    """The Keras optimization model; used for training and export, and by the tensorflow backend"""
+    import tensorflow as tf  # Import inside function
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Dense(128, activation='relu', input_shape=(15,)),
+        tf.keras.layers.Dropout(0.3),
+        tf.keras.layers.Dense(64, activation='relu'),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(32, activation='relu'),
+        tf.keras.layers.Dense(10, activation='softmax')  # 10 optimization categories
+    ])
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def _load_optimization_model():
+    if getattr(settings, 'AI_ENGINE', {}).get('BACKEND', 'numpy') == 'tensorflow':
+        return build_optimization_model()
+
+    from ai_engine.dense import DenseNetwork  # Import inside function
+
+    path = model_path('optimization')
+    if not os.path.exists(path):
+        # No exported weights shipped with this deployment yet: same architecture, untrained
+        logger.warning(
+            f"{path} not found; using an untrained optimization model (run manage.py export_ai_models)"
+        )
+        return DenseNetwork.initialized(OPTIMIZATION_INPUTS, OPTIMIZATION_LAYERS)
+    return DenseNetwork.load(path)
+
+
+# capability -> model; ``get_model`` loads on first use
+MODELS = {
+    'code_analysis': LazyModel('code_analysis', _load_code_classifier),
+    'optimization': LazyModel('optimization', _load_optimization_model),
+}
+CAPABILITIES = tuple(MODELS)
+
+
+def get_model(capability):
+    """The capability's model, loading it in this process if needed; None if it failed to load"""
+    return MODELS[capability].get()
+
+
+def warm_up(capabilities=None):
+    """Load the given capabilities (all by default) and return the load-time report"""
+    for capability in capabilities or CAPABILITIES:
+        get_model(capability)
+    return load_report()
+
+
+def load_report():
+    return {capability: model.report() for capability, model in MODELS.items()}
+
+
+def preload_capabilities():
+    """Configured capabilities to load at worker process start, unknown names dropped with a warning"""
+    capabilities = []
+    for capability in getattr(settings, 'AI_ENGINE', {}).get('PRELOAD', []):
+        if capability in MODELS:
+            capabilities.append(capability)
+        else:
+            logger.warning(f"Ignoring unknown AI capability in AI_ENGINE['PRELOAD']: {capability}")
+    return capabilities
+
+
+def preload_configured():
+    """Worker process start hook: load AI_ENGINE['PRELOAD'] and log how long it took"""
+    capabilities = preload_capabilities()
+    if not capabilities:
+        logger.info("No AI models preloaded; they load on first use")
+        return {}
+    start_time = time.perf_counter()
+    report = warm_up(capabilities)
+    logger.info(
+        f"Preloaded AI models {', '.join(capabilities)} in {time.perf_counter() - start_time:.2f}s"
+    )
+    return report
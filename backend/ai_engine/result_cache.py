@@ -0,0 +1,155 @@
+"""
+Result cache for component analyses.
+
+CI re-submits the same component source over and over. Analyses are keyed by
+a sha256 of (source, framework version, analysis type, ``ANALYZER_VERSION``);
+a hit returns the stored bottlenecks/suggestions without running the
+analyzer, and the new AIAnalysisResults row points at the analysis that
+produced them (``cached_from``). Bump ``ANALYZER_VERSION`` whenever the
+analyzer's output changes, so old entries stop matching.
+
+The store is bounded: entries older than ``ANALYSIS_CACHE['TTL_DAYS']`` are
+ignored, and once it holds more than ``ANALYSIS_CACHE['MAX_ENTRIES']`` the
+least recently used entries are evicted.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from ai_engine.code_analyzer import ANALYZER_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def cache_settings():
+    config = {
+        'MAX_ENTRIES': 10000,
+        'TTL_DAYS': 30,
+    }
+    config.update(getattr(settings, 'ANALYSIS_CACHE', {}))
+    return config
+
+
+def content_hash(source_code, framework_version, analysis_type, analyzer_version=ANALYZER_VERSION):
+    digest = hashlib.sha256()
+    for part in (analyzer_version, framework_version, analysis_type, source_code):
+        encoded = (part or '').encode('utf-8')
+        # Length prefixes keep ('ab', 'c') and ('a', 'bc') apart
+        digest.update(f'{len(encoded)}:'.encode('ascii'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def lookup(key):
+    """The live cache entry for ``key``, counting the hit, or None"""
+    from perfmaster.models import AnalysisCacheEntry  # Import inside function
+
+    ttl_days = cache_settings()['TTL_DAYS']
+    entries = AnalysisCacheEntry.objects.filter(content_hash=key, analyzer_version=ANALYZER_VERSION)
+    if ttl_days:
+        entries = entries.filter(created_at__gte=timezone.now() - timedelta(days=ttl_days))
+    entry = entries.first()
+    if entry is not None:
+        AnalysisCacheEntry.objects.filter(pk=key).update(hit_count=F('hit_count') + 1, last_used_at=timezone.now())
+    return entry
+
+
+def store(key, analysis, component_name, performance_score, dependencies):
+    """Cache a completed analysis, then evict if the store is over its size limit"""
+    from perfmaster.models import AnalysisCacheEntry  # Import inside function
+
+    values = {
+        'analyzer_version': ANALYZER_VERSION,
+        'analysis': analysis,
+        'bottlenecks': analysis.bottlenecks,
+        'suggestions': analysis.suggestions,
+        'confidence_score': analysis.confidence_score,
+        'component_name': component_name,
+        'performance_score': performance_score,
+        'dependencies': dependencies,
+        'hit_count': 0,
+        'created_at': timezone.now(),
+        'last_used_at': timezone.now(),
+    }
+    try:
+        AnalysisCacheEntry.objects.update_or_create(content_hash=key, defaults=values)
+    except IntegrityError:
+        # A concurrent identical analysis stored it first
+        return
+    evict()
+
+
+def evict():
+    """Drop expired entries and the least recently used ones beyond MAX_ENTRIES; returns how many"""
+    from perfmaster.models import AnalysisCacheEntry  # Import inside function
+
+    config = cache_settings()
+    removed = 0
+    if config['TTL_DAYS']:
+        removed += AnalysisCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=config['TTL_DAYS'])
+        ).delete()[0]
+    excess = AnalysisCacheEntry.objects.count() - config['MAX_ENTRIES']
+    if excess > 0:
+        # Evict a tenth extra so every store past the limit does not evict again
+        stale = AnalysisCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[
+            :excess + config['MAX_ENTRIES'] // 10
+        ]
+        removed += AnalysisCacheEntry.objects.filter(pk__in=list(stale)).delete()[0]
+    if removed:
+        logger.info(f"Evicted {removed} analysis cache entries")
+    return removed
+
+
+def lookup_many(keys):
+    """{content_hash: live entry} for the keys that hit, counting the hits"""
+    from perfmaster.models import AnalysisCacheEntry  # Import inside function
+
+    entries = AnalysisCacheEntry.objects.filter(content_hash__in=list(keys), analyzer_version=ANALYZER_VERSION)
+    ttl_days = cache_settings()['TTL_DAYS']
+    if ttl_days:
+        entries = entries.filter(created_at__gte=timezone.now() - timedelta(days=ttl_days))
+    found = {entry.content_hash: entry for entry in entries}
+    if found:
+        AnalysisCacheEntry.objects.filter(pk__in=list(found)).update(
+            hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+        )
+    return found
+
+
+def store_many(results):
+    """Cache completed analyses in one insert; ``results`` holds (key, analysis, component_name, performance_score, dependencies)"""
+    from perfmaster.models import AnalysisCacheEntry  # Import inside function
+
+    now = timezone.now()
+    entries = {
+        key: AnalysisCacheEntry(
+            content_hash=key,
+            analyzer_version=ANALYZER_VERSION,
+            analysis=analysis,
+            bottlenecks=analysis.bottlenecks,
+            suggestions=analysis.suggestions,
+            confidence_score=analysis.confidence_score,
+            component_name=component_name,
+            performance_score=performance_score,
+            dependencies=dependencies,
+            created_at=now,
+            last_used_at=now,
+        )
+        for key, analysis, component_name, performance_score, dependencies in results
+    }
+    if not entries:
+        return
+    # Expired entries with the same key are replaced; live ones stored concurrently are kept
+    ttl_days = cache_settings()['TTL_DAYS']
+    if ttl_days:
+        AnalysisCacheEntry.objects.filter(
+            pk__in=list(entries), created_at__lt=now - timedelta(days=ttl_days)
+        ).delete()
+    AnalysisCacheEntry.objects.bulk_create(entries.values(), ignore_conflicts=True)
+    evict()
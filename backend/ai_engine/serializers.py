@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from perfmaster.models import AIAnalysisResults, OptimizationSuggestions, Project
+from perfmaster.models import AIAnalysisResults, AnalysisJob, OptimizationSuggestions, Project
+from .batch_analysis import ArchiveError, batch_settings, read_archive
 
 
 class AIAnalysisResultsSerializer(serializers.ModelSerializer):
@@ -11,9 +12,12 @@ class AIAnalysisResultsSerializer(serializers.ModelSerializer):
         fields = [
             'analysis_id', 'project', 'project_name', 'component_id',
             'bottlenecks', 'suggestions', 'confidence_score', 'model_used',
-            'status', 'processing_time', 'created_at', 'suggestions_count'
+            'status', 'processing_time', 'created_at', 'suggestions_count',
+            'content_hash', 'from_cache', 'cached_from'
+        ]
+        read_only_fields = [
+            'analysis_id', 'created_at', 'processing_time', 'content_hash', 'from_cache', 'cached_from'
         ]
-        read_only_fields = ['analysis_id', 'created_at', 'processing_time']
 
     def get_suggestions_count(self, obj):
         # obj.suggestions is a JSONField (list), so use len() instead of count()
@@ -56,6 +60,68 @@ class ComponentAnalysisRequestSerializer(serializers.Serializer):
     )
 
 
+class BatchAnalysisFileSerializer(serializers.Serializer):
+    """One file of a batch analysis request"""
+    path = serializers.CharField(max_length=500)
+    source_code = serializers.CharField()
+
+
+class BatchAnalysisRequestSerializer(serializers.Serializer):
+    """Serializer for batch analysis requests: a list of files or a tarball of them"""
+    project_id = serializers.CharField(max_length=100)
+    files = BatchAnalysisFileSerializer(many=True, required=False)
+    archive = serializers.FileField(required=False)
+    framework_version = serializers.CharField(max_length=50, default='React 18')
+    analysis_type = serializers.ChoiceField(
+        choices=['full', 'performance', 'optimization', 'security'],
+        default='full'
+    )
+    chunk_size = serializers.IntegerField(min_value=1, max_value=500, required=False)
+    # Treat the files as the whole project: skip unchanged ones and mark missing ones removed
+    incremental = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if ('files' in attrs) == ('archive' in attrs):
+            raise serializers.ValidationError('Provide either files or archive')
+        attrs['oversized_files'] = 0
+        if 'archive' in attrs:
+            try:
+                attrs['files'], attrs['oversized_files'] = read_archive(attrs.pop('archive'))
+            except ArchiveError as e:
+                raise serializers.ValidationError({'archive': str(e)})
+        if not attrs['files']:
+            raise serializers.ValidationError({'files': 'No source files to analyze'})
+        max_files = batch_settings()['MAX_FILES']
+        if len(attrs['files']) > max_files:
+            raise serializers.ValidationError({'files': f'At most {max_files} files per batch'})
+        return attrs
+
+
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    project_id = serializers.CharField(source='project.project_id', read_only=True)
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = AnalysisJob
+        fields = [
+            'job_id', 'project_id', 'status', 'framework_version', 'analysis_type',
+            'incremental', 'skipped_files', 'removed_files', 'time_saved',
+            'total_files', 'processed_files', 'failed_files', 'cached_files',
+            'total_chunks', 'completed_chunks', 'progress', 'errors',
+            'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+
+class MetricsAnalysisRequestSerializer(serializers.Serializer):
+    """Serializer for performance metrics analysis requests"""
+    metrics = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        max_length=1000
+    )
+
+
 class OptimizationApplicationSerializer(serializers.Serializer):
     """Serializer for applying optimization suggestions"""
     suggestion_ids = serializers.ListField(
@@ -1,13 +1,18 @@
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
 import json
 import time
 import uuid
 from perfmaster.models import (
-    AIAnalysisResults, OptimizationSuggestions, Project, ComponentAnalysis
+    AIAnalysisResults, AnalysisJob, OptimizationSuggestions, Project, ComponentAnalysis
 )
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
+from perfmaster.lookups import project_cache, username_cache
+from .code_analyzer import analyze_source_code
+from .inference import inference_service
+from . import result_cache
 
 User = get_user_model()
 
@@ -20,57 +25,35 @@ def analyze_component_performance(self, project_id, component_path, source_code,
     start_time = time.time()
     
     try:
-        # Get or create a system user for projects
-        user, user_created = User.objects.get_or_create(
-            username='system',
-            defaults={
-                'email': 'system@perfmaster.local',
-                'password': make_password('system123'),  # Hash the password
-                'is_active': True,
-                'is_staff': False,
-                'is_superuser': False
-            }
-        )
-        
-        if user_created:
-            print(f"Created system user: {user.username}")
-        
-        # Get or create project
-        project, created = Project.objects.get_or_create(
-            project_id=project_id,
-            defaults={
-                'name': f'Project {project_id}',
-                'framework_version': framework_version,
-                'repository_url': '',
-                'branch': 'main',
-                'performance_config': {},
-                'ai_settings': {},
-                'created_by': user  # Use the system user
-            }
-        )
+        project = get_system_project(project_id, framework_version)
         
-        if created:
-            print(f"Created new project: {project_id}")
+        # Identical source analyzed before: reuse that result instead of recomputing
+        content_hash = result_cache.content_hash(source_code, framework_version, analysis_type)
+        cached = result_cache.lookup(content_hash)
+        if cached is not None:
+            return reuse_cached_analysis(cached, project, component_path, start_time)
         
         # Create analysis record
         analysis = AIAnalysisResults.objects.create(
             project=project,
             component_id=component_path,
             status='processing',
-            model_used='rule_based_analyzer_v1',  # Will be updated when AI models are integrated
-            confidence_score=0.0
+            model_used=result_cache.ANALYZER_VERSION,  # Will be updated when AI models are integrated
+            confidence_score=0.0,
+            content_hash=content_hash
         )
         
         print(f"Created analysis record: {analysis.analysis_id}")
         
         # Simulate AI analysis (replace with actual AI integration)
-        bottlenecks = analyze_code_bottlenecks(source_code, framework_version)
-        suggestions = generate_optimization_suggestions(source_code, bottlenecks, framework_version)
+        result = analyze_source(source_code, framework_version)
+        bottlenecks = result['bottlenecks']
+        suggestions = result['suggestions']
         
         print(f"Found {len(bottlenecks)} bottlenecks and {len(suggestions)} suggestions")
         
         # Calculate confidence score based on analysis results
-        confidence_score = calculate_confidence_score(bottlenecks, suggestions)
+        confidence_score = result['confidence_score']
         
         # Update analysis results
         analysis.bottlenecks = bottlenecks
@@ -78,34 +61,20 @@ def analyze_component_performance(self, project_id, component_path, source_code,
         analysis.confidence_score = confidence_score
         analysis.status = 'completed'
         analysis.processing_time = time.time() - start_time
-        analysis.save()
         
-        print(f"Analysis completed: {analysis.analysis_id}")
-        
-        # Create optimization suggestions
-        for suggestion_data in suggestions:
-            OptimizationSuggestions.objects.create(
-                analysis=analysis,
-                type=suggestion_data['type'],
-                description=suggestion_data['description'],
-                code_changes=suggestion_data.get('code_changes', {}),
-                impact_estimate=suggestion_data.get('impact_estimate', {}),
-                priority=suggestion_data.get('priority', 3)
+        # Results, suggestions, component row and cache entry are written together, in a
+        # fixed number of queries however many suggestions there are
+        with transaction.atomic():
+            analysis.save(update_fields=['bottlenecks', 'suggestions', 'confidence_score', 'status', 'processing_time'])
+            OptimizationSuggestions.objects.bulk_create(build_suggestion_rows(analysis, suggestions))
+            upsert_components([
+                build_component_row(project, component_path, result, content_hash, analysis.processing_time)
+            ])
+            result_cache.store(
+                content_hash, analysis, result['component_name'], result['performance_score'], result['dependencies']
             )
         
-        # Update component analysis
-        ComponentAnalysis.objects.update_or_create(
-            project=project,
-            file_path=component_path,
-            defaults={
-                'component_name': extract_component_name(source_code),
-                'performance_score': calculate_performance_score(bottlenecks),
-                'optimization_opportunities': [s['type'] for s in suggestions],
-                'dependencies': extract_dependencies(source_code)
-            }
-        )
-        
-        print(f"Component analysis updated for {component_path}")
+        print(f"Analysis completed: {analysis.analysis_id}")
         
         return {
             'analysis_id': str(analysis.analysis_id),
@@ -113,11 +82,14 @@ def analyze_component_performance(self, project_id, component_path, source_code,
             'bottlenecks_found': len(bottlenecks),
             'suggestions_generated': len(suggestions),
             'confidence_score': confidence_score,
-            'processing_time': analysis.processing_time
+            'processing_time': analysis.processing_time,
+            'from_cache': False
         }
         
     except Exception as e:
         print(f"Analysis failed: {str(e)}")
+        # The project may have been deleted by another process since it was cached
+        project_cache.invalidate(project_id)
         # Update analysis status to failed
         if 'analysis' in locals():
             analysis.status = 'failed'
@@ -127,16 +99,309 @@ def analyze_component_performance(self, project_id, component_path, source_code,
         raise self.retry(exc=e, countdown=60, max_retries=3)
 
 
+def reuse_cached_analysis(entry, project, component_path, start_time):
+    """
+    Record a cache hit as a completed analysis that points at the analysis it reuses
+    """
+    result = cached_result(entry)
+    with transaction.atomic():
+        analysis = AIAnalysisResults.objects.create(
+            project=project,
+            component_id=component_path,
+            status='completed',
+            model_used=entry.analyzer_version,
+            bottlenecks=entry.bottlenecks,
+            suggestions=entry.suggestions,
+            confidence_score=entry.confidence_score,
+            processing_time=time.time() - start_time,
+            content_hash=entry.content_hash,
+            from_cache=True,
+            cached_from_id=entry.analysis_id
+        )
+        upsert_components([
+            build_component_row(project, component_path, result, entry.content_hash, analysis.processing_time)
+        ])
+    
+    print(f"Reused cached analysis for {component_path}: {analysis.analysis_id}")
+    
+    return {
+        'analysis_id': str(analysis.analysis_id),
+        'status': 'completed',
+        'bottlenecks_found': len(entry.bottlenecks),
+        'suggestions_generated': len(entry.suggestions),
+        'confidence_score': entry.confidence_score,
+        'processing_time': analysis.processing_time,
+        'from_cache': True,
+        'cached_from': str(entry.analysis_id) if entry.analysis_id else None
+    }
+
+
+def cached_result(entry):
+    """
+    An AnalysisCacheEntry in the shape ``analyze_source`` returns
+    """
+    return {
+        'bottlenecks': entry.bottlenecks,
+        'suggestions': entry.suggestions,
+        'confidence_score': entry.confidence_score,
+        'component_name': entry.component_name,
+        'performance_score': entry.performance_score,
+        'dependencies': entry.dependencies
+    }
+
+
+def build_suggestion_rows(analysis, suggestions):
+    """
+    Unsaved OptimizationSuggestions rows for an analysis' suggestion dicts
+    """
+    return [
+        OptimizationSuggestions(
+            analysis=analysis,
+            type=suggestion_data['type'],
+            description=suggestion_data['description'],
+            code_changes=suggestion_data.get('code_changes', {}),
+            impact_estimate=suggestion_data.get('impact_estimate', {}),
+            priority=suggestion_data.get('priority', 3)
+        )
+        for suggestion_data in suggestions
+    ]
+
+
+def build_component_row(project, file_path, result, content_hash, processing_time):
+    """
+    Unsaved ComponentAnalysis row for an ``analyze_source`` result, to pass to ``upsert_components``
+    """
+    return ComponentAnalysis(
+        project=project,
+        file_path=file_path,
+        component_name=result['component_name'],
+        performance_score=result['performance_score'],
+        optimization_opportunities=[s['type'] for s in result['suggestions']],
+        dependencies=result['dependencies'],
+        content_hash=content_hash,
+        analyzer_version=result_cache.ANALYZER_VERSION,
+        processing_time=processing_time,
+        removed_at=None
+    )
+
+
+# ComponentAnalysis columns refreshed when a component is analyzed again
+COMPONENT_UPSERT_FIELDS = [
+    'component_name', 'performance_score', 'optimization_opportunities', 'dependencies',
+    'content_hash', 'analyzer_version', 'processing_time', 'removed_at', 'updated_at'
+]
+
+
+def upsert_components(components):
+    """
+    Insert or update ComponentAnalysis rows by (project, file_path) in one query.
+    The last row given for a path wins; one statement cannot update a row twice.
+    """
+    components = list({(component.project_id, component.file_path): component for component in components}.values())
+    ComponentAnalysis.objects.bulk_create(
+        components,
+        update_conflicts=True,
+        unique_fields=['project', 'file_path'],
+        update_fields=COMPONENT_UPSERT_FIELDS
+    )
+
+
+SYSTEM_USERNAME = 'system'
+
+
+def get_system_user_id():
+    """
+    Id of the user owning projects created by analyses, created on first use; cached per process
+    """
+    user_id = username_cache.get(SYSTEM_USERNAME)
+    if user_id is not None:
+        return user_id
+    
+    user, user_created = User.objects.get_or_create(
+        username=SYSTEM_USERNAME,
+        defaults={
+            'email': 'system@perfmaster.local',
+            'password': make_password(None),  # Unusable: nobody logs in as the system user
+            'is_active': True,
+            'is_staff': False,
+            'is_superuser': False
+        }
+    )
+    
+    if user_created:
+        print(f"Created system user: {user.username}")
+    
+    username_cache.invalidate(SYSTEM_USERNAME)
+    return user.pk
+
+
+def get_system_project(project_id, framework_version='React 18'):
+    """
+    Get or create a project owned by the system user, for analyses submitted without an account.
+    Known projects come from the process-wide project cache without a query; the returned
+    instance has only the cached fields loaded, which is all the analysis tasks use.
+    """
+    row = project_cache.get(project_id)
+    if row is not None:
+        field_names = [field.attname for field in Project._meta.concrete_fields if field.attname in row]
+        return Project.from_db('default', field_names, [row[name] for name in field_names])
+    
+    project, created = Project.objects.get_or_create(
+        project_id=project_id,
+        defaults={
+            'name': f'Project {project_id}',
+            'framework_version': framework_version,
+            'repository_url': '',
+            'branch': 'main',
+            'performance_config': {},
+            'ai_settings': {},
+            'created_by_id': get_system_user_id()  # Use the system user
+        }
+    )
+    
+    if created:
+        print(f"Created new project: {project_id}")
+    
+    # Forget the cached miss so the next task finds the project in the cache
+    project_cache.invalidate(project_id)
+    return project
+
+
+def analyze_source(source_code, framework_version):
+    """
+    Everything the rule-based analyzer derives from one source file, in a single pass over it
+    """
+    code_analysis = analyze_source_code(source_code)
+    bottlenecks = code_analysis.bottlenecks
+    suggestions = generate_optimization_suggestions(source_code, bottlenecks, framework_version)
+    return {
+        'bottlenecks': bottlenecks,
+        'suggestions': suggestions,
+        'confidence_score': calculate_confidence_score(bottlenecks, suggestions),
+        'component_name': code_analysis.component_name,
+        'performance_score': calculate_performance_score(bottlenecks),
+        'dependencies': code_analysis.dependencies
+    }
+
+
+# Per-file errors kept on an AnalysisJob, so a broken upload cannot grow the row without bound
+MAX_JOB_ERRORS = 100
+
+
+@shared_task(bind=True)
+def analyze_component_chunk(self, job_id, files):
+    """
+    Analyze one chunk of an AnalysisJob: files are [{'path', 'source_code'}], and the
+    chunk's results, suggestions and component rows are written in bulk in one transaction
+    """
+    job = AnalysisJob.objects.select_related('project').get(job_id=job_id)
+    AnalysisJob.objects.filter(job_id=job_id, status='pending').update(status='running', started_at=timezone.now())
+    project = job.project
+    
+    try:
+        keys = {
+            file['path']: result_cache.content_hash(file['source_code'], job.framework_version, job.analysis_type)
+            for file in files
+        }
+        cached = result_cache.lookup_many(set(keys.values()))
+        
+        analyses = []
+        suggestion_rows = []
+        components = []
+        new_entries = []
+        errors = []
+        for file in files:
+            path = file['path']
+            key = keys[path]
+            start_time = time.time()
+            entry = cached.get(key)
+            try:
+                result = analyze_source(file['source_code'], job.framework_version) if entry is None else cached_result(entry)
+            except Exception as e:
+                errors.append({'file_path': path, 'error': str(e)})
+                continue
+            
+            analysis = AIAnalysisResults(
+                project=project,
+                component_id=path,
+                status='completed',
+                model_used=result_cache.ANALYZER_VERSION,
+                bottlenecks=result['bottlenecks'],
+                suggestions=result['suggestions'],
+                confidence_score=result['confidence_score'],
+                processing_time=time.time() - start_time,
+                content_hash=key,
+                from_cache=entry is not None,
+                cached_from_id=entry.analysis_id if entry is not None else None
+            )
+            analyses.append(analysis)
+            components.append(build_component_row(project, path, result, key, analysis.processing_time))
+            if entry is None:
+                suggestion_rows.extend(build_suggestion_rows(analysis, result['suggestions']))
+                new_entries.append(
+                    (key, analysis, result['component_name'], result['performance_score'], result['dependencies'])
+                )
+        
+        with transaction.atomic():
+            AIAnalysisResults.objects.bulk_create(analyses)
+            OptimizationSuggestions.objects.bulk_create(suggestion_rows)
+            upsert_components(components)
+            result_cache.store_many(new_entries)
+            record_chunk_progress(job_id, len(analyses), len(analyses) - len(new_entries), errors)
+        
+        return {
+            'job_id': job_id,
+            'analyzed': len(analyses),
+            'from_cache': len(analyses) - len(new_entries),
+            'failed': len(errors)
+        }
+    
+    except Exception as e:
+        print(f"Analysis chunk of job {job_id} failed: {str(e)}")
+        if self.request.retries >= 3:
+            # Out of retries: count the whole chunk as failed so the job still finishes
+            record_chunk_progress(job_id, 0, 0, [{'file_path': file['path'], 'error': str(e)} for file in files])
+            raise
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+def record_chunk_progress(job_id, processed, cached, errors):
+    """
+    Add a finished chunk's counts to its AnalysisJob, completing the job after the last chunk
+    """
+    with transaction.atomic():
+        job = AnalysisJob.objects.select_for_update().get(job_id=job_id)
+        job.processed_files += processed
+        job.cached_files += cached
+        job.failed_files += len(errors)
+        job.errors = (job.errors + errors)[:MAX_JOB_ERRORS]
+        job.completed_chunks += 1
+        if job.completed_chunks >= job.total_chunks:
+            job.status = 'completed' if job.processed_files or not job.failed_files else 'failed'
+            job.completed_at = timezone.now()
+        job.save(update_fields=[
+            'processed_files', 'cached_files', 'failed_files', 'errors', 'completed_chunks', 'status', 'completed_at'
+        ])
+
+
+@shared_task
+def analyze_metrics_batch(metrics_list):
+    """
+    Run the performance models over a list of metrics dicts in the inference pool
+    """
+    return inference_service.analyze_many(metrics_list)
+
+
 @shared_task(bind=True)
 def apply_optimization_suggestions(self, suggestion_ids, auto_apply=False, create_backup=True, user_id=None):
     """
     Apply optimization suggestions to codebase
     """
     try:
-        suggestions = OptimizationSuggestions.objects.filter(
+        suggestions = list(OptimizationSuggestions.objects.filter(
             suggestion_id__in=suggestion_ids,
             status__in=['pending', 'testing']
-        )
+        ))
         
         results = []
         
@@ -158,8 +423,6 @@ def apply_optimization_suggestions(self, suggestion_ids, auto_apply=False, creat
                     # Manual application - just mark as ready for review
                     suggestion.status = 'testing'
                 
-                suggestion.save()
-                
                 results.append({
                     'suggestion_id': str(suggestion.suggestion_id),
                     'status': suggestion.status,
@@ -169,7 +432,6 @@ def apply_optimization_suggestions(self, suggestion_ids, auto_apply=False, creat
                 
             except Exception as e:
                 suggestion.status = 'rejected'
-                suggestion.save()
                 
                 results.append({
                     'suggestion_id': str(suggestion.suggestion_id),
@@ -177,6 +439,9 @@ def apply_optimization_suggestions(self, suggestion_ids, auto_apply=False, creat
                     'error': str(e)
                 })
         
+        # All status changes in one UPDATE
+        OptimizationSuggestions.objects.bulk_update(suggestions, ['status', 'applied_at'])
+        
         return {
             'total_suggestions': len(suggestion_ids),
             'successful_applications': len([r for r in results if r.get('applied', False)]),
@@ -190,46 +455,9 @@ def apply_optimization_suggestions(self, suggestion_ids, auto_apply=False, creat
 def analyze_code_bottlenecks(source_code, framework_version):
     """
     Analyze source code for performance bottlenecks
-    This is a simplified rule-based analyzer - will be replaced with AI models
+    Rule-based (see ai_engine.code_analyzer) - will be replaced with AI models
     """
-    bottlenecks = []
-    
-    # Check for common React performance issues
-    if 'useEffect' in source_code and 'dependencies' not in source_code:
-        bottlenecks.append({
-            'type': 'missing_dependencies',
-            'severity': 'medium',
-            'description': 'useEffect hook missing dependency array',
-            'line_number': source_code.find('useEffect'),
-            'suggestion': 'Add dependency array to useEffect'
-        })
-    
-    if source_code.count('useState') > 5:
-        bottlenecks.append({
-            'type': 'excessive_state',
-            'severity': 'medium',
-            'description': 'Component has too many useState hooks',
-            'suggestion': 'Consider using useReducer or state management library'
-        })
-    
-    if 'map(' in source_code and 'key=' not in source_code:
-        bottlenecks.append({
-            'type': 'missing_keys',
-            'severity': 'high',
-            'description': 'Missing keys in list rendering',
-            'suggestion': 'Add unique keys to list items'
-        })
-    
-    # Check for inline functions in JSX
-    if '.bind(' in source_code or '=>' in source_code:
-        bottlenecks.append({
-            'type': 'inline_functions',
-            'severity': 'low',
-            'description': 'Inline functions in render may cause unnecessary re-renders',
-            'suggestion': 'Move functions outside render or use useCallback'
-        })
-    
-    return bottlenecks
+    return analyze_source_code(source_code).bottlenecks
 
 
 def generate_optimization_suggestions(source_code, bottlenecks, framework_version):
@@ -351,32 +579,12 @@ def calculate_performance_score(bottlenecks):
 
 def extract_component_name(source_code):
     """Extract component name from source code"""
-    # Simple regex to find component name
-    import re
-    
-    # Look for function component
-    match = re.search(r'function\s+(\w+)', source_code)
-    if match:
-        return match.group(1)
-    
-    # Look for arrow function component
-    match = re.search(r'const\s+(\w+)\s*=', source_code)
-    if match:
-        return match.group(1)
-    
-    return 'UnknownComponent'
+    return analyze_source_code(source_code).component_name
 
 
 def extract_dependencies(source_code):
     """Extract component dependencies"""
-    dependencies = []
-    
-    # Look for imports
-    import re
-    imports = re.findall(r'import.*from\s+[\'"]([^\'"]+)[\'"]', source_code)
-    dependencies.extend(imports)
-    
-    return dependencies
+    return analyze_source_code(source_code).dependencies
 
 
 def create_code_backup(suggestion):
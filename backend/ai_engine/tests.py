@@ -0,0 +1,101 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from perfmaster.lookups import project_cache, username_cache
+from perfmaster.models import OptimizationSuggestions
+
+from .tasks import analyze_component_performance, apply_optimization_suggestions
+
+PROJECT_ID = 'query-count-project'
+
+# One suggestion: the effect without a dependency array
+FEW_SUGGESTIONS = '''
+export function Counter() {
+  useEffect(() => { document.title = 'count'; });
+  return null;
+}
+'''
+
+# Triggers every rule, so the analysis stores several bottlenecks and suggestions
+MANY_SUGGESTIONS = '''
+export default function TodoList({ items }) {
+  const [a] = useState(0);
+  const [b] = useState(0);
+  const [c] = useState(0);
+  const [d] = useState(0);
+  const [e] = useState(0);
+  const [f] = useState(0);
+  useEffect(() => { document.title = items.length; });
+  return <ul onClick={() => setA(a + 1)}>{items.map(item => <li>{item}</li>)}</ul>;
+}
+''' + '// padding\n' * 100
+
+
+class PersistenceQueryCountTests(TestCase):
+    """
+    Analysis results and suggestion status changes are written in bulk, so the
+    number of queries does not grow with the number of suggestions.
+    """
+
+    def setUp(self):
+        # The lookup caches are process-wide and would keep rows rolled back with earlier tests
+        for cache in (project_cache, username_cache):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        # Creates the project and fills the per-process lookups, so every measured run starts warm
+        self.analyze('src/Warmup.jsx', 'const warmup = 1;')
+        project_cache.get(PROJECT_ID)
+
+    def analyze(self, component_path, source_code):
+        return analyze_component_performance.run(PROJECT_ID, component_path, source_code)
+
+    def count_queries(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        return result, len(context.captured_queries)
+
+    def suggestion_ids(self, analysis_id):
+        return [
+            str(suggestion_id) for suggestion_id in OptimizationSuggestions.objects.filter(
+                analysis_id=analysis_id
+            ).values_list('suggestion_id', flat=True)
+        ]
+
+    def test_analysis_queries_do_not_depend_on_suggestion_count(self):
+        few, few_queries = self.count_queries(self.analyze, 'src/Counter.jsx', FEW_SUGGESTIONS)
+        many, many_queries = self.count_queries(self.analyze, 'src/TodoList.jsx', MANY_SUGGESTIONS)
+
+        self.assertFalse(few['from_cache'] or many['from_cache'])
+        self.assertLess(few['suggestions_generated'], many['suggestions_generated'])
+        self.assertEqual(len(self.suggestion_ids(many['analysis_id'])), many['suggestions_generated'])
+        self.assertEqual(few_queries, many_queries)
+
+    def test_cache_hit_queries_do_not_depend_on_suggestion_count(self):
+        self.analyze('src/Counter.jsx', FEW_SUGGESTIONS)
+        self.analyze('src/TodoList.jsx', MANY_SUGGESTIONS)
+
+        few, few_queries = self.count_queries(self.analyze, 'src/CounterCopy.jsx', FEW_SUGGESTIONS)
+        many, many_queries = self.count_queries(self.analyze, 'src/TodoListCopy.jsx', MANY_SUGGESTIONS)
+
+        self.assertTrue(few['from_cache'] and many['from_cache'])
+        self.assertEqual(few_queries, many_queries)
+
+    def test_apply_queries_do_not_depend_on_suggestion_count(self):
+        suggestion_ids = self.suggestion_ids(self.analyze('src/TodoList.jsx', MANY_SUGGESTIONS)['analysis_id'])
+        self.assertGreater(len(suggestion_ids), 2)
+
+        one, one_queries = self.count_queries(
+            apply_optimization_suggestions.run, suggestion_ids[:1], auto_apply=True
+        )
+        rest, rest_queries = self.count_queries(
+            apply_optimization_suggestions.run, suggestion_ids[1:], auto_apply=True
+        )
+
+        self.assertEqual(one['successful_applications'], 1)
+        self.assertEqual(rest['successful_applications'], len(suggestion_ids) - 1)
+        self.assertEqual(
+            OptimizationSuggestions.objects.filter(suggestion_id__in=suggestion_ids, status='applied').count(),
+            len(suggestion_ids)
+        )
+        self.assertEqual(one_queries, rest_queries)
@@ -4,6 +4,7 @@ from . import views
 
 router = DefaultRouter()
 router.register(r'analysis', views.AIAnalysisViewSet, basename='ai-analysis')
+router.register(r'jobs', views.AnalysisJobViewSet, basename='analysis-jobs')
 router.register(r'suggestions', views.OptimizationSuggestionViewSet, basename='suggestions')
 
 urlpatterns = [
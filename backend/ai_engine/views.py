@@ -3,12 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Q, Avg, Count
 from django.utils import timezone
-from perfmaster.models import AIAnalysisResults, OptimizationSuggestions, Project
+from perfmaster.models import AIAnalysisResults, AnalysisJob, OptimizationSuggestions, Project
+from perfmaster.queues import queue_metrics
 from .serializers import (
-    AIAnalysisResultsSerializer, OptimizationSuggestionSerializer,
-    ComponentAnalysisRequestSerializer, OptimizationApplicationSerializer
+    AIAnalysisResultsSerializer, AnalysisJobSerializer, BatchAnalysisRequestSerializer, OptimizationSuggestionSerializer,
+    ComponentAnalysisRequestSerializer, MetricsAnalysisRequestSerializer, OptimizationApplicationSerializer
 )
-from .tasks import analyze_component_performance, apply_optimization_suggestions
+from .batch_analysis import start_job
+from .inference import InferenceQueueFull, InferenceUnavailable, inference_service
+from .tasks import analyze_component_performance, apply_optimization_suggestions, get_system_project
 
 
 class AIAnalysisViewSet(viewsets.ModelViewSet):
@@ -44,6 +47,53 @@ class AIAnalysisViewSet(viewsets.ModelViewSet):
             'status': 'processing'
         }, status=status.HTTP_202_ACCEPTED)
 
+    @action(detail=False, methods=['post'])
+    def analyze_batch(self, request):
+        """Analyze many components of one project as a chunked background job"""
+        serializer = BatchAnalysisRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        project = get_system_project(str(data['project_id']), data['framework_version'])
+        job = start_job(
+            project,
+            data['files'],
+            framework_version=data['framework_version'],
+            analysis_type=data['analysis_type'],
+            chunk_size=data.get('chunk_size'),
+            incremental=data['incremental']
+        )
+        
+        return Response({
+            'message': 'Batch analysis started',
+            'job_id': str(job.job_id),
+            'total_files': job.total_files,
+            'total_chunks': job.total_chunks,
+            'skipped_files': job.skipped_files,
+            'removed_files': job.removed_files,
+            'time_saved': job.time_saved,
+            'oversized_files': data['oversized_files'],
+            'status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['post'])
+    def analyze_metrics(self, request):
+        """Run the performance models over a list of metrics dicts in the inference pool"""
+        serializer = MetricsAnalysisRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            results = inference_service.analyze_many(serializer.validated_data['metrics'])
+        except (InferenceQueueFull, InferenceUnavailable) as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+        except TimeoutError:
+            return Response({'error': 'Inference timed out'}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        
+        return Response({
+            'count': len(results),
+            'results': results
+        })
+
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get analysis statistics"""
@@ -57,10 +107,21 @@ class AIAnalysisViewSet(viewsets.ModelViewSet):
             'total_analyses': total_analyses,
             'completed_analyses': completed_analyses,
             'completion_rate': (completed_analyses / total_analyses * 100) if total_analyses > 0 else 0,
-            'average_confidence': round(avg_confidence, 2)
+            'average_confidence': round(avg_confidence, 2),
+            'inference': inference_service.stats(),
+            'queues': queue_metrics()
         })
 
 
+class AnalysisJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress of batch analysis jobs"""
+    serializer_class = AnalysisJobSerializer
+    permission_classes = [permissions.AllowAny]  # Same access as AI analysis
+
+    def get_queryset(self):
+        return AnalysisJob.objects.all().select_related('project')
+
+
 class OptimizationSuggestionViewSet(viewsets.ModelViewSet):
     serializer_class = OptimizationSuggestionSerializer
     permission_classes = [permissions.AllowAny]  # Anyone can use suggestions
@@ -0,0 +1,790 @@
+"""
+Rule engine for performance alerts.
+
+Rules are compiled once per project from three layers, later layers replacing
+the threshold rules of the metrics they mention:
+
+1. ``DEFAULT_ALERT_RULES`` (render time and memory above 100 / 200)
+2. the project owner's ``UserPreferences.alert_thresholds``, either
+   ``{metric: value}`` or ``{metric: {severity: value}}``
+3. ``Project.performance_config['alert_rules']``, a list of rule specs::
+
+       {'metric': 'lcp', 'kind': 'threshold', 'value': 2500, 'severity': 'high'}
+       {'metric': 'memory_usage', 'kind': 'rate_of_change', 'value': 20, 'per_seconds': 60}
+       {'metric': 'lcp', 'kind': 'percentile', 'percentile': 75, 'window': 500, 'value': 2500}
+       {'metric': 'render_time', 'kind': 'anomaly', 'value': 6, 'severity': 'high'}
+
+``alert_engine`` evaluates the compiled rules over each written batch with
+NumPy: one comparison matrix per metric for all of its threshold rules,
+per-component batch means against a baseline for rate-of-change rules, a
+rolling sample window per percentile rule, and the streaming detector's scores
+(``perfmaster.anomaly``) against the limit of anomaly rules. Each batch yields
+at most one hit per (component, alert type), with the highest severity that
+fired.
+
+``alert_tracker`` turns hits into alert state keyed by (project, component,
+alert type): the first hit opens an alert, later hits bump ``hit_count`` and
+``last_seen_at`` on the same row (escalating severity, never lowering it), and
+an alert is resolved once ``ALERTS['CLEAN_WINDOWS_TO_RESOLVE']`` evaluation
+windows pass without a hit, after which the key is in cooldown for
+``ALERTS['COOLDOWN_SECONDS']``. Only transitions (opened, escalated, resolved)
+are broadcast. Hits are stored as increments on rows that are still open, so
+an alert resolved by another process or the API is never written back as
+open; the hit opens a new alert instead. An alert that reopens during its
+cooldown is stored as usual but only broadcast as opened if it is still open
+once the cooldown ends, so a flapping condition does not notify repeatedly.
+The tracker's own state changes only when the rows it wrote are committed.
+"""
+import copy
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils import timezone
+
+from perfmaster.anomaly import anomaly_detector, broadcast_anomaly_scores
+from perfmaster.lookups import alert_threshold_cache, project_cache
+
+logger = logging.getLogger(__name__)
+
+RULE_KINDS = ('threshold', 'rate_of_change', 'percentile', 'anomaly')
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+# Metrics rules can watch, with the alert type and unit used for them
+ALERT_METRICS = {
+    'render_time': ('render_time', 'ms'),
+    'memory_usage': ('memory_leak', 'MB'),
+    'bundle_size': ('bundle_size', 'KB'),
+    'cpu_usage': ('cpu_usage', '%'),
+    'lcp': ('lcp_threshold', 'ms'),
+    'fid': ('fid_threshold', 'ms'),
+    'cls': ('cls_threshold', ''),
+    'fcp': ('fcp_threshold', 'ms'),
+    'ttfb': ('ttfb_threshold', 'ms'),
+}
+TREND_ALERT_TYPE = 'metric_trend'
+ANOMALY_ALERT_TYPE = 'metric_anomaly'
+
+DEFAULT_ALERT_RULES = (
+    {'metric': 'render_time', 'kind': 'threshold', 'value': 100, 'severity': 'medium'},
+    {'metric': 'render_time', 'kind': 'threshold', 'value': 200, 'severity': 'high'},
+    {'metric': 'memory_usage', 'kind': 'threshold', 'value': 100, 'severity': 'medium'},
+    {'metric': 'memory_usage', 'kind': 'threshold', 'value': 200, 'severity': 'high'},
+)
+
+MAX_RULES_PER_PROJECT = 200
+MIN_PERCENTILE_SAMPLES = 20
+
+
+def _alert_type_choices():
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+    return {choice for choice, _ in PerformanceAlerts.ALERT_TYPES}
+
+
+def normalize_rule(spec):
+    """Validated copy of a rule spec, or None if it cannot be used"""
+    if not isinstance(spec, dict):
+        return None
+    metric = spec.get('metric')
+    kind = spec.get('kind', 'threshold')
+    if metric not in ALERT_METRICS or kind not in RULE_KINDS:
+        return None
+    try:
+        value = float(spec['value'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not np.isfinite(value) or (kind == 'anomaly' and value <= 0):
+        return None
+
+    if kind == 'anomaly':
+        default_type = ANOMALY_ALERT_TYPE
+    elif kind == 'rate_of_change' and metric != 'memory_usage':
+        default_type = TREND_ALERT_TYPE
+    else:
+        default_type = ALERT_METRICS[metric][0]
+    alert_type = spec.get('alert_type')
+    rule = {
+        'metric': metric,
+        'kind': kind,
+        'value': value,
+        'op': '<' if spec.get('op') == '<' else '>',
+        'severity': spec.get('severity') if spec.get('severity') in SEVERITY_RANK else 'medium',
+        'alert_type': alert_type if alert_type in _alert_type_choices() else default_type,
+    }
+    try:
+        if kind == 'rate_of_change':
+            rule['per_seconds'] = max(float(spec.get('per_seconds', 60)), 1.0)
+        elif kind == 'percentile':
+            rule['percentile'] = min(max(float(spec.get('percentile', 75)), 0.0), 100.0)
+            rule['window'] = min(max(int(spec.get('window', 500)), MIN_PERCENTILE_SAMPLES), 10000)
+    except (TypeError, ValueError):
+        return None
+    return rule
+
+
+def threshold_specs(alert_thresholds):
+    """Threshold rule specs from ``UserPreferences.alert_thresholds``"""
+    specs = []
+    if not isinstance(alert_thresholds, dict):
+        return specs
+    for metric, setting in alert_thresholds.items():
+        if isinstance(setting, dict):
+            for severity, value in setting.items():
+                if severity in SEVERITY_RANK:
+                    specs.append({'metric': metric, 'value': value, 'severity': severity})
+        else:
+            specs.append({'metric': metric, 'value': setting, 'severity': 'medium'})
+    return specs
+
+
+def build_rules(project_rules, alert_thresholds):
+    """Layer default, owner and project rules into one normalized list"""
+    rules = [normalize_rule(spec) for spec in DEFAULT_ALERT_RULES]
+    for layer in (threshold_specs(alert_thresholds), project_rules if isinstance(project_rules, list) else []):
+        layer = [rule for rule in (normalize_rule(spec) for spec in layer[:MAX_RULES_PER_PROJECT]) if rule]
+        overridden = {rule['metric'] for rule in layer if rule['kind'] == 'threshold'}
+        rules = [
+            rule for rule in rules
+            if rule['kind'] != 'threshold' or rule['metric'] not in overridden
+        ] + layer
+    return rules[:MAX_RULES_PER_PROJECT]
+
+
+class CompiledRules:
+    """A project's rules grouped into NumPy arrays per metric and kind"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.thresholds = {}
+        self.rates = {}
+        self.anomalies = {}
+        self.percentiles = []
+        # Rolling sample window per percentile rule (reset whenever the rules are recompiled)
+        self.windows = {}
+
+        grouped = {}
+        for index, rule in enumerate(rules):
+            if rule['kind'] == 'percentile':
+                self.percentiles.append(index)
+                self.windows[index] = np.empty(0)
+            else:
+                grouped.setdefault((rule['kind'], rule['metric']), []).append(index)
+
+        for (kind, metric), indexes in grouped.items():
+            signs = np.array([-1.0 if rules[i]['op'] == '<' else 1.0 for i in indexes])
+            limits = np.array([rules[i]['value'] for i in indexes]) * signs
+            if kind == 'threshold':
+                self.thresholds[metric] = (indexes, signs, limits)
+            elif kind == 'anomaly':
+                # Scores are distances from normal, whatever the direction
+                self.anomalies[metric] = (indexes, np.array([rules[i]['value'] for i in indexes]))
+            else:
+                scales = np.array([rules[i]['per_seconds'] for i in indexes])
+                self.rates[metric] = (indexes, signs, limits, scales)
+
+
+class MetricBatch:
+    """Column view of one project's freshly written rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.component_names, self.component_codes = np.unique(
+            np.array([row.component_path for row in rows], dtype=object), return_inverse=True
+        )
+        now = timezone.now()
+        self.time = max((row.timestamp or now) for row in rows).timestamp()
+        self._columns = {}
+
+    def column(self, metric):
+        """Float array of ``metric`` for every row, NaN where it is missing"""
+        values = self._columns.get(metric)
+        if values is None:
+            values = self._columns[metric] = np.array([getattr(row, metric) for row in self.rows], dtype=float)
+        return values
+
+
+def _worst_per_component(codes, scores, size):
+    """Highest score per component code; -inf for components without a score"""
+    worst = np.full(size, -np.inf)
+    np.maximum.at(worst, codes, scores)
+    return worst
+
+
+class AlertEngine:
+    """Process-wide evaluator that keeps compiled rules and rolling state per project"""
+
+    def __init__(self, max_projects=10000, max_series=100000):
+        self.max_projects = max_projects
+        self.max_series = max_series
+        self._compiled = OrderedDict()
+        self._baselines = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {
+            'batches': 0,
+            'samples': 0,
+            'compilations': 0,
+            'hits': 0,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'projects': len(self._compiled), 'series': len(self._baselines)}
+
+    def rules_for(self, project_id):
+        """Compiled rules of a project, recompiled only when its rule sources change"""
+        project = project_cache.get(project_id)
+        if project is None:
+            return None
+        config = project.get('performance_config') or {}
+        owner_id = project.get('created_by_id')
+        thresholds = alert_threshold_cache.get(owner_id, {}) if owner_id else {}
+        signature = json.dumps([config.get('alert_rules'), thresholds], sort_keys=True, default=str)
+
+        cached = self._compiled.get(project_id)
+        if cached is not None and cached[0] == signature:
+            self._compiled.move_to_end(project_id)
+            return cached[1]
+
+        compiled = CompiledRules(build_rules(config.get('alert_rules'), thresholds))
+        self._compiled[project_id] = (signature, compiled)
+        self.counters['compilations'] += 1
+        while len(self._compiled) > self.max_projects:
+            self._compiled.popitem(last=False)
+        return compiled
+
+    def evaluate(self, rows, anomaly_scores=None):
+        """
+        ``{project_id: {(component_path, alert_type): hit}}`` for a batch of written
+        PerformanceMetrics rows; every project with rules is listed, even without hits.
+        ``anomaly_scores`` is ``anomaly_detector.score(rows)``.
+        """
+        anomaly_scores = anomaly_scores or {}
+        by_project = {}
+        for row in rows:
+            by_project.setdefault(row.project_id, []).append(row)
+
+        results = {}
+        with self._lock:
+            for project_id, project_rows in by_project.items():
+                compiled = self.rules_for(project_id)
+                if compiled is None or not compiled.rules:
+                    continue
+                batch = MetricBatch(project_rows)
+                candidates = {}
+                self._evaluate_thresholds(compiled, batch, candidates)
+                self._evaluate_rates(project_id, compiled, batch, candidates)
+                self._evaluate_percentiles(compiled, batch, candidates)
+                self._evaluate_anomalies(compiled, anomaly_scores.get(project_id, ()), candidates)
+                results[project_id] = candidates
+                self.counters['hits'] += len(candidates)
+            self.counters['batches'] += 1
+            self.counters['samples'] += len(rows)
+        return results
+
+    def _offer(self, candidates, component_path, rule, value, **details):
+        """Keep the highest-severity hit per (component, alert type)"""
+        key = (component_path, rule['alert_type'])
+        current = candidates.get(key)
+        rank = SEVERITY_RANK[rule['severity']]
+        if current is None or rank > current['rank'] or (rank == current['rank'] and value > current['value']):
+            candidates[key] = {'rule': rule, 'rank': rank, 'value': value, **details}
+
+    def _evaluate_thresholds(self, compiled, batch, candidates):
+        size = len(batch.component_names)
+        for metric, (indexes, signs, limits) in compiled.thresholds.items():
+            signed = batch.column(metric)[:, None] * signs[None, :]
+            breaches = signed > limits[None, :]  # NaN never breaches
+            for column in np.flatnonzero(breaches.any(axis=0)):
+                hit = breaches[:, column]
+                worst = _worst_per_component(batch.component_codes[hit], signed[hit, column], size)
+                for code in np.flatnonzero(np.isfinite(worst)):
+                    self._offer(
+                        candidates, batch.component_names[code], compiled.rules[indexes[column]],
+                        float(worst[code] * signs[column])
+                    )
+
+    def _evaluate_rates(self, project_id, compiled, batch, candidates):
+        for metric, (indexes, signs, limits, scales) in compiled.rates.items():
+            values = batch.column(metric)
+            present = ~np.isnan(values)
+            if not present.any():
+                continue
+            size = len(batch.component_names)
+            counts = np.bincount(batch.component_codes[present], minlength=size)
+            sums = np.bincount(batch.component_codes[present], weights=values[present], minlength=size)
+            codes = np.flatnonzero(counts)
+            means = sums[codes] / counts[codes]
+
+            keys = [(project_id, batch.component_names[code], metric) for code in codes]
+            baselines = [self._baselines.get(key) for key in keys]
+            base_time = np.array([base[0] if base else np.nan for base in baselines])
+            base_value = np.array([base[1] if base else np.nan for base in baselines])
+            elapsed = batch.time - base_time
+            # Compare against a baseline at least as old as the shortest rule interval
+            ready = elapsed >= scales.min()
+
+            rates = (means - base_value) / np.where(ready, elapsed, np.inf)
+            signed = (rates[:, None] * scales[None, :]) * signs[None, :]
+            breaches = ready[:, None] & (signed > limits[None, :])
+            for row, column in zip(*np.nonzero(breaches)):
+                self._offer(
+                    candidates, batch.component_names[codes[row]], compiled.rules[indexes[column]],
+                    float(signed[row, column] * signs[column])
+                )
+
+            for key, base, is_ready, mean in zip(keys, baselines, ready, means):
+                if base is None or is_ready:
+                    self._baselines[key] = (batch.time, float(mean))
+                self._baselines.move_to_end(key)
+            while len(self._baselines) > self.max_series:
+                self._baselines.popitem(last=False)
+
+    def _evaluate_percentiles(self, compiled, batch, candidates):
+        for index in compiled.percentiles:
+            rule = compiled.rules[index]
+            values = batch.column(rule['metric'])
+            window = np.concatenate([compiled.windows[index], values[~np.isnan(values)]])[-rule['window']:]
+            compiled.windows[index] = window
+            if window.size < MIN_PERCENTILE_SAMPLES:
+                continue
+            value = float(np.percentile(window, rule['percentile']))
+            sign = -1.0 if rule['op'] == '<' else 1.0
+            if value * sign > rule['value'] * sign:
+                self._offer(candidates, None, rule, value, samples=int(window.size))
+
+    def _evaluate_anomalies(self, compiled, scores, candidates):
+        for score in scores:
+            rule_set = compiled.anomalies.get(score['metric'])
+            if rule_set is None:
+                continue
+            indexes, limits = rule_set
+            for column in np.flatnonzero(score['score'] > limits):
+                self._offer(
+                    candidates, score['component_path'], compiled.rules[indexes[column]], score['value'],
+                    score=score['score'], median=score['median']
+                )
+
+
+def alert_message(component_path, candidate):
+    rule = candidate['rule']
+    label = rule['metric'].replace('_', ' ')
+    unit = ALERT_METRICS[rule['metric']][1]
+    value = candidate['value']
+    where = f" in {component_path}" if component_path else ''
+    if rule['kind'] == 'rate_of_change':
+        return (
+            f"{label.capitalize()} changing by {value:.1f}{unit} per {rule['per_seconds']:g}s{where} "
+            f"(limit {rule['value']:g}{unit})"
+        )
+    if rule['kind'] == 'percentile':
+        return (
+            f"p{rule['percentile']:g} {label} is {value:.1f}{unit} over the last {candidate['samples']} samples "
+            f"(threshold {rule['value']:g}{unit})"
+        )
+    if rule['kind'] == 'anomaly':
+        return (
+            f"Anomalous {label} of {value:.1f}{unit}{where}, usually around {candidate['median']:.1f}{unit} "
+            f"(score {candidate['score']:.1f}, limit {rule['value']:g})"
+        )
+    qualifier = 'Low' if rule['op'] == '<' else 'High'
+    return f"{qualifier} {label} detected: {value:.1f}{unit}{where} (threshold {rule['value']:g}{unit})"
+
+
+def build_alert(project_id, component_path, candidate):
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+
+    rule = candidate['rule']
+    return PerformanceAlerts(
+        project_id=project_id,
+        component_path=component_path,
+        alert_type=rule['alert_type'],
+        severity=rule['severity'],
+        message=alert_message(component_path, candidate),
+        metric_value=candidate['value'],
+        threshold_value=rule['value'],
+    )
+
+
+def alert_payload(alert, state='opened'):
+    return {
+        'alert_id': str(alert.alert_id),
+        'type': alert.alert_type,
+        'state': state,
+        'severity': alert.severity,
+        'message': alert.message,
+        'component_path': alert.component_path,
+        'metric_value': alert.metric_value,
+        'threshold_value': alert.threshold_value,
+        'hit_count': alert.hit_count,
+        'timestamp': alert.created_at.isoformat(),
+        'last_seen_at': alert.last_seen_at.isoformat() if alert.last_seen_at else None,
+        'resolved_at': alert.resolved_at.isoformat() if alert.resolved_at else None,
+    }
+
+
+def quiet_since(cutoff):
+    """Alerts without a hit after ``cutoff``"""
+    return Q(last_seen_at__lte=cutoff) | Q(last_seen_at__isnull=True, created_at__lte=cutoff)
+
+
+def add_alert_hits(hits, now, batch_size=500):
+    """
+    Count one hit on every ``(alert, value)`` with increments that only match
+    open rows. Returns the ids of the alerts that were no longer open.
+    """
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+
+    closed = set()
+    for start in range(0, len(hits), batch_size):
+        batch = hits[start:start + batch_size]
+        alert_ids = [alert.alert_id for alert, _ in batch]
+        stored = PerformanceAlerts.objects.filter(alert_id__in=alert_ids, is_resolved=False).update(
+            hit_count=F('hit_count') + 1,
+            last_seen_at=now,
+            metric_value=Case(
+                *[When(alert_id=alert.alert_id, then=Value(value)) for alert, value in batch],
+                output_field=FloatField()
+            ),
+        )
+        if stored < len(batch):
+            still_open = PerformanceAlerts.objects.filter(
+                alert_id__in=alert_ids, is_resolved=False
+            ).values_list('alert_id', flat=True)
+            closed.update(set(alert_ids) - set(still_open))
+    return closed
+
+
+def escalate_alert(alert):
+    """Store the raised severity of an open alert"""
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+
+    PerformanceAlerts.objects.filter(alert_id=alert.alert_id, is_resolved=False).update(
+        severity=alert.severity,
+        threshold_value=alert.threshold_value,
+        message=alert.message,
+    )
+
+
+def resolve_alerts(alerts, now, quiet_after):
+    """
+    Resolve the alerts still open and without a hit in the last
+    ``quiet_after`` seconds. Returns the ids of the alerts resolved here.
+    """
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+
+    if not alerts:
+        return set()
+    alert_ids = [alert.alert_id for alert in alerts]
+    resolved = PerformanceAlerts.objects.filter(alert_id__in=alert_ids, is_resolved=False).filter(
+        quiet_since(now - timedelta(seconds=quiet_after))
+    ).update(is_resolved=True, resolved_at=now)
+    if resolved == len(alert_ids):
+        return set(alert_ids)
+    return set(PerformanceAlerts.objects.filter(
+        alert_id__in=alert_ids, is_resolved=True, resolved_at=now
+    ).values_list('alert_id', flat=True))
+
+
+def alert_settings():
+    config = {
+        'COOLDOWN_SECONDS': 300,
+        'EVALUATION_WINDOW_SECONDS': 60,
+        'CLEAN_WINDOWS_TO_RESOLVE': 3,
+        'STATE_REFRESH_SECONDS': 60,
+    }
+    config.update(getattr(settings, 'ALERTS', {}))
+    return config
+
+
+class AlertStateTracker:
+    """Open alerts per project, so repeated hits update one row instead of inserting new ones"""
+
+    def __init__(self, cooldown=300, window=60, clean_windows=3, refresh=60):
+        self.cooldown = cooldown
+        self.quiet_after = window * clean_windows
+        self.refresh = refresh
+        self._projects = {}
+        self._cooldowns = {}
+        # Alerts reopened during their cooldown and not broadcast yet
+        self._silenced = set()
+        self._lock = threading.Lock()
+        self.counters = {
+            'opened': 0,
+            'escalated': 0,
+            'updated': 0,
+            'resolved': 0,
+            'suppressed': 0,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                'projects': len(self._projects),
+                'open': sum(len(state['open']) for state in self._projects.values()),
+            }
+
+    def _open_alerts(self, project_id, now):
+        """Open alerts of a project by (component, alert type), reloaded every ``refresh`` seconds"""
+        from perfmaster.models import PerformanceAlerts  # Import inside method
+
+        state = self._projects.get(project_id)
+        if state is None or (now - state['loaded_at']).total_seconds() > self.refresh:
+            alerts = PerformanceAlerts.objects.filter(project_id=project_id, is_resolved=False).order_by('created_at')
+            # Later rows win when older duplicates are still open
+            state = {'loaded_at': now, 'open': {(a.component_path, a.alert_type): a for a in alerts}}
+            self._projects[project_id] = state
+        return state['open']
+
+    def _find_open(self, project_id, component_path, alert_type):
+        """An alert another process opened for the same key since the last reload"""
+        from perfmaster.models import PerformanceAlerts  # Import inside method
+
+        alerts = PerformanceAlerts.objects.filter(project_id=project_id, alert_type=alert_type, is_resolved=False)
+        if component_path is None:
+            alerts = alerts.filter(component_path__isnull=True)
+        else:
+            alerts = alerts.filter(component_path=component_path)
+        return alerts.order_by('-created_at').first()
+
+    def apply(self, results, now=None):
+        """
+        Store one evaluation's hits and resolutions and plan the matching
+        tracker changes. Hits are written as increments that only match open
+        rows, so they never overwrite a resolution made elsewhere; a hit on an
+        alert resolved meanwhile opens a new one. Returns ``(created,
+        transitions, changes)``: new rows to insert, the ``(state, alert)``
+        changes to broadcast and the tracker changes to pass to ``commit()``
+        once the rows are committed. Cached alerts are copied, so nothing
+        cached changes if the transaction rolls back.
+        """
+        now = now or timezone.now()
+        created, transitions = [], []
+        changes = {
+            'now': now, 'open': [], 'resolved': [], 'dropped': [], 'silenced': [], 'announced': [],
+            'counters': dict.fromkeys(self.counters, 0),
+        }
+        counters = changes['counters']
+        with self._lock:
+            fresh, hits, quiet = [], [], []
+            for project_id, candidates in results.items():
+                open_alerts = self._open_alerts(project_id, now)
+                for key, candidate in candidates.items():
+                    cached = open_alerts.get(key) or self._find_open(project_id, *key)
+                    if cached is None:
+                        fresh.append((project_id, key, candidate))
+                    else:
+                        hits.append((project_id, key, candidate, cached))
+
+                # Hysteresis: resolve only after enough clean windows in a row
+                for key, cached in open_alerts.items():
+                    last_seen = cached.last_seen_at or cached.created_at
+                    if key not in candidates and (now - last_seen).total_seconds() >= self.quiet_after:
+                        quiet.append((project_id, key, cached))
+
+            closed = add_alert_hits([(cached, candidate['value']) for _, _, candidate, cached in hits], now)
+            for project_id, key, candidate, cached in hits:
+                if cached.alert_id in closed:
+                    # Resolved by another process since it was cached
+                    changes['dropped'].append((project_id, key, cached.alert_id))
+                    fresh.append((project_id, key, candidate))
+                    continue
+
+                alert = copy.copy(cached)
+                alert.hit_count += 1
+                alert.metric_value = candidate['value']
+                alert.last_seen_at = now
+                if candidate['rank'] > SEVERITY_RANK.get(alert.severity, 0):
+                    alert.severity = candidate['rule']['severity']
+                    alert.threshold_value = candidate['rule']['value']
+                    alert.message = alert_message(key[0], candidate)
+                    escalate_alert(alert)
+                    transitions.append(('escalated', alert))
+                    counters['escalated'] += 1
+                elif alert.alert_id in self._silenced and self._cooldowns.get((project_id,) + key, now) <= now:
+                    transitions.append(('opened', alert))
+                    changes['announced'].append(alert.alert_id)
+                    counters['opened'] += 1
+                changes['open'].append((project_id, key, alert))
+                counters['updated'] += 1
+
+            for project_id, key, candidate in fresh:
+                alert = build_alert(project_id, key[0], candidate)
+                alert.hit_count = 1
+                alert.last_seen_at = now
+                created.append(alert)
+                changes['open'].append((project_id, key, alert))
+                # Reopened soon after resolving: record the alert, but only notify if it
+                # is still open once the cooldown is over
+                if self._cooldowns.get((project_id,) + key, now) > now:
+                    changes['silenced'].append(alert.alert_id)
+                    counters['suppressed'] += 1
+                else:
+                    transitions.append(('opened', alert))
+                    counters['opened'] += 1
+
+            resolved = resolve_alerts([cached for _, _, cached in quiet], now, self.quiet_after)
+            for project_id, key, cached in quiet:
+                if cached.alert_id not in resolved:
+                    # Hit or resolved by another process since it was cached
+                    changes['dropped'].append((project_id, key, cached.alert_id))
+                    continue
+                alert = copy.copy(cached)
+                alert.is_resolved = True
+                alert.resolved_at = now
+                changes['resolved'].append((project_id, key, alert))
+                counters['resolved'] += 1
+                if alert.alert_id not in self._silenced:
+                    transitions.append(('resolved', alert))
+        return created, transitions, changes
+
+    def commit(self, changes):
+        """Record the changes planned by ``apply()`` once its rows are committed"""
+        now = changes['now']
+        with self._lock:
+            for project_id, key, alert_id in changes['dropped']:
+                self._drop(project_id, key, alert_id)
+            for project_id, key, alert in changes['open']:
+                state = self._projects.get(project_id)
+                if state is not None:
+                    state['open'][key] = alert
+            for project_id, key, alert in changes['resolved']:
+                self._close(project_id, key, alert.alert_id, now)
+            self._silenced.update(changes['silenced'])
+            self._silenced.difference_update(changes['announced'])
+            for name, count in changes['counters'].items():
+                self.counters[name] += count
+
+            # Expired cooldowns
+            for cooldown_key in [k for k, until in self._cooldowns.items() if until <= now]:
+                del self._cooldowns[cooldown_key]
+
+    def _drop(self, project_id, key, alert_id):
+        """Forget a cached alert that no longer matches its row; the next hit looks it up again"""
+        self._silenced.discard(alert_id)
+        state = self._projects.get(project_id)
+        if state is not None and state['open'].get(key) is not None:
+            if state['open'][key].alert_id == alert_id:
+                del state['open'][key]
+
+    def _close(self, project_id, key, alert_id, now):
+        """Drop an open alert from the state and start the cooldown of its key"""
+        self._drop(project_id, key, alert_id)
+        self._cooldowns[(project_id,) + key] = now + timedelta(seconds=self.cooldown)
+
+    def reset(self):
+        with self._lock:
+            self._projects.clear()
+
+    def forget(self, alert, now=None):
+        """Drop an alert resolved outside the tracker (API, sweep) and start its cooldown, after commit"""
+        now = now or timezone.now()
+        key = (alert.component_path, alert.alert_type)
+
+        def close():
+            with self._lock:
+                self._close(alert.project_id, key, alert.alert_id, now)
+
+        transaction.on_commit(close)
+
+
+def resolve_quiet_alerts(now=None):
+    """
+    Resolve open alerts whose last hit is older than the clean-window period.
+    Covers projects that stopped sending metrics, which the tracker never sees again.
+    """
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=alert_tracker.quiet_after)
+    quiet = list(PerformanceAlerts.objects.filter(is_resolved=False).filter(quiet_since(cutoff)))
+    # Skips alerts hit since they were read
+    resolved = resolve_alerts(quiet, now, alert_tracker.quiet_after)
+    alerts = [alert for alert in quiet if alert.alert_id in resolved]
+    if not alerts:
+        return 0
+    for alert in alerts:
+        alert.is_resolved = True
+        alert.resolved_at = now
+        alert_tracker.forget(alert, now)
+    broadcast_alerts([('resolved', alert) for alert in alerts])
+    return len(alerts)
+
+
+def broadcast_alerts(transitions):
+    """Send ``(state, alert)`` transitions to their project's performance room"""
+    from asgiref.sync import async_to_sync  # Import inside function
+    from channels.layers import get_channel_layer
+    from real_time.broadcast import room_broadcast, room_events
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for state, alert in transitions:
+        data = alert_payload(alert, state)
+        try:
+            async_to_sync(room_broadcast)(
+                channel_layer,
+                f'performance_{alert.project_id}',
+                room_events('performance_alert', 'alert', data)
+            )
+        except Exception as e:
+            logger.error(f"Failed to broadcast alert {alert.alert_id}: {e}")
+
+
+def evaluate_alerts(rows):
+    """
+    Score written rows for anomalies, run the alert rules over them, store the
+    opened, hit and resolved alerts and broadcast the scores and state transitions after commit
+    """
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+
+    try:
+        anomaly_scores = anomaly_detector.score(rows)
+        transaction.on_commit(lambda: broadcast_anomaly_scores(anomaly_scores))
+    except Exception as e:
+        logger.error(f"Anomaly scoring failed for {len(rows)} metrics: {e}")
+        anomaly_scores = {}
+    # Rolled back rows never reach the series history
+    transaction.on_commit(lambda: anomaly_detector.record(rows))
+
+    # The tracker queries and the alert writes share a savepoint, so a failed query
+    # rolls back to it instead of breaking the caller's transaction
+    try:
+        with transaction.atomic():
+            results = alert_engine.evaluate(rows, anomaly_scores)
+            created, transitions, changes = alert_tracker.apply(results)
+            if created:
+                PerformanceAlerts.objects.bulk_create(created)
+    except DatabaseError as e:
+        logger.error(f"Failed to store alerts for {len(rows)} metrics: {e}")
+        # Reload state from the database on the next batch
+        alert_tracker.reset()
+        return []
+    except Exception as e:
+        logger.error(f"Alert evaluation failed for {len(rows)} metrics: {e}")
+        return []
+    if not changes['open'] and not changes['resolved'] and not changes['dropped']:
+        return []
+
+    # The tracker only learns about rows that were committed
+    transaction.on_commit(lambda: alert_tracker.commit(changes))
+    if transitions:
+        transaction.on_commit(lambda: broadcast_alerts(transitions))
+    return created
+
+
+alert_engine = AlertEngine()
+_alert_config = alert_settings()
+alert_tracker = AlertStateTracker(
+    cooldown=_alert_config['COOLDOWN_SECONDS'],
+    window=_alert_config['EVALUATION_WINDOW_SECONDS'],
+    clean_windows=_alert_config['CLEAN_WINDOWS_TO_RESOLVE'],
+    refresh=_alert_config['STATE_REFRESH_SECONDS'],
+)
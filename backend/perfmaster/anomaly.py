@@ -0,0 +1,355 @@
+"""
+Streaming anomaly detection for live metrics.
+
+``anomaly_detector`` keeps rolling statistics per (project, component, metric)
+series and scores every written batch against them:
+
+- an EWMA mean / variance, which follows gradual drift
+- the median / MAD of the last ``ANOMALY['WINDOW']`` samples, which is not
+  pulled around by the outliers it is looking for
+
+A sample's score is the smaller of its two z-scores, so it has to look unusual
+to both the recent trend and the robust baseline. Series are not scored until
+they have ``ANOMALY['WARMUP']`` samples. All state lives in preallocated NumPy
+arrays (one ring buffer row per series) capped at ``ANOMALY['MAX_SERIES']``,
+evicting the least recently seen series, so memory per series is fixed.
+Batches are scored inside the ingest transaction and only folded into the
+history once it commits.
+
+The detector's history is per process: each web worker only sees the samples
+it ingests itself. Scores feed ``anomaly`` alert rules (see
+``perfmaster.alerts``) and are broadcast to the project room as
+``anomaly_scores`` frames, both of which follow the ingesting process.
+On-demand analysis (``analyze_metrics`` and ``analyze_metrics_batch``) can run
+in any web or Celery process, so it uses ``baseline_scores`` instead, which
+scores against the minute rollups every process shares.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_METRICS = ('render_time', 'memory_usage', 'bundle_size', 'cpu_usage', 'lcp', 'fid', 'cls', 'fcp', 'ttfb')
+# MAD of a normal distribution times this is its standard deviation
+MAD_SCALE = 1.4826
+# Spread floor relative to the series level, so constant series do not score every change as infinite
+MIN_RELATIVE_SPREAD = 0.01
+MIN_SPREAD = 1e-6
+
+
+class AnomalyDetector:
+    """Process-wide rolling statistics and scoring for every metric series seen by this process"""
+
+    def __init__(self, window=64, alpha=0.1, warmup=16, max_series=50000, initial_series=1024):
+        self.window = window
+        self.alpha = alpha
+        self.warmup = min(warmup, window)
+        self.max_series = max_series
+        self._slots = OrderedDict()
+        self._free = []
+        self._capacity = 0
+        self._ring = np.empty((0, window), dtype=np.float32)
+        self._position = np.empty(0, dtype=np.int64)
+        self._count = np.empty(0, dtype=np.int64)
+        self._mean = np.empty(0)
+        self._var = np.empty(0)
+        self._lock = threading.Lock()
+        self.counters = {
+            'batches': 0,
+            'samples': 0,
+            'scored': 0,
+            'evicted_series': 0,
+        }
+        self._grow(min(initial_series, max_series))
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                'series': len(self._slots),
+                'capacity': self._capacity,
+                'state_bytes': sum(
+                    array.nbytes for array in (self._ring, self._position, self._count, self._mean, self._var)
+                ),
+            }
+
+    def _grow(self, capacity):
+        """Reallocate the state arrays for ``capacity`` series, keeping existing rows"""
+        old = self._capacity
+        ring = np.full((capacity, self.window), np.nan, dtype=np.float32)
+        ring[:old] = self._ring
+        self._ring = ring
+        self._position = np.concatenate([self._position, np.zeros(capacity - old, dtype=np.int64)])
+        self._count = np.concatenate([self._count, np.zeros(capacity - old, dtype=np.int64)])
+        self._mean = np.concatenate([self._mean, np.zeros(capacity - old)])
+        self._var = np.concatenate([self._var, np.zeros(capacity - old)])
+        # pop() hands out the lowest free row first
+        self._free.extend(range(capacity - 1, old - 1, -1))
+        self._capacity = capacity
+
+    def _slot(self, key):
+        """State row of a series, allocating (or evicting the stalest series) for new ones"""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+        if not self._free:
+            if self._capacity < self.max_series:
+                self._grow(min(max(self._capacity * 2, 1), self.max_series))
+            else:
+                _, evicted = self._slots.popitem(last=False)
+                self._free.append(evicted)
+                self.counters['evicted_series'] += 1
+        slot = self._free.pop()
+        self._ring[slot] = np.nan
+        self._position[slot] = 0
+        self._count[slot] = 0
+        self._mean[slot] = 0.0
+        self._var[slot] = 0.0
+        self._slots[key] = slot
+        return slot
+
+    def score(self, rows):
+        """
+        Score PerformanceMetrics rows against their series without recording
+        them. Returns ``{project_id: [score, ...]}`` with the highest-scoring
+        sample of every warmed-up series in the batch.
+        """
+        results = {}
+        with self._lock:
+            for project_id, metric, keys, series, values in self._series_values(rows):
+                slots = [self._slots.get(key) for key in keys]
+                known = np.array([slot is not None for slot in slots])
+                if not known.any():
+                    results.setdefault(project_id, [])
+                    continue
+                # Series without state have no history to score against
+                positions = np.flatnonzero(known)
+                sample_known = known[series]
+                series = np.searchsorted(positions, series[sample_known])
+                slots = np.array([slots[position] for position in positions])
+
+                scores = results.setdefault(project_id, [])
+                for position, score in self._score(slots, series, values[sample_known]):
+                    _, score['component_path'], score['metric'] = keys[positions[position]]
+                    score['samples'] = int(self._count[slots[position]])
+                    scores.append(score)
+                self.counters['scored'] += len(scores)
+        return results
+
+    def record(self, rows):
+        """Fold committed PerformanceMetrics rows into their series"""
+        with self._lock:
+            for _, _, keys, series, values in self._series_values(rows):
+                self._update(np.array([self._slot(key) for key in keys]), series, values)
+            self.counters['batches'] += 1
+            self.counters['samples'] += len(rows)
+
+    def _series_values(self, rows):
+        """
+        Yield ``(project_id, metric, keys, series, values)`` per project and metric:
+        the series keys in the batch and, per present sample, its position in
+        ``keys`` and its value
+        """
+        by_project = {}
+        for row in rows:
+            by_project.setdefault(row.project_id, []).append(row)
+
+        for project_id, project_rows in by_project.items():
+            names, codes = np.unique(
+                np.array([row.component_path for row in project_rows], dtype=object), return_inverse=True
+            )
+            for metric in ANOMALY_METRICS:
+                values = np.array([getattr(row, metric) for row in project_rows], dtype=float)
+                present = np.isfinite(values)
+                if not present.any():
+                    continue
+                series_codes, series = np.unique(codes[present], return_inverse=True)
+                keys = [(project_id, names[code], metric) for code in series_codes]
+                yield project_id, metric, keys, series, values[present]
+
+    def _score(self, slots, series, values):
+        """
+        ``(series position, score)`` for the highest-scoring sample of every
+        warmed-up series, against its state before this batch
+        """
+        ready = np.flatnonzero(self._count[slots] >= self.warmup)
+        if not ready.size:
+            return []
+        median = np.full(len(slots), np.nan)
+        mad = np.full(len(slots), np.nan)
+        # Full rings take plain np.median, which is much faster than np.nanmedian
+        full = self._count[slots[ready]] >= self.window
+        for subset, median_of in ((ready[full], np.median), (ready[~full], np.nanmedian)):
+            if subset.size:
+                recent = self._ring[slots[subset]].astype(float)
+                median[subset] = median_of(recent, axis=1)
+                mad[subset] = median_of(np.abs(recent - median[subset, None]), axis=1) * MAD_SCALE
+
+        mean = self._mean[slots]
+        floor = np.maximum(np.abs(median) * MIN_RELATIVE_SPREAD, MIN_SPREAD)
+        zscore = np.abs(values - mean[series]) / np.maximum(np.sqrt(self._var[slots]), floor)[series]
+        robust = np.abs(values - median[series]) / np.maximum(mad, floor)[series]
+        sample_scores = np.minimum(zscore, robust)
+        sample_scores[np.isnan(sample_scores)] = -1.0  # series that are still warming up
+
+        # Highest-scoring sample per series: last element of each group sorted by (series, score)
+        order = np.lexsort((sample_scores, series))
+        ends = order[np.r_[np.flatnonzero(np.diff(series[order])), len(order) - 1]]
+        return [
+            (series[sample], {
+                'value': float(values[sample]),
+                'score': float(sample_scores[sample]),
+                'zscore': float(zscore[sample]),
+                'robust_zscore': float(robust[sample]),
+                'mean': float(mean[series[sample]]),
+                'median': float(median[series[sample]]),
+            })
+            for sample in ends
+            if sample_scores[sample] >= 0
+        ]
+
+    def _update(self, slots, series, values):
+        """Append samples to the ring buffers and fold them into the EWMA statistics"""
+        size = len(slots)
+        counts = np.bincount(series, minlength=size)
+        order = np.argsort(series, kind='stable')
+        starts = np.cumsum(counts) - counts
+        rank = np.arange(len(order)) - starts[series[order]]
+        # Only the last ``window`` samples of a series can survive in its ring
+        keep = rank >= (counts - self.window)[series[order]]
+        kept = order[keep]
+        rows = slots[series[kept]]
+        columns = (self._position[rows] + rank[keep]) % self.window
+        self._ring[rows, columns] = values[kept]
+        self._position[slots] = (self._position[slots] + counts) % self.window
+
+        # EWMA over k samples, applied to the batch mean and variance in one step
+        batch_mean = np.bincount(series, weights=values, minlength=size) / counts
+        batch_var = np.bincount(series, weights=(values - batch_mean[series]) ** 2, minlength=size) / counts
+        fresh = self._count[slots] == 0
+        carried = np.where(fresh, 0.0, (1 - self.alpha) ** counts)
+        mean = self._mean[slots]
+        new_mean = carried * mean + (1 - carried) * batch_mean
+        self._var[slots] = (
+            carried * (self._var[slots] + (mean - new_mean) ** 2)
+            + (1 - carried) * (batch_var + (batch_mean - new_mean) ** 2)
+        )
+        self._mean[slots] = new_mean
+        self._count[slots] += counts
+
+
+def anomaly_settings():
+    config = {
+        'WINDOW': 64,
+        'ALPHA': 0.1,
+        'WARMUP': 16,
+        'MAX_SERIES': 50000,
+        'BROADCAST_MIN_SCORE': 3.0,
+        'BASELINE_MINUTES': 60,
+    }
+    config.update(getattr(settings, 'ANOMALY', {}))
+    return config
+
+
+def baseline_scores(samples, now=None):
+    """
+    ``[{metric: score}]`` for metrics dicts carrying ``project_id`` and
+    ``component_path``: each value's z-score against the minute rollups of its
+    series over the last ``ANOMALY['BASELINE_MINUTES']``, with one query for
+    all samples. Series with fewer than ``ANOMALY['WARMUP']`` samples in that
+    window are not scored.
+    """
+    from django.db.models import Sum  # Import inside function
+    from django.utils import timezone
+    from perfmaster.models import MetricRollup
+
+    config = anomaly_settings()
+    wanted = [
+        {
+            metric: float(sample[metric]) for metric in ANOMALY_METRICS
+            if isinstance(sample.get(metric), (int, float)) and not isinstance(sample.get(metric), bool)
+            and np.isfinite(sample[metric])
+        }
+        for sample in samples
+    ]
+    keys = {
+        (sample.get('project_id'), sample.get('component_path'))
+        for sample, values in zip(samples, wanted) if values
+    }
+    if not keys:
+        return [{} for _ in samples]
+
+    since = (now or timezone.now()) - timedelta(minutes=config['BASELINE_MINUTES'])
+    rows = MetricRollup.objects.filter(
+        granularity='minute',
+        bucket_start__gte=since,
+        project_id__in={project_id for project_id, _ in keys},
+        component_path__in={component_path for _, component_path in keys},
+        metric__in=ANOMALY_METRICS,
+    ).values('project_id', 'component_path', 'metric').annotate(
+        sum_count=Sum('count'),
+        sum_total=Sum('total'),
+        sum_sq=Sum('total_sq'),
+    ).order_by()
+    baselines = {}
+    for row in rows:
+        count = row['sum_count'] or 0
+        if count < config['WARMUP']:
+            continue
+        mean = row['sum_total'] / count
+        std = np.sqrt(max(row['sum_sq'] / count - mean * mean, 0.0))
+        floor = max(abs(mean) * MIN_RELATIVE_SPREAD, MIN_SPREAD)
+        baselines[(row['project_id'], row['component_path'], row['metric'])] = (mean, max(std, floor))
+
+    results = []
+    for sample, values in zip(samples, wanted):
+        scores = {}
+        for metric, value in values.items():
+            baseline = baselines.get((sample.get('project_id'), sample.get('component_path'), metric))
+            if baseline is not None:
+                scores[metric] = float(abs(value - baseline[0]) / baseline[1])
+        results.append(scores)
+    return results
+
+
+def broadcast_anomaly_scores(results, min_score=None):
+    """Send each project's scores at or above ``min_score`` to its performance room as one frame"""
+    from asgiref.sync import async_to_sync  # Import inside function
+    from channels.layers import get_channel_layer
+    from django.utils import timezone
+    from real_time.broadcast import room_broadcast, room_events
+
+    if min_score is None:
+        min_score = anomaly_settings()['BROADCAST_MIN_SCORE']
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    timestamp = timezone.now().isoformat()
+    for project_id, scores in results.items():
+        scores = [score for score in scores if score['score'] >= min_score]
+        if not scores:
+            continue
+        data = {'scores': scores, 'timestamp': timestamp}
+        try:
+            async_to_sync(room_broadcast)(
+                channel_layer,
+                f'performance_{project_id}',
+                room_events('anomaly_scores', 'anomaly_scores', data)
+            )
+        except Exception as e:
+            logger.error(f"Failed to broadcast anomaly scores for {project_id}: {e}")
+
+
+_anomaly_config = anomaly_settings()
+anomaly_detector = AnomalyDetector(
+    window=_anomaly_config['WINDOW'],
+    alpha=_anomaly_config['ALPHA'],
+    warmup=_anomaly_config['WARMUP'],
+    max_series=_anomaly_config['MAX_SERIES'],
+)
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class PerfmasterConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'perfmaster'
+    verbose_name = 'PerfMaster'
+
+    def ready(self):
+        # Register cache invalidation handlers
+        from perfmaster import signals  # noqa: F401
@@ -1,5 +1,11 @@
 import os
 from celery import Celery
+from celery.signals import before_task_publish, celeryd_init, task_postrun, task_prerun, worker_process_init
+from kombu import Queue
+
+from perfmaster.queues import (
+    ENQUEUED_AT_HEADER, INTERACTIVE, QUEUES, record_latency, route_task, stamp_enqueue_time
+)
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'perfmaster.settings')
@@ -10,9 +16,58 @@ app = Celery('perfmaster')
 # the configuration object to child processes.
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# Interactive analyses, batch work and housekeeping each get their own queue (see perfmaster.queues)
+app.conf.task_queues = [Queue(name) for name in QUEUES]
+app.conf.task_default_queue = INTERACTIVE
+app.conf.task_routes = (route_task,)
+
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Concurrency of a worker started for one queue (-Q <queue>) without -c
+QUEUE_CONCURRENCY = {
+    'interactive': int(os.getenv('CELERY_INTERACTIVE_CONCURRENCY', 4)),
+    'batch': int(os.getenv('CELERY_BATCH_CONCURRENCY', 2)),
+    'maintenance': int(os.getenv('CELERY_MAINTENANCE_CONCURRENCY', 1)),
+}
+
+
+@celeryd_init.connect
+def configure_queue_worker(sender=None, conf=None, options=None, **kwargs):
+    queues = (options or {}).get('queues') or []
+    if len(queues) == 1 and queues[0] in QUEUE_CONCURRENCY and not options.get('concurrency'):
+        conf.worker_concurrency = QUEUE_CONCURRENCY[queues[0]]
+
+
+@before_task_publish.connect
+def stamp_task(headers=None, **kwargs):
+    if headers is not None:
+        stamp_enqueue_time(headers)
+
+
+def _task_queue(task):
+    return (task.request.delivery_info or {}).get('routing_key')
+
+
+@task_prerun.connect
+def record_queue_wait(task=None, **kwargs):
+    if task is not None:
+        record_latency(_task_queue(task), 'wait', getattr(task.request, ENQUEUED_AT_HEADER, None))
+
+
+@task_postrun.connect
+def record_task_latency(task=None, **kwargs):
+    if task is not None:
+        record_latency(_task_queue(task), 'total', getattr(task.request, ENQUEUED_AT_HEADER, None))
+
+
+@worker_process_init.connect
+def preload_ai_models(**kwargs):
+    # Only pools started with AI_PRELOAD load models up front; the rest load them on first use
+    from ai_engine.model_loader import preload_configured
+    preload_configured()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
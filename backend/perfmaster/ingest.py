@@ -0,0 +1,309 @@
+"""
+Buffered write path for PerformanceMetrics ingestion.
+
+WebSocket consumers hand samples to ``metric_ingest_buffer`` instead of writing
+one row per frame. The buffer is shared by every consumer in the process and
+flushes with a single ``bulk_create`` once ``FLUSH_MAX_ROWS`` samples are
+pending or ``FLUSH_INTERVAL`` seconds have passed, whichever comes first.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import math
+import threading
+import zlib
+from collections import deque
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from perfmaster.alerts import evaluate_alerts
+from perfmaster.lookups import project_cache
+from perfmaster.rollups import record_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _as_float(value, default=0.0):
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_int(value, default=0):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def build_metric(project_id, data):
+    """Build an unsaved PerformanceMetrics row from an SDK sample"""
+    from perfmaster.models import PerformanceMetrics  # Import inside function
+
+    core_web_vitals = data.get('core_web_vitals')
+    row = PerformanceMetrics(
+        project_id=project_id,
+        component_path=str(data.get('component_path') or 'unknown')[:500],
+        render_time=_as_float(data.get('render_time')),
+        memory_usage=_as_float(data.get('memory_usage')),
+        bundle_size=_as_float(data.get('bundle_size')),
+        core_web_vitals=core_web_vitals if isinstance(core_web_vitals, dict) else {},
+        cpu_usage=_as_float(data.get('cpu_usage')),
+        network_requests=_as_int(data.get('network_requests')),
+        dom_nodes=_as_int(data.get('dom_nodes')),
+    )
+    # bulk_create bypasses save(), so populate the typed vitals columns here
+    row.sync_core_web_vitals()
+    return row
+
+
+REQUIRED_NUMERIC_FIELDS = ('render_time', 'memory_usage', 'bundle_size')
+OPTIONAL_NUMERIC_FIELDS = ('cpu_usage', 'network_requests', 'dom_nodes')
+
+
+class BatchPayloadError(ValueError):
+    """Raised when a batch upload body cannot be decoded"""
+
+
+def decode_batch_payload(body, content_type='', content_encoding='', max_bytes=10 * 1024 * 1024):
+    """
+    Decode a batch upload body into a list of samples.
+
+    Accepts a JSON array, a JSON object with a ``samples`` array, or NDJSON
+    (one sample per line), optionally gzip-compressed. Returns a tuple of
+    ``(samples, envelope)`` where ``envelope`` holds any top-level keys of a
+    JSON object body (such as ``project_id``).
+    """
+    if 'gzip' in (content_encoding or '').lower() or body[:2] == b'\x1f\x8b':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise BatchPayloadError(f'Invalid gzip body: {e}')
+        if len(body) > max_bytes or decompressor.unconsumed_tail:
+            raise BatchPayloadError(f'Decompressed body exceeds {max_bytes} bytes')
+    elif len(body) > max_bytes:
+        raise BatchPayloadError(f'Body exceeds {max_bytes} bytes')
+
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise BatchPayloadError('Body must be UTF-8 encoded')
+
+    if 'ndjson' in (content_type or '').lower() or 'jsonl' in (content_type or '').lower():
+        samples = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                samples.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Keep the slot so the caller can report it as a rejected item
+                samples.append(None)
+        return samples, {}
+
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError:
+        raise BatchPayloadError('Invalid JSON format')
+
+    if isinstance(payload, list):
+        return payload, {}
+    if isinstance(payload, dict) and isinstance(payload.get('samples'), list):
+        envelope = {key: value for key, value in payload.items() if key != 'samples'}
+        return payload['samples'], envelope
+    raise BatchPayloadError('Expected a JSON array of samples or an object with a "samples" array')
+
+
+def _sample_error(sample):
+    """Return a validation message for one sample, or None if it is valid"""
+    if not isinstance(sample, dict):
+        return 'Sample must be a JSON object'
+
+    component_path = sample.get('component_path')
+    if not isinstance(component_path, str) or not component_path.strip():
+        return 'component_path is required'
+    if len(component_path) > 500:
+        return 'component_path must be at most 500 characters'
+
+    for field in REQUIRED_NUMERIC_FIELDS:
+        if field not in sample:
+            return f'{field} is required'
+
+    for field in REQUIRED_NUMERIC_FIELDS + OPTIONAL_NUMERIC_FIELDS:
+        value = sample.get(field, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f'{field} must be a number'
+        if value < 0:
+            return f'{field} must be greater than or equal to 0'
+
+    core_web_vitals = sample.get('core_web_vitals', {})
+    if not isinstance(core_web_vitals, dict):
+        return 'core_web_vitals must be an object'
+    for key, value in core_web_vitals.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f'core_web_vitals.{key} must be a number'
+
+    return None
+
+
+def validate_samples(project_id, samples):
+    """
+    Validate a batch of samples in a single pass.
+
+    Returns ``(rows, errors)``: unsaved PerformanceMetrics rows for the valid
+    samples and ``{'index', 'error'}`` entries for the rejected ones.
+    """
+    rows = []
+    errors = []
+    for index, sample in enumerate(samples):
+        error = _sample_error(sample)
+        if error:
+            errors.append({'index': index, 'error': error})
+        else:
+            rows.append(build_metric(project_id, sample))
+    return rows, errors
+
+
+def write_metrics(rows, batch_size=None):
+    """Insert prepared PerformanceMetrics rows with one bulk insert, fold them into the rollups and evaluate alerts"""
+    from perfmaster.models import PerformanceMetrics  # Import inside function
+
+    if not rows:
+        return []
+    with transaction.atomic():
+        rows = PerformanceMetrics.objects.bulk_create(rows, batch_size=batch_size)
+        record_metrics(rows)
+        evaluate_alerts(rows)
+    return rows
+
+
+class MetricIngestBuffer:
+    """Process-wide, bounded buffer of pending metric samples"""
+
+    def __init__(self, max_rows=500, flush_interval=0.25, max_buffered=50000):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._flusher = None
+        self.counters = {
+            'buffered': 0,
+            'flushed': 0,
+            'dropped': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+        }
+
+    def submit(self, project_id, data):
+        """Queue one sample. Returns False when the buffer is full and the sample was dropped."""
+        with self._lock:
+            if len(self._pending) >= self.max_buffered:
+                self.counters['dropped'] += 1
+                return False
+            self._pending.append((project_id, data))
+            self.counters['buffered'] += 1
+            pending = len(self._pending)
+
+        if not self._ensure_flusher():
+            # No event loop (management commands, tests): flush inline on size only
+            if pending >= self.max_rows:
+                self.flush_sync()
+        elif pending >= self.max_rows:
+            self._wakeup.set()
+        return True
+
+    def stats(self):
+        """Snapshot of the ingestion counters"""
+        with self._lock:
+            return {**self.counters, 'pending': len(self._pending)}
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and not self._flusher.done():
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._wakeup = asyncio.Event()
+        self._flusher = loop.create_task(self._run())
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Metric ingest flush failed: {e}")
+
+    def _drain(self):
+        with self._lock:
+            count = min(len(self._pending), self.max_rows)
+            return [self._pending.popleft() for _ in range(count)]
+
+    async def flush(self):
+        """Write everything that is pending, one bulk insert per ``max_rows`` samples"""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            await database_sync_to_async(self._write)(batch)
+
+    def flush_sync(self):
+        """Synchronous flush, used on shutdown and outside of an event loop"""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        known_projects = project_cache.get_many({project_id for project_id, _ in batch})
+        rows = [build_metric(project_id, data) for project_id, data in batch if project_id in known_projects]
+
+        try:
+            write_metrics(rows, batch_size=self.max_rows)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} buffered metrics: {e}")
+            with self._lock:
+                self.counters['dropped'] += len(batch)
+                self.counters['failed_flushes'] += 1
+            return []
+
+        with self._lock:
+            self.counters['flushed'] += len(rows)
+            self.counters['dropped'] += len(batch) - len(rows)
+            self.counters['flushes'] += 1
+        return rows
+
+
+def _create_buffer():
+    config = getattr(settings, 'METRICS_INGEST', {})
+    return MetricIngestBuffer(
+        max_rows=config.get('FLUSH_MAX_ROWS', 500),
+        flush_interval=config.get('FLUSH_INTERVAL', 0.25),
+        max_buffered=config.get('MAX_BUFFERED_ROWS', 50000),
+    )
+
+
+def _flush_on_exit():
+    try:
+        metric_ingest_buffer.flush_sync()
+    except Exception as e:
+        logger.error(f"Failed to flush metric buffer on shutdown: {e}")
+
+
+metric_ingest_buffer = _create_buffer()
+atexit.register(_flush_on_exit)
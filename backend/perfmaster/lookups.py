@@ -0,0 +1,161 @@
+"""
+Process-local lookup caches for the ingest path.
+
+Every WebSocket frame and batch upload needs to know whether its project
+exists (and its ``performance_config``), and SDK requests resolve an API key
+to a project. ``project_cache`` and ``api_key_cache`` keep those answers in a
+bounded LRU with a TTL, so steady-state ingestion does no lookup queries;
+Celery's AI tasks resolve their projects and the system user through
+``project_cache`` and ``username_cache`` the same way.
+Entries are invalidated on ``Project``/``APIKey``/``User`` save and delete (see
+``perfmaster.signals``); the TTL bounds staleness for changes made by other
+processes. Misses are cached too, for a shorter time, so unknown ids cannot
+turn every frame into a query.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+# Cached value for keys the loader did not find
+MISSING = object()
+
+
+class LookupCache:
+    """Thread-safe LRU + TTL cache around a ``load_many(keys) -> {key: value}`` loader"""
+
+    def __init__(self, name, load_many, max_entries=10000, ttl=300, negative_ttl=30):
+        self.name = name
+        self.load_many = load_many
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    async def aget(self, key, default=None):
+        """``get`` for async callers; only a miss leaves the event loop for the database"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return default if entry[1] is MISSING else entry[1]
+        return await database_sync_to_async(self.get)(key, default)
+
+    def get_many(self, keys):
+        """``{key: value}`` for the keys that exist, loading the uncached ones with one loader call"""
+        found = {}
+        pending = []
+        now = time.monotonic()
+        with self._lock:
+            for key in set(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    if entry[1] is not MISSING:
+                        found[key] = entry[1]
+                else:
+                    self.counters['misses'] += 1
+                    pending.append(key)
+
+        if pending:
+            loaded = self.load_many(pending)
+            now = time.monotonic()
+            with self._lock:
+                for key in pending:
+                    value = loaded.get(key, MISSING)
+                    ttl = self.negative_ttl if value is MISSING else self.ttl
+                    self._entries[key] = (now + ttl, value)
+                    self._entries.move_to_end(key)
+                    if value is not MISSING:
+                        found[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.counters['evictions'] += 1
+        return found
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.counters['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'entries': len(self._entries)}
+
+
+def _load_projects(project_ids):
+    from perfmaster.models import Project  # Import inside function
+
+    rows = Project.objects.filter(project_id__in=project_ids).values(
+        'project_id', 'name', 'created_by_id', 'performance_config'
+    )
+    return {row['project_id']: row for row in rows}
+
+
+def _load_api_keys(keys):
+    from perfmaster.models import APIKey  # Import inside function
+
+    rows = APIKey.objects.filter(key__in=keys, is_active=True).values('key', 'project_id', 'user_id')
+    return {row['key']: {'project_id': row['project_id'], 'user_id': row['user_id']} for row in rows}
+
+
+def _load_user_ids(usernames):
+    from django.contrib.auth import get_user_model  # Import inside function
+
+    rows = get_user_model().objects.filter(username__in=usernames).values_list('username', 'id')
+    return dict(rows)
+
+
+def _load_alert_thresholds(user_ids):
+    from perfmaster.models import UserPreferences  # Import inside function
+
+    rows = UserPreferences.objects.filter(user_id__in=user_ids).values_list('user_id', 'alert_thresholds')
+    return {user_id: thresholds or {} for user_id, thresholds in rows}
+
+
+def _create_cache(name, load_many):
+    config = getattr(settings, 'LOOKUP_CACHE', {})
+    return LookupCache(
+        name,
+        load_many,
+        max_entries=config.get('MAX_ENTRIES', 10000),
+        ttl=config.get('TTL', 300),
+        negative_ttl=config.get('NEGATIVE_TTL', 30),
+    )
+
+
+# project_id -> {'project_id', 'name', 'created_by_id', 'performance_config'}
+project_cache = _create_cache('projects', _load_projects)
+# API key -> {'project_id', 'user_id'} for active keys
+api_key_cache = _create_cache('api_keys', _load_api_keys)
+# user id -> UserPreferences.alert_thresholds
+alert_threshold_cache = _create_cache('alert_thresholds', _load_alert_thresholds)
+# username -> user id
+username_cache = _create_cache('usernames', _load_user_ids)
+
+
+def lookup_stats():
+    return {
+        cache.name: cache.stats()
+        for cache in (project_cache, api_key_cache, alert_threshold_cache, username_cache)
+    }
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from perfmaster.models import PerformanceMetrics
+
+
+class Command(BaseCommand):
+    help = 'Copy lcp/fid/cls/fcp/ttfb out of PerformanceMetrics.core_web_vitals into their typed columns, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows updated per chunk')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fields = list(PerformanceMetrics.CORE_WEB_VITAL_FIELDS)
+
+        pending = PerformanceMetrics.objects.filter(
+            **{f'{field}__isnull': True for field in fields}
+        ).exclude(core_web_vitals={}).only('metric_id', 'core_web_vitals', *fields).order_by('metric_id')
+
+        processed = 0
+        last_id = None
+        while True:
+            chunk_qs = pending if last_id is None else pending.filter(metric_id__gt=last_id)
+            chunk = list(chunk_qs[:chunk_size])
+            if not chunk:
+                break
+
+            for row in chunk:
+                row.sync_core_web_vitals()
+            PerformanceMetrics.objects.bulk_update(chunk, fields, batch_size=chunk_size)
+
+            processed += len(chunk)
+            last_id = chunk[-1].metric_id
+            self.stdout.write(f'  backfilled {processed} rows')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled core web vitals on {processed} rows'))
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from perfmaster.models import PerformanceMetrics
+from perfmaster.retention import METRICS_TABLE, is_partitioned, partition_name, retention_config
+from perfmaster.rollups import truncate
+
+# Index names match the ones Django generated for PerformanceMetrics.Meta.indexes
+METRICS_INDEXES = (
+    ('perfmaster__project_a45822_idx', '("project_id", "timestamp")'),
+    ('perfmaster__compone_74b7e9_idx', '("component_path")'),
+    ('perfmaster__project_cfcbca_idx', '("project_id", "timestamp", "lcp", "fid", "cls")'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert perfmaster_performancemetrics into a PostgreSQL table range-partitioned by day on timestamp, '
+        'so enforce_metrics_retention can drop expired days instead of deleting rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Print the statements without running them')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning is only supported on PostgreSQL; other databases use chunked deletes')
+        if is_partitioned():
+            self.stdout.write(self.style.SUCCESS(f'{METRICS_TABLE} is already partitioned'))
+            return
+
+        today = truncate(timezone.now(), 'day')
+        oldest = PerformanceMetrics.objects.aggregate(oldest=Min('timestamp'))['oldest']
+        first_day = truncate(oldest, 'day') if oldest else today
+        new_table = f'{METRICS_TABLE}_partitioned'
+
+        statements = [
+            f'CREATE TABLE "{new_table}" (LIKE "{METRICS_TABLE}" INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")',
+            f'ALTER TABLE "{new_table}" ADD PRIMARY KEY ("metric_id", "timestamp")',
+            f'CREATE TABLE "{METRICS_TABLE}_default" PARTITION OF "{new_table}" DEFAULT',
+        ]
+        # Every day from the oldest row through PARTITION_DAYS_AHEAD gets its own partition before the
+        # copy, so only out-of-range rows land in the default partition (which would otherwise block
+        # creating the partitions for today and the days ahead)
+        last_day = today + timedelta(days=retention_config()['PARTITION_DAYS_AHEAD'])
+        day = first_day
+        while day <= last_day:
+            statements.append(
+                f'CREATE TABLE "{partition_name(day)}" PARTITION OF "{new_table}" '
+                f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+            )
+            day += timedelta(days=1)
+        statements += [
+            f'INSERT INTO "{new_table}" SELECT * FROM "{METRICS_TABLE}"',
+            f'DROP TABLE "{METRICS_TABLE}"',
+            f'ALTER TABLE "{new_table}" RENAME TO "{METRICS_TABLE}"',
+            f'ALTER TABLE "{METRICS_TABLE}" ADD CONSTRAINT "{METRICS_TABLE}_project_id_fk" '
+            f'FOREIGN KEY ("project_id") REFERENCES "perfmaster_project" ("project_id") DEFERRABLE INITIALLY DEFERRED',
+        ]
+        statements += [
+            f'CREATE INDEX "{name}" ON "{METRICS_TABLE}" {columns}' for name, columns in METRICS_INDEXES
+        ]
+
+        if options['dry_run']:
+            for statement in statements:
+                self.stdout.write(f'{statement};')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Partitioned {METRICS_TABLE} from {first_day:%Y-%m-%d} through {last_day:%Y-%m-%d}'
+        ))
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from perfmaster.models import MetricRollup, PerformanceMetrics
+from perfmaster.rollups import record_metrics, truncate
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild MetricRollup buckets from raw PerformanceMetrics rows. '
+        'Run backfill_core_web_vitals first for rows that predate the vitals columns, and run it '
+        'while ingestion is paused; rows written during the rebuild may be counted twice.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Rebuild buckets for the last N days')
+        parser.add_argument('--project', action='append', dest='projects', help='Limit to these project ids')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Raw rows folded per batch')
+
+    def handle(self, *args, **options):
+        start = truncate(timezone.now() - timedelta(days=options['days']), 'day')
+
+        rollups = MetricRollup.objects.filter(bucket_start__gte=start)
+        metrics = PerformanceMetrics.objects.filter(timestamp__gte=start)
+        if options['projects']:
+            rollups = rollups.filter(project_id__in=options['projects'])
+            metrics = metrics.filter(project_id__in=options['projects'])
+
+        deleted, _ = rollups.delete()
+        self.stdout.write(f'Deleted {deleted} rollup buckets since {start.isoformat()}')
+
+        chunk_size = options['chunk_size']
+        metrics = metrics.only(
+            'project_id', 'component_path', 'timestamp', 'render_time', 'memory_usage',
+            'bundle_size', 'cpu_usage', 'lcp', 'fid', 'cls', 'fcp', 'ttfb'
+        ).order_by()
+
+        processed = 0
+        batch = []
+        for row in metrics.iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                record_metrics(batch)
+                processed += len(batch)
+                batch = []
+                self.stdout.write(f'  folded {processed} rows')
+        if batch:
+            record_metrics(batch)
+            processed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups from {processed} raw rows'))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0002_project_branch_alter_project_project_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('component_path', models.CharField(max_length=500)),
+                ('metric', models.CharField(max_length=30)),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('total_sq', models.FloatField(default=0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='perfmaster.project')),
+            ],
+            options={
+                'db_table': 'perfmaster_metricrollups',
+                'unique_together': {('project', 'granularity', 'bucket_start', 'component_path', 'metric')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0003_metricrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metricrollup',
+            name='sketch',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
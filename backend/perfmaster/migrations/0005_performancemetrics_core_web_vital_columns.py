@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0004_metricrollup_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='performancemetrics',
+            name='lcp',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performancemetrics',
+            name='fid',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performancemetrics',
+            name='cls',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performancemetrics',
+            name='fcp',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performancemetrics',
+            name='ttfb',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='performancemetrics',
+            index=models.Index(fields=['project', 'timestamp', 'lcp', 'fid', 'cls'], name='perfmaster__project_cfcbca_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0006_alter_performancealerts_alert_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='performancealerts',
+            name='hit_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='performancealerts',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0007_performancealerts_hit_count_last_seen_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='performancealerts',
+            name='alert_type',
+            field=models.CharField(choices=[('lcp_threshold', 'LCP Threshold Exceeded'), ('fid_threshold', 'FID Threshold Exceeded'), ('cls_threshold', 'CLS Threshold Exceeded'), ('memory_leak', 'Memory Leak Detected'), ('bundle_size', 'Bundle Size Exceeded'), ('error_rate', 'High Error Rate'), ('render_time', 'Render Time Exceeded'), ('cpu_usage', 'CPU Usage Exceeded'), ('fcp_threshold', 'FCP Threshold Exceeded'), ('ttfb_threshold', 'TTFB Threshold Exceeded'), ('metric_trend', 'Metric Rising Rapidly'), ('metric_anomaly', 'Metric Anomaly Detected')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0008_alter_performancealerts_alert_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aianalysisresults',
+            name='cached_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cache_hits', to='perfmaster.aianalysisresults'),
+        ),
+        migrations.AddField(
+            model_name='aianalysisresults',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='aianalysisresults',
+            name='from_cache',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='AnalysisCacheEntry',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('analyzer_version', models.CharField(max_length=100)),
+                ('bottlenecks', models.JSONField(default=list)),
+                ('suggestions', models.JSONField(default=list)),
+                ('confidence_score', models.FloatField()),
+                ('component_name', models.CharField(max_length=255)),
+                ('performance_score', models.FloatField()),
+                ('dependencies', models.JSONField(default=list)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('analysis', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cache_entries', to='perfmaster.aianalysisresults')),
+            ],
+            options={
+                'db_table': 'perfmaster_analysiscacheentry',
+            },
+        ),
+    ]
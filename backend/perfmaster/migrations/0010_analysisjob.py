@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0009_analysis_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('framework_version', models.CharField(default='React 18', max_length=50)),
+                ('analysis_type', models.CharField(default='full', max_length=20)),
+                ('total_files', models.PositiveIntegerField(default=0)),
+                ('total_chunks', models.PositiveIntegerField(default=0)),
+                ('processed_files', models.PositiveIntegerField(default=0)),
+                ('failed_files', models.PositiveIntegerField(default=0)),
+                ('cached_files', models.PositiveIntegerField(default=0)),
+                ('completed_chunks', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='perfmaster.project')),
+            ],
+            options={
+                'db_table': 'perfmaster_analysisjob',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
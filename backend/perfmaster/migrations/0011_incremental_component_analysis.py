@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfmaster', '0010_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='componentanalysis',
+            name='analyzer_version',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='componentanalysis',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='componentanalysis',
+            name='processing_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='componentanalysis',
+            name='removed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='incremental',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='removed_files',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='skipped_files',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='time_saved',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
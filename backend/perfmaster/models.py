@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+import math
 import uuid
 
 
@@ -50,13 +51,64 @@ class PerformanceMetrics(models.Model):
     network_requests = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     dom_nodes = models.IntegerField(default=0, validators=[MinValueValidator(0)])
 
+    # Core Web Vitals promoted out of core_web_vitals (which keeps any extra vitals)
+    lcp = models.FloatField(null=True, blank=True)
+    fid = models.FloatField(null=True, blank=True)
+    cls = models.FloatField(null=True, blank=True)
+    fcp = models.FloatField(null=True, blank=True)
+    ttfb = models.FloatField(null=True, blank=True)
+
+    CORE_WEB_VITAL_FIELDS = ('lcp', 'fid', 'cls', 'fcp', 'ttfb')
+
     class Meta:
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['project', 'timestamp']),
             models.Index(fields=['component_path']),
+            models.Index(fields=['project', 'timestamp', 'lcp', 'fid', 'cls']),
         ]
 
+    def sync_core_web_vitals(self):
+        """Copy numeric vitals from core_web_vitals into their typed columns"""
+        vitals = self.core_web_vitals or {}
+        for name in self.CORE_WEB_VITAL_FIELDS:
+            value = vitals.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+                setattr(self, name, float(value))
+
+    def save(self, *args, **kwargs):
+        self.sync_core_web_vitals()
+        super().save(*args, **kwargs)
+
+
+class MetricRollup(models.Model):
+    """Pre-aggregated PerformanceMetrics per project, component, metric and time bucket"""
+    GRANULARITY_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='rollups')
+    component_path = models.CharField(max_length=500)
+    metric = models.CharField(max_length=30)
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    total = models.FloatField(default=0)
+    total_sq = models.FloatField(default=0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    sketch = models.JSONField(default=dict, blank=True)  # QuantileSketch for percentile metrics
+
+    class Meta:
+        app_label = 'perfmaster'
+        db_table = 'perfmaster_metricrollups'
+        unique_together = ['project', 'granularity', 'bucket_start', 'component_path', 'metric']
+
+    def __str__(self):
+        return f"{self.metric} {self.granularity} {self.bucket_start} ({self.component_path})"
+
 
 class AIAnalysisResults(models.Model):
     ANALYSIS_STATUS_CHOICES = [
@@ -75,6 +127,13 @@ class AIAnalysisResults(models.Model):
     model_used = models.CharField(max_length=100)
     status = models.CharField(max_length=20, choices=ANALYSIS_STATUS_CHOICES, default='pending')
     processing_time = models.FloatField(null=True, blank=True)
+    # sha256 of (source, framework version, analysis type, analyzer version)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    from_cache = models.BooleanField(default=False)
+    # Analysis whose results were reused, for rows served from the result cache
+    cached_from = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='cache_hits'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -140,6 +199,13 @@ class ComponentAnalysis(models.Model):
     optimization_opportunities = models.JSONField(default=list)
     dependencies = models.JSONField(default=list)
     analysis_metadata = models.JSONField(default=dict)
+    # Fingerprint of the analyzed source (see ai_engine.result_cache.content_hash); incremental
+    # batch analysis skips files whose hash and analyzer version are unchanged
+    content_hash = models.CharField(max_length=64, blank=True)
+    analyzer_version = models.CharField(max_length=100, blank=True)
+    processing_time = models.FloatField(null=True, blank=True)
+    # Set when an incremental analysis no longer finds the file
+    removed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -153,6 +219,77 @@ class ComponentAnalysis(models.Model):
         return f"{self.component_name} ({self.file_path})"
 
 
+class AnalysisCacheEntry(models.Model):
+    """Result of one component analysis, reused for identical source (see ai_engine.result_cache)"""
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    analyzer_version = models.CharField(max_length=100)
+    analysis = models.ForeignKey(
+        AIAnalysisResults, on_delete=models.SET_NULL, null=True, blank=True, related_name='cache_entries'
+    )
+    bottlenecks = models.JSONField(default=list)
+    suggestions = models.JSONField(default=list)
+    confidence_score = models.FloatField()
+    component_name = models.CharField(max_length=255)
+    performance_score = models.FloatField()
+    dependencies = models.JSONField(default=list)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        app_label = 'perfmaster'
+        db_table = 'perfmaster_analysiscacheentry'
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.analyzer_version})"
+
+
+class AnalysisJob(models.Model):
+    """Batch analysis of many files of one project, processed in chunks by worker tasks"""
+    JOB_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='analysis_jobs')
+    status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default='pending')
+    framework_version = models.CharField(max_length=50, default='React 18')
+    analysis_type = models.CharField(max_length=20, default='full')
+    # Incremental jobs analyze only new and changed files and mark missing ones removed
+    incremental = models.BooleanField(default=False)
+    skipped_files = models.PositiveIntegerField(default=0)
+    removed_files = models.PositiveIntegerField(default=0)
+    time_saved = models.FloatField(default=0.0)  # seconds the skipped files took when last analyzed
+    total_files = models.PositiveIntegerField(default=0)
+    total_chunks = models.PositiveIntegerField(default=0)
+    # Progress counters, incremented by each chunk task as it finishes
+    processed_files = models.PositiveIntegerField(default=0)
+    failed_files = models.PositiveIntegerField(default=0)
+    cached_files = models.PositiveIntegerField(default=0)
+    completed_chunks = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list)  # [{'file_path', 'error'}], capped per chunk
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        app_label = 'perfmaster'
+        db_table = 'perfmaster_analysisjob'
+        ordering = ['-created_at']
+
+    @property
+    def progress(self):
+        if not self.total_files:
+            return 1.0
+        return (self.processed_files + self.failed_files) / self.total_files
+
+    def __str__(self):
+        return f"Job {self.job_id} ({self.status})"
+
+
 class PerformanceAlerts(models.Model):
     ALERT_TYPES = [
         ('lcp_threshold', 'LCP Threshold Exceeded'),
@@ -161,6 +298,12 @@ class PerformanceAlerts(models.Model):
         ('memory_leak', 'Memory Leak Detected'),
         ('bundle_size', 'Bundle Size Exceeded'),
         ('error_rate', 'High Error Rate'),
+        ('render_time', 'Render Time Exceeded'),
+        ('cpu_usage', 'CPU Usage Exceeded'),
+        ('fcp_threshold', 'FCP Threshold Exceeded'),
+        ('ttfb_threshold', 'TTFB Threshold Exceeded'),
+        ('metric_trend', 'Metric Rising Rapidly'),
+        ('metric_anomaly', 'Metric Anomaly Detected'),
     ]
 
     SEVERITY_LEVELS = [
@@ -180,6 +323,8 @@ class PerformanceAlerts(models.Model):
     threshold_value = models.FloatField(null=True, blank=True)
     is_resolved = models.BooleanField(default=False)
     resolved_at = models.DateTimeField(null=True, blank=True)
+    hit_count = models.PositiveIntegerField(default=1)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -250,18 +395,15 @@ class APIKey(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
     name = models.CharField(max_length=100)
     key = models.CharField(max_length=64, unique=True)
-    project_id = models.CharField(max_length=100, unique=True)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='api_keys')
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     
     def save(self, *args, **kwargs):
         import secrets
-        import uuid
         
         if not self.key:
             self.key = secrets.token_hex(32)
-        if not self.project_id:
-            self.project_id = f"project-{uuid.uuid4().hex[:16]}"
         super().save(*args, **kwargs)
     
     class Meta:
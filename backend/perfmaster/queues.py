@@ -0,0 +1,161 @@
+"""
+Celery queues for the analysis workloads.
+
+Everything used to go to the one default queue, so a bulk ``apply_bulk`` or a
+repository-wide analysis could sit in front of the single-component analyses
+triggered from the dashboard. Tasks are now routed to one of three queues,
+each served by its own workers (see ``start.sh`` and ``perfmaster.celery``):
+
+- ``interactive``: single-component analyses and small requests (the default)
+- ``batch``: analysis job chunks, and interactive task types whose payload is
+  over ``TASK_ROUTING['INTERACTIVE_MAX_SOURCE_BYTES']`` of source or
+  ``TASK_ROUTING['INTERACTIVE_MAX_ITEMS']`` items
+- ``maintenance``: periodic housekeeping
+
+Every published task is stamped with its enqueue time. Workers record how long
+each task waited in its queue and how long it took end to end in Redis, and
+``queue_metrics()`` reports those percentiles with each queue's depth and the
+age of its oldest message.
+"""
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+MAINTENANCE = 'maintenance'
+QUEUES = (INTERACTIVE, BATCH, MAINTENANCE)
+
+# Tasks routed by type alone
+QUEUE_BY_TASK = {
+    'ai_engine.tasks.analyze_component_chunk': BATCH,
+    'performance_analyzer.tasks.enforce_metrics_retention': MAINTENANCE,
+    'performance_analyzer.tasks.resolve_stale_alerts': MAINTENANCE,
+}
+
+# Tasks routed by payload size: task name -> (argument, position, TASK_ROUTING limit)
+SIZED_TASKS = {
+    'ai_engine.tasks.analyze_component_performance': ('source_code', 2, 'INTERACTIVE_MAX_SOURCE_BYTES'),
+    'ai_engine.tasks.apply_optimization_suggestions': ('suggestion_ids', 0, 'INTERACTIVE_MAX_ITEMS'),
+    'ai_engine.tasks.analyze_metrics_batch': ('metrics_list', 0, 'INTERACTIVE_MAX_ITEMS'),
+}
+
+ENQUEUED_AT_HEADER = 'enqueued_at'
+METRICS_KEY = 'perfmaster:queue:{queue}:{metric}'
+
+
+def routing_settings():
+    config = {
+        'INTERACTIVE_MAX_SOURCE_BYTES': 256 * 1024,
+        'INTERACTIVE_MAX_ITEMS': 20,
+        'LATENCY_SAMPLES': 1000,
+    }
+    config.update(getattr(settings, 'TASK_ROUTING', {}))
+    return config
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Celery router: the queue for a task by its type and payload size; an explicit queue wins"""
+    if name in QUEUE_BY_TASK:
+        return {'queue': QUEUE_BY_TASK[name]}
+    if name in SIZED_TASKS:
+        argument, position, limit = SIZED_TASKS[name]
+        if kwargs and argument in kwargs:
+            payload = kwargs[argument]
+        elif args and len(args) > position:
+            payload = args[position]
+        else:
+            payload = None
+        if payload is not None and len(payload) > routing_settings()[limit]:
+            return {'queue': BATCH}
+        return {'queue': INTERACTIVE}
+    return None
+
+
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def _client():
+    global _redis
+    with _redis_lock:
+        if _redis is None:
+            import redis  # Import inside function
+            _redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1)
+        return _redis
+
+
+def stamp_enqueue_time(headers):
+    """``before_task_publish`` hook: record when the message was published"""
+    headers.setdefault(ENQUEUED_AT_HEADER, time.time())
+
+
+def record_latency(queue, metric, enqueued_at):
+    """Keep the last LATENCY_SAMPLES seconds between publishing and ``metric`` ('wait' or 'total') for ``queue``"""
+    if queue not in QUEUES or enqueued_at is None:
+        return
+    key = METRICS_KEY.format(queue=queue, metric=metric)
+    try:
+        pipeline = _client().pipeline(transaction=False)
+        pipeline.lpush(key, round(time.time() - float(enqueued_at), 4))
+        pipeline.ltrim(key, 0, routing_settings()['LATENCY_SAMPLES'] - 1)
+        pipeline.execute()
+    except Exception as e:
+        # Metrics must never fail a task
+        logger.warning(f"Could not record {metric} latency for queue {queue}: {e}")
+
+
+def _percentiles(samples):
+    if not samples:
+        return None
+    values = np.array([float(sample) for sample in samples]) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 1),
+        'p95': round(float(p95), 1),
+        'p99': round(float(p99), 1),
+        'samples': int(values.size),
+    }
+
+
+def _oldest_message_age(raw, now):
+    """Seconds since the oldest waiting message (the tail of the Redis list) was published"""
+    if raw is None:
+        return None
+    try:
+        enqueued_at = json.loads(raw)['headers'].get(ENQUEUED_AT_HEADER)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return round(now - float(enqueued_at), 3) if enqueued_at is not None else None
+
+
+def queue_metrics():
+    """Depth, oldest message age and latency percentiles (ms) of each queue, read from the Redis broker"""
+    try:
+        pipeline = _client().pipeline(transaction=False)
+        for queue in QUEUES:
+            pipeline.llen(queue)
+            pipeline.lindex(queue, -1)
+            pipeline.lrange(METRICS_KEY.format(queue=queue, metric='wait'), 0, -1)
+            pipeline.lrange(METRICS_KEY.format(queue=queue, metric='total'), 0, -1)
+        replies = pipeline.execute()
+    except Exception as e:
+        return {'error': f'Queue metrics unavailable: {e}'}
+
+    now = time.time()
+    metrics = {}
+    for index, queue in enumerate(QUEUES):
+        depth, oldest, wait, total = replies[index * 4:index * 4 + 4]
+        metrics[queue] = {
+            'depth': depth,
+            'oldest_message_age': _oldest_message_age(oldest, now),
+            'wait_ms': _percentiles(wait),
+            'latency_ms': _percentiles(total),
+        }
+    return metrics
@@ -0,0 +1,208 @@
+"""
+Retention policy for raw PerformanceMetrics rows and fine-grained rollups.
+
+Raw rows are kept for ``METRICS_RETENTION['RAW_DAYS']`` days, overridable per
+project with ``Project.performance_config['raw_retention_days']``. Every row is
+folded into the minute/hour/day rollups when it is written (see
+``perfmaster.rollups``), so expiring raw rows only loses per-sample detail; run
+``manage.py rebuild_rollups`` once for rows that predate the rollup tables.
+
+On PostgreSQL, once ``manage.py partition_metrics`` has converted the raw table
+into daily range partitions, whole partitions older than the longest project
+window are detached and dropped. Everything else (SQLite, unpartitioned
+Postgres, projects with shorter windows) is removed with chunked deletes.
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from perfmaster.rollups import truncate
+
+logger = logging.getLogger(__name__)
+
+METRICS_TABLE = 'perfmaster_performancemetrics'
+PARTITION_NAME_RE = re.compile(rf'^{METRICS_TABLE}_p(\d{{4}})(\d{{2}})(\d{{2}})$')
+
+
+def retention_config():
+    config = {
+        'RAW_DAYS': 30,
+        'MINUTE_ROLLUP_DAYS': 3,
+        'HOUR_ROLLUP_DAYS': 120,
+        'DAY_ROLLUP_DAYS': None,
+        'DELETE_CHUNK_SIZE': 5000,
+        'PARTITION_DAYS_AHEAD': 7,
+    }
+    config.update(getattr(settings, 'METRICS_RETENTION', {}))
+    return config
+
+
+def raw_retention_days(project, default_days):
+    """Raw retention window for a project, from performance_config or the global default"""
+    try:
+        days = int((project.performance_config or {}).get('raw_retention_days', default_days))
+    except (TypeError, ValueError):
+        return default_days
+    return max(days, 1)
+
+
+def partition_name(day):
+    return f'{METRICS_TABLE}_p{day:%Y%m%d}'
+
+
+def is_partitioned():
+    """True when the raw metrics table is a native PostgreSQL partitioned table"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+            [METRICS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """``[(name, day)]`` for the daily partitions of the raw metrics table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [METRICS_TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            year, month, day = (int(part) for part in match.groups())
+            partitions.append((name, datetime(year, month, day, tzinfo=dt_timezone.utc)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(days_ahead):
+    """Create daily partitions from today up to ``days_ahead`` days in the future"""
+    existing = {name for name, _ in list_partitions()}
+    today = truncate(timezone.now(), 'day')
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(days_ahead + 1):
+            day = today + timedelta(days=offset)
+            name = partition_name(day)
+            if name in existing:
+                continue
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{METRICS_TABLE}" '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [day, day + timedelta(days=1)]
+            )
+            created.append(name)
+    return created
+
+
+def drop_expired_partitions(cutoff):
+    """Detach and drop daily partitions that end at or before ``cutoff``"""
+    dropped = []
+    for name, day in list_partitions():
+        if day + timedelta(days=1) > cutoff:
+            break
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{METRICS_TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        dropped.append(name)
+        logger.info(f"Dropped metrics partition {name}")
+    return dropped
+
+
+def delete_in_chunks(queryset, chunk_size, on_chunk=None):
+    """Delete the rows of ``queryset`` ``chunk_size`` primary keys at a time"""
+    model = queryset.model
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        count, _ = model.objects.filter(pk__in=pks).delete()
+        deleted += count
+        if on_chunk:
+            on_chunk(deleted)
+
+
+def enforce_retention(progress=None):
+    """
+    Apply the retention policy once. ``progress`` is called with a stats dict
+    after every stage and chunk so callers (the Celery task) can report it.
+    """
+    from perfmaster.models import MetricRollup, PerformanceMetrics, Project  # Import inside function
+
+    config = retention_config()
+    chunk_size = config['DELETE_CHUNK_SIZE']
+    now = timezone.now()
+    stats = {
+        'stage': 'starting',
+        'projects': 0,
+        'raw_rows_deleted': 0,
+        'partitions_created': 0,
+        'partitions_dropped': 0,
+        'rollups_deleted': 0,
+    }
+
+    def report(stage=None):
+        if stage:
+            stats['stage'] = stage
+        if progress:
+            progress(dict(stats))
+
+    projects = list(Project.objects.only('project_id', 'performance_config'))
+    windows = {project.project_id: raw_retention_days(project, config['RAW_DAYS']) for project in projects}
+    stats['projects'] = len(windows)
+    longest_window = max(windows.values(), default=config['RAW_DAYS'])
+
+    partitioned = is_partitioned()
+    if partitioned:
+        report('partitions')
+        stats['partitions_created'] = len(ensure_partitions(config['PARTITION_DAYS_AHEAD']))
+        global_cutoff = truncate(now - timedelta(days=longest_window), 'day')
+        stats['partitions_dropped'] = len(drop_expired_partitions(global_cutoff))
+        report()
+
+    report('raw_metrics')
+    for project_id, days in windows.items():
+        if partitioned and days >= longest_window:
+            continue  # Covered by dropping whole partitions
+        expired = PerformanceMetrics.objects.filter(
+            project_id=project_id,
+            timestamp__lt=now - timedelta(days=days)
+        ).order_by()
+        base = stats['raw_rows_deleted']
+
+        def on_chunk(deleted, base=base):
+            stats['raw_rows_deleted'] = base + deleted
+            report()
+
+        delete_in_chunks(expired, chunk_size, on_chunk)
+
+    report('rollups')
+    for granularity, key in (('minute', 'MINUTE_ROLLUP_DAYS'), ('hour', 'HOUR_ROLLUP_DAYS'), ('day', 'DAY_ROLLUP_DAYS')):
+        if not config[key]:
+            continue
+        expired = MetricRollup.objects.filter(
+            granularity=granularity,
+            bucket_start__lt=now - timedelta(days=config[key])
+        ).order_by()
+        base = stats['rollups_deleted']
+
+        def on_chunk(deleted, base=base):
+            stats['rollups_deleted'] = base + deleted
+            report()
+
+        delete_in_chunks(expired, chunk_size, on_chunk)
+
+    report('done')
+    return stats
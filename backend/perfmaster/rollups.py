@@ -0,0 +1,319 @@
+"""
+Minute/hour/day rollups of PerformanceMetrics.
+
+Every batch of raw rows written through ``perfmaster.ingest.write_metrics`` is
+folded into ``MetricRollup`` buckets (count, sum, sum of squares, min, max per
+metric, plus a quantile sketch for ``SKETCH_METRICS``) at all three
+granularities. Totals are added in the database with an upsert, so writers in
+different processes never overwrite each other's samples. Read paths cover a
+time range with the coarsest buckets that fit it instead of scanning raw rows.
+"""
+import math
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q, Sum, Min, Max
+from django.utils import timezone
+
+from perfmaster.sketches import QuantileSketch
+
+# Columns on PerformanceMetrics that are rolled up
+METRIC_FIELDS = ('render_time', 'memory_usage', 'bundle_size', 'cpu_usage')
+CORE_WEB_VITALS = ('lcp', 'fid', 'cls', 'fcp', 'ttfb')
+METRICS = METRIC_FIELDS + CORE_WEB_VITALS
+# Metrics that also keep a mergeable quantile sketch per bucket
+SKETCH_METRICS = ('lcp', 'fid', 'cls', 'render_time', 'memory_usage')
+PERCENTILES = (('p50', 0.5), ('p75', 0.75), ('p95', 0.95), ('p99', 0.99))
+
+GRANULARITIES = ('minute', 'hour', 'day')
+BUCKET_SIZES = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def truncate(timestamp, granularity):
+    """Start of the bucket that contains ``timestamp``"""
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil(timestamp, granularity):
+    start = truncate(timestamp, granularity)
+    return start if start == timestamp else start + BUCKET_SIZES[granularity]
+
+
+def metric_values(row):
+    """Yield ``(metric, value)`` for every rolled-up metric present on a PerformanceMetrics row"""
+    for field in METRICS:
+        value = getattr(row, field)
+        if value is not None:
+            yield field, float(value)
+
+
+def _collect_deltas(rows):
+    deltas = {}
+    for row in rows:
+        buckets = [(granularity, truncate(row.timestamp, granularity)) for granularity in GRANULARITIES]
+        for metric, value in metric_values(row):
+            for granularity, bucket_start in buckets:
+                key = (row.project_id, granularity, bucket_start, row.component_path, metric)
+                delta = deltas.get(key)
+                if delta is None:
+                    delta = deltas[key] = [0, 0.0, 0.0, value, value, []]
+                delta[0] += 1
+                delta[1] += value
+                delta[2] += value * value
+                delta[3] = min(delta[3], value)
+                delta[4] = max(delta[4], value)
+                if metric in SKETCH_METRICS:
+                    delta[5].append(value)
+    return deltas
+
+
+def _upsert_totals(deltas):
+    """
+    Add each delta's count, sums and extremes to its bucket with one
+    ``INSERT ... ON CONFLICT DO UPDATE`` per row, so concurrent writers add to
+    the stored totals instead of overwriting them
+    """
+    from perfmaster.models import MetricRollup  # Import inside function
+
+    table = connection.ops.quote_name(MetricRollup._meta.db_table)
+    least, greatest = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+    sql = (
+        f'INSERT INTO {table} (project_id, granularity, bucket_start, component_path, metric, '
+        f'"count", total, total_sq, minimum, maximum, sketch) '
+        f'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) '
+        f'ON CONFLICT (project_id, granularity, bucket_start, component_path, metric) DO UPDATE SET '
+        f'"count" = {table}."count" + excluded."count", '
+        f'total = {table}.total + excluded.total, '
+        f'total_sq = {table}.total_sq + excluded.total_sq, '
+        f'minimum = {least}(COALESCE({table}.minimum, excluded.minimum), excluded.minimum), '
+        f'maximum = {greatest}(COALESCE({table}.maximum, excluded.maximum), excluded.maximum)'
+    )
+    empty_sketch = connection.ops.adapt_json_value({}, None)
+    params = []
+    for (project_id, granularity, bucket_start, component_path, metric), delta in deltas.items():
+        count, total, total_sq, minimum, maximum, _ = delta
+        params.append((
+            project_id, granularity, connection.ops.adapt_datetimefield_value(bucket_start), component_path, metric,
+            count, total, total_sq, minimum, maximum, empty_sketch,
+        ))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _merge_sketches(deltas):
+    """
+    Fold the sampled values into the buckets' quantile sketches. Runs after
+    ``_upsert_totals`` in the same transaction, whose writes already lock the
+    rows (PostgreSQL) or the database (SQLite), so no other writer interleaves.
+    """
+    from perfmaster.models import MetricRollup  # Import inside function
+
+    sketched = {key: delta[5] for key, delta in deltas.items() if delta[5]}
+    if not sketched:
+        return
+    existing = MetricRollup.objects.select_for_update().filter(
+        project_id__in={key[0] for key in sketched},
+        granularity__in={key[1] for key in sketched},
+        bucket_start__in={key[2] for key in sketched},
+        component_path__in={key[3] for key in sketched},
+        metric__in={key[4] for key in sketched},
+    ).only('pk', 'project_id', 'granularity', 'bucket_start', 'component_path', 'metric', 'sketch')
+
+    to_update = []
+    for rollup in existing:
+        key = (rollup.project_id, rollup.granularity, rollup.bucket_start, rollup.component_path, rollup.metric)
+        values = sketched.get(key)
+        if values is None:
+            continue
+        sketch = QuantileSketch.from_dict(rollup.sketch) if rollup.sketch else QuantileSketch()
+        sketch.add_many(values)
+        rollup.sketch = sketch.to_dict()
+        to_update.append(rollup)
+    if to_update:
+        MetricRollup.objects.bulk_update(to_update, ['sketch'], batch_size=500)
+
+
+def record_metrics(rows):
+    """Fold freshly written PerformanceMetrics rows into their minute/hour/day rollups"""
+    deltas = _collect_deltas(rows)
+    if not deltas:
+        return 0
+
+    with transaction.atomic():
+        _upsert_totals(deltas)
+        _merge_sketches(deltas)
+    return len(deltas)
+
+
+def plan_segments(start, end=None, expired_before=None):
+    """
+    Split ``[start, end)`` into ``(granularity, from, to)`` segments using the
+    coarsest buckets that fit. ``end=None`` means "up to now"; the current
+    hour/day buckets are maintained incrementally, so they can be used as-is.
+    ``expired_before`` maps a granularity to the time before which retention
+    has deleted its buckets; segments starting earlier are read from the next
+    coarser buckets, rounded down to their boundaries so adjacent ranges still
+    never share a bucket.
+    """
+    segments = _plan_segments(start, end)
+    for granularity, coarser in (('minute', 'hour'), ('hour', 'day')):
+        since = (expired_before or {}).get(granularity)
+        if since is None:
+            continue
+        segments = [
+            (coarser, truncate(segment_start, coarser), truncate(segment_end, coarser))
+            if segment_granularity == granularity and segment_start < since
+            else (segment_granularity, segment_start, segment_end)
+            for segment_granularity, segment_start, segment_end in segments
+        ]
+    return segments
+
+
+def _plan_segments(start, end):
+    start = truncate(start, 'minute')
+    hour_start = _ceil(start, 'hour')
+
+    if end is None:
+        day_start = _ceil(hour_start, 'day')
+        return [
+            ('minute', start, hour_start),
+            ('hour', hour_start, day_start),
+            ('day', day_start, None),
+        ]
+
+    end = truncate(end, 'minute')
+    hour_end = truncate(end, 'hour')
+    if hour_start >= hour_end:
+        return [('minute', start, end)]
+
+    day_start = _ceil(hour_start, 'day')
+    day_end = truncate(hour_end, 'day')
+    if day_start >= day_end:
+        return [
+            ('minute', start, hour_start),
+            ('hour', hour_start, hour_end),
+            ('minute', hour_end, end),
+        ]
+
+    return [
+        ('minute', start, hour_start),
+        ('hour', hour_start, day_start),
+        ('day', day_start, day_end),
+        ('hour', day_end, hour_end),
+        ('minute', hour_end, end),
+    ]
+
+
+def rollups_for_range(projects, start, end=None):
+    """MetricRollup queryset covering ``[start, end)`` for the given projects (queryset or ids)"""
+    from perfmaster.models import MetricRollup  # Import inside function
+    from perfmaster.retention import retention_config  # Import inside function
+
+    config = retention_config()
+    now = timezone.now()
+    expired_before = {
+        granularity: now - timedelta(days=config[key])
+        for granularity, key in (('minute', 'MINUTE_ROLLUP_DAYS'), ('hour', 'HOUR_ROLLUP_DAYS'))
+        if config[key]
+    }
+    covering = None
+    for granularity, segment_start, segment_end in plan_segments(start, end, expired_before):
+        segment = Q(granularity=granularity, bucket_start__gte=segment_start)
+        if segment_end is not None:
+            if segment_end <= segment_start:
+                continue
+            segment &= Q(bucket_start__lt=segment_end)
+        covering = segment if covering is None else covering | segment
+
+    if covering is None:
+        return MetricRollup.objects.none()
+    return MetricRollup.objects.filter(project__in=projects).filter(covering)
+
+
+def _stats(count, total, total_sq, minimum, maximum):
+    if not count:
+        return {'count': 0, 'mean': None, 'min': None, 'max': None, 'stddev': None}
+    mean = total / count
+    variance = max(total_sq / count - mean * mean, 0.0)
+    return {
+        'count': count,
+        'mean': mean,
+        'min': minimum,
+        'max': maximum,
+        'stddev': math.sqrt(variance),
+    }
+
+
+def summarize(rollups, metrics=METRICS):
+    """Combine rollup buckets into ``{metric: {count, mean, min, max, stddev}}``"""
+    summary = {metric: _stats(0, 0, 0, None, None) for metric in metrics}
+    rows = rollups.filter(metric__in=metrics).values('metric').annotate(
+        sum_count=Sum('count'),
+        sum_total=Sum('total'),
+        sum_total_sq=Sum('total_sq'),
+        min_value=Min('minimum'),
+        max_value=Max('maximum'),
+    ).order_by()
+    for row in rows:
+        summary[row['metric']] = _stats(
+            row['sum_count'], row['sum_total'], row['sum_total_sq'], row['min_value'], row['max_value']
+        )
+    return summary
+
+
+def percentiles(rollups, metrics=SKETCH_METRICS):
+    """Merge the bucket sketches of a rollup queryset into ``{metric: {count, p50, p75, p95, p99}}``"""
+    metrics = [metric for metric in metrics if metric in SKETCH_METRICS]
+    merged = {metric: QuantileSketch() for metric in metrics}
+    for metric, sketch in rollups.filter(metric__in=metrics).values_list('metric', 'sketch').iterator():
+        if sketch:
+            merged[metric].merge(QuantileSketch.from_dict(sketch))
+
+    result = {}
+    for metric, sketch in merged.items():
+        result[metric] = {'count': sketch.count}
+        for label, q in PERCENTILES:
+            value = sketch.quantile(q)
+            result[metric][label] = round(value, 4) if value is not None else None
+    return result
+
+
+def sample_count(rollups):
+    """Number of raw samples behind a rollup queryset (every sample carries render_time)"""
+    return rollups.filter(metric='render_time').aggregate(total=Sum('count'))['total'] or 0
+
+
+def daily_averages(projects, start, metrics):
+    """Per-day averages from day buckets, shaped like ``values('timestamp__date').annotate(avg_...)``"""
+    from perfmaster.models import MetricRollup  # Import inside function
+
+    rows = MetricRollup.objects.filter(
+        project__in=projects,
+        granularity='day',
+        bucket_start__gte=truncate(start, 'day'),
+        metric__in=metrics,
+    ).values('bucket_start', 'metric').annotate(
+        sum_count=Sum('count'),
+        sum_total=Sum('total'),
+    ).order_by('bucket_start')
+
+    days = {}
+    for row in rows:
+        day = days.setdefault(row['bucket_start'].date(), {'timestamp__date': row['bucket_start'].date()})
+        day[f"avg_{row['metric']}"] = row['sum_total'] / row['sum_count'] if row['sum_count'] else None
+
+    series = []
+    for date in sorted(days):
+        day = days[date]
+        for metric in metrics:
+            day.setdefault(f'avg_{metric}', None)
+        series.append(day)
+    return series
@@ -104,6 +104,25 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True  # Fix deprecation warning
+# Reserve one task at a time, so a long batch task never holds back the ones queued behind it
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BEAT_SCHEDULE = {
+    'enforce-metrics-retention': {
+        'task': 'performance_analyzer.tasks.enforce_metrics_retention',
+        'schedule': timedelta(hours=1),
+    },
+    'resolve-stale-alerts': {
+        'task': 'performance_analyzer.tasks.resolve_stale_alerts',
+        'schedule': timedelta(minutes=5),
+    },
+}
+
+# Celery routing (perfmaster.queues): larger payloads of interactive task types go to the batch queue
+TASK_ROUTING = {
+    'INTERACTIVE_MAX_SOURCE_BYTES': 256 * 1024,
+    'INTERACTIVE_MAX_ITEMS': 20,  # suggestions or metrics rows
+    'LATENCY_SAMPLES': 1000,  # per queue, kept in Redis
+}
 
 # JWT Settings
 SIMPLE_JWT = {
@@ -176,10 +195,13 @@ CORS_ALLOW_HEADERS = [
     'accept-encoding',
     'authorization',
     'content-type',
+    'content-encoding',
     'dnt',
     'origin',
     'user-agent',
+    'x-api-key',
     'x-csrftoken',
+    'x-project-id',
     'x-requested-with',
 ]
 
@@ -196,6 +218,39 @@ CORS_ALLOW_METHODS = [
 HUGGINGFACE_API_TOKEN = os.getenv('HUGGINGFACE_API_TOKEN')
 TENSORFLOW_MODEL_PATH = os.path.join(BASE_DIR, 'ai_models')
 
+# Models load per capability on first use; Celery worker pools that run AI tasks
+# can load some at process start instead, e.g. AI_PRELOAD=code_analysis,optimization
+AI_ENGINE = {
+    # 'numpy' runs exported weights (manage.py export_ai_models) without TensorFlow, else falls back to it
+    'BACKEND': os.getenv('AI_BACKEND', 'numpy'),
+    'MODEL_DIR': TENSORFLOW_MODEL_PATH,
+    'PRELOAD': [name.strip() for name in os.getenv('AI_PRELOAD', '').split(',') if name.strip()],
+    # Concurrent analyze_performance_metrics calls within this window share one model call
+    'BATCH_WINDOW_MS': 5,
+    'MAX_BATCH_SIZE': 64,
+    # Inference runs in a pool of spawned processes (0 = in the calling process). With a socket, one
+    # pool per host in manage.py run_inference_server serves every web and Celery process
+    'INFERENCE_WORKERS': int(os.getenv('AI_INFERENCE_WORKERS', 2)),
+    'INFERENCE_SOCKET': os.getenv('AI_INFERENCE_SOCKET', ''),
+    'INFERENCE_QUEUE_DEPTH': int(os.getenv('AI_INFERENCE_QUEUE_DEPTH', 256)),  # in-flight requests per process
+    'INFERENCE_TIMEOUT': 30,  # seconds
+}
+
+# Component analyses are cached by hash of (source, framework version, analysis type, analyzer version)
+ANALYSIS_CACHE = {
+    'MAX_ENTRIES': int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 10000)),  # least recently used evicted beyond this
+    'TTL_DAYS': 30,
+}
+
+# Batch analysis (POST /api/v1/analysis/analyze_batch/) - files are analyzed in chunks of CHUNK_SIZE per task
+BATCH_ANALYSIS = {
+    'CHUNK_SIZE': int(os.getenv('BATCH_ANALYSIS_CHUNK_SIZE', 50)),
+    'MAX_FILES': 5000,
+    'MAX_FILE_BYTES': 512 * 1024,  # larger files in an archive are skipped
+    'MAX_ARCHIVE_BYTES': 200 * 1024 * 1024,  # uncompressed source in one archive
+    'EXTENSIONS': ('.js', '.jsx', '.ts', '.tsx', '.vue'),
+}
+
 # Performance Analysis Settings
 PERFORMANCE_ANALYSIS = {
     'MAX_COMPONENT_DEPTH': 10,
@@ -204,6 +259,60 @@ PERFORMANCE_ANALYSIS = {
     'CACHE_TIMEOUT': 300,
 }
 
+# Metric ingestion - WebSocket samples are buffered per process and bulk inserted
+METRICS_INGEST = {
+    'FLUSH_MAX_ROWS': int(os.getenv('METRICS_FLUSH_MAX_ROWS', 500)),
+    'FLUSH_INTERVAL': float(os.getenv('METRICS_FLUSH_INTERVAL', 0.25)),  # seconds
+    'MAX_BUFFERED_ROWS': int(os.getenv('METRICS_MAX_BUFFERED_ROWS', 50000)),
+    # HTTP batch uploads (/api/v1/metrics/batch/)
+    'MAX_BATCH_ROWS': int(os.getenv('METRICS_MAX_BATCH_ROWS', 5000)),
+    'MAX_BATCH_BYTES': int(os.getenv('METRICS_MAX_BATCH_BYTES', 10 * 1024 * 1024)),
+}
+
+# In-process project / API key lookup cache used by the ingest path (seconds)
+LOOKUP_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': int(os.getenv('LOOKUP_CACHE_TTL', 300)),
+    'NEGATIVE_TTL': 30,
+}
+
+# Real-time analytics: aggregates are recomputed once per interval for all open sockets
+REALTIME = {
+    'ANALYTICS_INTERVAL': int(os.getenv('REALTIME_ANALYTICS_INTERVAL', 30)),
+    # Updates to a room within this window go out as one performance_summary frame
+    # (per project override: performance_config['broadcast_window_ms'], 0 disables)
+    'BROADCAST_WINDOW_MS': int(os.getenv('REALTIME_BROADCAST_WINDOW_MS', 200)),
+}
+
+# Streaming anomaly detection per (project, component, metric) series
+ANOMALY = {
+    'WINDOW': 64,  # samples kept per series for the median / MAD
+    'ALPHA': 0.1,  # EWMA weight of a new sample
+    'WARMUP': 16,  # samples before a series is scored
+    'MAX_SERIES': int(os.getenv('ANOMALY_MAX_SERIES', 50000)),
+    'BROADCAST_MIN_SCORE': 3.0,  # anomaly_scores frames only carry series scoring at least this
+    'BASELINE_MINUTES': 60,  # minute rollups on-demand analysis scores against
+}
+
+# Alert state: repeated hits update the open alert, which resolves after
+# CLEAN_WINDOWS_TO_RESOLVE quiet evaluation windows; reopening within the cooldown (seconds) is not re-notified
+ALERTS = {
+    'COOLDOWN_SECONDS': int(os.getenv('ALERT_COOLDOWN_SECONDS', 300)),
+    'EVALUATION_WINDOW_SECONDS': int(os.getenv('ALERT_EVALUATION_WINDOW_SECONDS', 60)),
+    'CLEAN_WINDOWS_TO_RESOLVE': int(os.getenv('ALERT_CLEAN_WINDOWS_TO_RESOLVE', 3)),
+    'STATE_REFRESH_SECONDS': 60,
+}
+
+# Raw metric retention (per project override: performance_config['raw_retention_days'])
+METRICS_RETENTION = {
+    'RAW_DAYS': int(os.getenv('METRICS_RAW_RETENTION_DAYS', 30)),
+    'MINUTE_ROLLUP_DAYS': 3,
+    'HOUR_ROLLUP_DAYS': 120,
+    'DAY_ROLLUP_DAYS': None,  # keep daily rollups forever
+    'DELETE_CHUNK_SIZE': 5000,
+    'PARTITION_DAYS_AHEAD': 7,  # PostgreSQL only, after manage.py partition_metrics
+}
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from perfmaster.lookups import alert_threshold_cache, api_key_cache, project_cache, username_cache
+from perfmaster.models import APIKey, Project, UserPreferences
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_lookup(sender, instance, **kwargs):
+    """Drop the cached project so the next lookup sees the new config (or its absence)"""
+    project_cache.invalidate(instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=APIKey)
+def invalidate_api_key_lookup(sender, instance, **kwargs):
+    api_key_cache.invalidate(instance.key)
+
+
+@receiver([post_save, post_delete], sender=UserPreferences)
+def invalidate_alert_thresholds(sender, instance, **kwargs):
+    """Owner thresholds feed the alert rules of every project the user created"""
+    alert_threshold_cache.invalidate(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_username_lookup(sender, instance, **kwargs):
+    username_cache.invalidate(instance.get_username())
@@ -0,0 +1,122 @@
+"""
+Mergeable quantile sketches for metric distributions.
+
+``QuantileSketch`` is a log-bucketed histogram (DDSketch style): every value is
+counted in the bucket ``ceil(log_gamma(value))``, which bounds the relative
+error of any quantile by ``relative_accuracy``. Two sketches merge by adding
+bucket counts, so percentiles over any range come from combining small
+per-bucket sketches rather than sorting raw rows.
+"""
+import math
+
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BUCKETS = 2048
+# Values at or below this are counted as zero (CLS, FID and friends are often exactly 0)
+MIN_POSITIVE_VALUE = 1e-9
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_buckets=DEFAULT_MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+
+    @property
+    def count(self):
+        return int(self.zero_count + self.counts.sum())
+
+    def add(self, value):
+        self.add_many([value])
+
+    def add_many(self, values):
+        """Add a batch of values with one vectorized bucket assignment"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return
+
+        positive = values[values > MIN_POSITIVE_VALUE]
+        self.zero_count += int(values.size - positive.size)
+        if not positive.size:
+            return
+
+        indexes = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        low = int(indexes.min())
+        self._add_dense(low, np.bincount(indexes - low))
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different relative accuracy')
+        self.zero_count += other.zero_count
+        if other.counts.size:
+            self._add_dense(other.offset, other.counts)
+
+    def _add_dense(self, offset, counts):
+        if not self.counts.size:
+            self.offset = offset
+            self.counts = counts.astype(np.int64)
+        else:
+            low = min(self.offset, offset)
+            high = max(self.offset + self.counts.size, offset + counts.size)
+            merged = np.zeros(high - low, dtype=np.int64)
+            merged[self.offset - low:self.offset - low + self.counts.size] += self.counts
+            merged[offset - low:offset - low + counts.size] += counts
+            self.offset = low
+            self.counts = merged
+        self._collapse()
+
+    def _collapse(self):
+        # Bound the sketch size by folding the lowest buckets together
+        extra = self.counts.size - self.max_buckets
+        if extra > 0:
+            head = self.counts[:extra + 1].sum()
+            self.counts = self.counts[extra:].copy()
+            self.counts[0] = head
+            self.offset += extra
+
+    def quantile(self, q):
+        """Estimate the ``q``-quantile (0 <= q <= 1); None for an empty sketch"""
+        total = self.count
+        if not total:
+            return None
+
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        cumulative = np.cumsum(self.counts)
+        position = int(np.searchsorted(cumulative, rank - self.zero_count, side='right'))
+        position = min(position, self.counts.size - 1)
+        index = self.offset + position
+        return float(2 * self.gamma ** index / (self.gamma + 1))
+
+    def quantiles(self, qs):
+        return [self.quantile(q) for q in qs]
+
+    def to_dict(self):
+        """Compact JSON-serializable form"""
+        nonzero = np.flatnonzero(self.counts)
+        if not nonzero.size:
+            return {'a': self.relative_accuracy, 'z': self.zero_count, 'o': 0, 'c': []}
+        first, last = int(nonzero[0]), int(nonzero[-1])
+        return {
+            'a': self.relative_accuracy,
+            'z': self.zero_count,
+            'o': self.offset + first,
+            'c': self.counts[first:last + 1].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(relative_accuracy=data.get('a', DEFAULT_RELATIVE_ACCURACY))
+        sketch.zero_count = int(data.get('z', 0))
+        sketch.offset = int(data.get('o', 0))
+        sketch.counts = np.asarray(data.get('c', []), dtype=np.int64)
+        return sketch
@@ -49,9 +49,10 @@ class PerformanceMetricsSerializer(serializers.ModelSerializer):
         fields = [
             'metric_id', 'project', 'project_name', 'component_path',
             'render_time', 'memory_usage', 'bundle_size', 'core_web_vitals',
+            'lcp', 'fid', 'cls', 'fcp', 'ttfb',
             'cpu_usage', 'network_requests', 'dom_nodes', 'timestamp'
         ]
-        read_only_fields = ['metric_id', 'timestamp']
+        read_only_fields = ['metric_id', 'timestamp', 'lcp', 'fid', 'cls', 'fcp', 'ttfb']
 
     def validate_core_web_vitals(self, value):
         """Validate Core Web Vitals structure"""
@@ -70,12 +71,14 @@ class ComponentAnalysisSerializer(serializers.ModelSerializer):
     class Meta:
         model = ComponentAnalysis
         fields = [
-            'component_id', 'project', 'project_name', 'file_path',
+            'analysis_id', 'project', 'project_name', 'file_path',
             'component_name', 'performance_score', 'optimization_opportunities',
-            'dependencies', 'render_count', 'last_analyzed', 'created_at',
-            'optimization_count'
+            'dependencies', 'content_hash', 'analyzer_version', 'removed_at',
+            'updated_at', 'created_at', 'optimization_count'
+        ]
+        read_only_fields = [
+            'analysis_id', 'content_hash', 'analyzer_version', 'removed_at', 'updated_at', 'created_at'
         ]
-        read_only_fields = ['component_id', 'last_analyzed', 'created_at']
 
     def get_optimization_count(self, obj):
         return len(obj.optimization_opportunities)
@@ -108,17 +111,16 @@ class PerformanceSnapshotSerializer(serializers.ModelSerializer):
 
 class PerformanceAlertSerializer(serializers.ModelSerializer):
     project_name = serializers.CharField(source='project.name', read_only=True)
-    resolved_by_username = serializers.CharField(source='resolved_by.username', read_only=True)
     time_since_created = serializers.SerializerMethodField()
 
     class Meta:
         model = PerformanceAlerts
         fields = [
-            'alert_id', 'project', 'project_name', 'alert_type', 'severity',
-            'message', 'metadata', 'resolved', 'resolved_at', 'resolved_by',
-            'resolved_by_username', 'created_at', 'time_since_created'
+            'alert_id', 'project', 'project_name', 'component_path', 'alert_type', 'severity',
+            'message', 'metric_value', 'threshold_value', 'is_resolved', 'resolved_at',
+            'hit_count', 'last_seen_at', 'created_at', 'time_since_created'
         ]
-        read_only_fields = ['alert_id', 'created_at', 'time_since_created']
+        read_only_fields = ['alert_id', 'hit_count', 'last_seen_at', 'created_at', 'time_since_created']
 
     def get_time_since_created(self, obj):
         from django.utils import timezone
@@ -0,0 +1,39 @@
+from celery import shared_task
+from django.utils import timezone
+import time
+
+from perfmaster.alerts import resolve_quiet_alerts
+from perfmaster.retention import enforce_retention
+
+
+@shared_task(bind=True)
+def enforce_metrics_retention(self):
+    """
+    Expire raw metrics and fine-grained rollups according to METRICS_RETENTION
+    """
+    start_time = time.time()
+
+    def report_progress(stats):
+        self.update_state(state='PROGRESS', meta=stats)
+
+    stats = enforce_retention(progress=report_progress)
+    stats['duration'] = time.time() - start_time
+    stats['finished_at'] = timezone.now().isoformat()
+
+    print(
+        f"Retention run: {stats['raw_rows_deleted']} raw rows, "
+        f"{stats['partitions_dropped']} partitions, {stats['rollups_deleted']} rollups removed "
+        f"in {stats['duration']:.1f}s"
+    )
+    return stats
+
+
+@shared_task
+def resolve_stale_alerts():
+    """
+    Resolve open alerts that stopped receiving hits, including projects that stopped sending metrics
+    """
+    resolved = resolve_quiet_alerts()
+    if resolved:
+        print(f"Resolved {resolved} quiet alerts")
+    return resolved
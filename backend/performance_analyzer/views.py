@@ -4,12 +4,23 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q, Avg, Count
 from django.utils import timezone
 from datetime import timedelta
+import uuid
 from perfmaster.models import (
     Project, PerformanceMetrics, PerformanceSnapshots,
-    ComponentAnalysis, PerformanceAlerts, UserPreferences, APIKey
+    ComponentAnalysis, PerformanceAlerts, UserPreferences, APIKey, MetricRollup
+)
+from perfmaster.ingest import (
+    BatchPayloadError, decode_batch_payload, validate_samples, write_metrics
+)
+from perfmaster.alerts import alert_tracker, evaluate_alerts
+from perfmaster.lookups import api_key_cache, project_cache
+from perfmaster.rollups import (
+    daily_averages, percentiles, record_metrics, rollups_for_range, sample_count, summarize, truncate
 )
 from .serializers import (
     ProjectSerializer, PerformanceMetricsSerializer, PerformanceSnapshotSerializer,
@@ -178,14 +189,33 @@ def delete_api_key(request, key_id):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def generate_api_key(request):
-    """Generate a new API key for the authenticated user"""
+    """
+    Generate a new API key for the authenticated user, scoped to one of their
+    projects, or to a new project created for the key when no project_id is given
+    """
     name = request.data.get('name', 'Generated API Key')
+    project_id = request.data.get('project_id')
+    if project_id:
+        project = Project.objects.filter(
+            Q(created_by=request.user) | Q(team_members=request.user), project_id=project_id
+        ).distinct().first()
+        if project is None:
+            return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Create new API key
-    api_key = APIKey.objects.create(
-        user=request.user,
-        name=name
-    )
+    with transaction.atomic():
+        if not project_id:
+            project = Project.objects.create(
+                project_id=f"project-{uuid.uuid4().hex[:16]}",
+                name=name,
+                created_by=request.user
+            )
+        
+        # Create new API key
+        api_key = APIKey.objects.create(
+            user=request.user,
+            project=project,
+            name=name
+        )
     
     serializer = APIKeySerializer(api_key)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -213,30 +243,30 @@ class ProjectViewSet(viewsets.ModelViewSet):
         
         # Get performance trends (last 30 days)
         thirty_days_ago = timezone.now() - timedelta(days=30)
-        trend_data = PerformanceMetrics.objects.filter(
-            project=project,
-            timestamp__gte=thirty_days_ago
-        ).values('timestamp__date').annotate(
-            avg_render_time=Avg('render_time'),
-            avg_memory_usage=Avg('memory_usage'),
-            avg_bundle_size=Avg('bundle_size')
-        ).order_by('timestamp__date')
+        trend_data = daily_averages(
+            [project.pk], thirty_days_ago, ('render_time', 'memory_usage', 'bundle_size')
+        )
+        
+        # Tail latency per metric over the same window (Core Web Vitals are judged at p75)
+        metric_percentiles = percentiles(rollups_for_range([project.pk], thirty_days_ago))
         
         # Get component analysis
         components = ComponentAnalysis.objects.filter(
-            project=project
+            project=project,
+            removed_at__isnull=True
         ).order_by('-performance_score')[:5]
         
         # Get active alerts
         active_alerts = PerformanceAlerts.objects.filter(
             project=project,
-            resolved=False
+            is_resolved=False
         ).order_by('-created_at')[:5]
         
         return Response({
             'project': ProjectSerializer(project).data,
             'latest_metrics': PerformanceMetricsSerializer(latest_metrics, many=True).data,
-            'trends': list(trend_data),
+            'trends': trend_data,
+            'percentiles': metric_percentiles,
             'top_components': ComponentAnalysisSerializer(components, many=True).data,
             'active_alerts': PerformanceAlertSerializer(active_alerts, many=True).data,
         })
@@ -290,25 +320,116 @@ class PerformanceMetricsViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-timestamp')
 
+    def perform_create(self, serializer):
+        metric = serializer.save()
+        record_metrics([metric])
+        evaluate_alerts([metric])
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get performance metrics summary"""
-        queryset = self.get_queryset()
+        user = request.user
+        project_ids = Project.objects.filter(
+            Q(created_by=user) | Q(team_members=user)
+        ).values_list('project_id', flat=True)
         
         # Get date range from query params
         days = int(request.query_params.get('days', 7))
         start_date = timezone.now() - timedelta(days=days)
-        queryset = queryset.filter(timestamp__gte=start_date)
+        rollups = rollups_for_range(project_ids, start_date)
         
-        summary = queryset.aggregate(
-            avg_render_time=Avg('render_time'),
-            avg_memory_usage=Avg('memory_usage'),
-            avg_bundle_size=Avg('bundle_size'),
-            total_metrics=Count('metric_id')
-        )
+        project_id = request.query_params.get('project_id')
+        if project_id:
+            rollups = rollups.filter(project_id=project_id)
+        
+        component_path = request.query_params.get('component_path')
+        if component_path:
+            rollups = rollups.filter(component_path__icontains=component_path)
+        
+        stats = summarize(rollups, ('render_time', 'memory_usage', 'bundle_size'))
+        summary = {
+            'avg_render_time': stats['render_time']['mean'],
+            'avg_memory_usage': stats['memory_usage']['mean'],
+            'avg_bundle_size': stats['bundle_size']['mean'],
+            'total_metrics': stats['render_time']['count']
+        }
         
         return Response(summary)
 
+    @action(detail=False, methods=['post'], url_path='batch', permission_classes=[permissions.AllowAny])
+    def batch(self, request):
+        """Ingest a batch of metric samples for one project with a single bulk insert"""
+        config = getattr(settings, 'METRICS_INGEST', {})
+        max_rows = config.get('MAX_BATCH_ROWS', 5000)
+
+        try:
+            samples, envelope = decode_batch_payload(
+                request.body,
+                content_type=request.content_type,
+                content_encoding=request.headers.get('Content-Encoding', ''),
+                max_bytes=config.get('MAX_BATCH_BYTES', 10 * 1024 * 1024)
+            )
+        except BatchPayloadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(samples) > max_rows:
+            return Response(
+                {'error': f'Batch exceeds {max_rows} samples'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        project_id = (
+            envelope.get('project_id')
+            or request.query_params.get('project_id')
+            or request.headers.get('X-Project-ID')
+        )
+        project_id, error_response = self._resolve_ingest_project(request, project_id)
+        if error_response:
+            return error_response
+
+        rows, errors = validate_samples(project_id, samples)
+        write_metrics(rows)
+
+        return Response({
+            'project_id': project_id,
+            'accepted': len(rows),
+            'rejected': len(errors),
+            'errors': errors[:100]
+        }, status=status.HTTP_201_CREATED if rows else status.HTTP_400_BAD_REQUEST)
+
+    def _resolve_ingest_project(self, request, project_id):
+        """Resolve the target project from an SDK API key or the authenticated user"""
+        project_id = str(project_id) if project_id else None
+        api_key = request.headers.get('X-API-Key')
+        if api_key:
+            key_info = api_key_cache.get(api_key)
+            if not key_info:
+                return None, Response({'error': 'Invalid API key'}, status=status.HTTP_401_UNAUTHORIZED)
+            key_project_id = key_info['project_id']
+            if project_id and project_id != key_project_id:
+                return None, Response(
+                    {'error': 'API key is not valid for this project'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            project_id = key_project_id
+            if project_cache.get(project_id) is None:
+                return None, Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+            return project_id, None
+
+        user = request.user
+        if not user or not user.is_authenticated:
+            return None, Response(
+                {'error': 'Authentication credentials were not provided'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        if not project_id:
+            return None, Response({'error': 'project_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not Project.objects.filter(
+            Q(created_by=user) | Q(team_members=user), project_id=project_id
+        ).exists():
+            return None, Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+        return project_id, None
+
 
 class ComponentAnalysisViewSet(viewsets.ModelViewSet):
     serializer_class = ComponentAnalysisSerializer
@@ -320,9 +441,14 @@ class ComponentAnalysisViewSet(viewsets.ModelViewSet):
             Q(created_by=user) | Q(team_members=user)
         ).values_list('project_id', flat=True)
         
-        return ComponentAnalysis.objects.filter(
+        queryset = ComponentAnalysis.objects.filter(
             project_id__in=project_ids
         ).select_related('project').order_by('-performance_score')
+        
+        # Components no longer found by an incremental analysis are hidden unless asked for
+        if self.request.query_params.get('include_removed', '').lower() not in ('1', 'true'):
+            queryset = queryset.filter(removed_at__isnull=True)
+        return queryset
 
     @action(detail=False, methods=['get'])
     def bottlenecks(self, request):
@@ -420,12 +546,12 @@ class PerformanceAlertViewSet(viewsets.ModelViewSet):
         
         queryset = PerformanceAlerts.objects.filter(
             project_id__in=project_ids
-        ).select_related('project', 'resolved_by')
+        ).select_related('project')
         
         # Filter by resolved status
         resolved = self.request.query_params.get('resolved')
         if resolved is not None:
-            queryset = queryset.filter(resolved=resolved.lower() == 'true')
+            queryset = queryset.filter(is_resolved=resolved.lower() == 'true')
         
         return queryset.order_by('-created_at')
 
@@ -433,10 +559,11 @@ class PerformanceAlertViewSet(viewsets.ModelViewSet):
     def resolve(self, request, pk=None):
         """Resolve a performance alert"""
         alert = self.get_object()
-        alert.resolved = True
+        alert.is_resolved = True
         alert.resolved_at = timezone.now()
-        alert.resolved_by = request.user
-        alert.save()
+        alert.save(update_fields=['is_resolved', 'resolved_at'])
+        # Keep the alert engine from updating the resolved row, and hold off reopening it
+        alert_tracker.forget(alert, alert.resolved_at)
         
         serializer = self.get_serializer(alert)
         return Response(serializer.data)
@@ -486,34 +613,19 @@ def get_analytics(request):
     if project_filter != 'all':
         projects = projects.filter(project_id=project_filter)
     
-    # Get metrics for the time range
-    metrics = PerformanceMetrics.objects.filter(
-        project__in=projects,
-        timestamp__gte=start_date
-    ).select_related('project')
-    
-    # Calculate performance trends
-    current_period_end = timezone.now()
-    current_period_start = start_date
+    # Aggregate from rollups instead of scanning raw metrics
     previous_period_start = start_date - timedelta(days=days)
-    previous_period_end = start_date
+    current_rollups = rollups_for_range(projects, start_date)
+    previous_rollups = rollups_for_range(projects, previous_period_start, start_date)
     
-    current_metrics = metrics.filter(timestamp__gte=current_period_start)
-    previous_metrics = PerformanceMetrics.objects.filter(
-        project__in=projects,
-        timestamp__gte=previous_period_start,
-        timestamp__lt=previous_period_end
-    )
+    current_stats = summarize(current_rollups, ('lcp', 'fid', 'cls', 'render_time'))
+    previous_stats = summarize(previous_rollups, ('lcp', 'fid', 'cls'))
+    current_percentiles = percentiles(current_rollups)
     
     # Calculate Core Web Vitals trends
-    def calculate_cwv_trend(current_queryset, previous_queryset, metric_name):
-        current_avg = current_queryset.aggregate(
-            avg=Avg(f'core_web_vitals__{metric_name}')
-        )['avg'] or 0
-        
-        previous_avg = previous_queryset.aggregate(
-            avg=Avg(f'core_web_vitals__{metric_name}')
-        )['avg'] or 0
+    def calculate_cwv_trend(metric_name):
+        current_avg = current_stats[metric_name]['mean'] or 0
+        previous_avg = previous_stats[metric_name]['mean'] or 0
         
         # Determine trend direction based on whether lower is better
         is_lower_better = metric_name != 'cls'  # CLS can be higher for good UX
@@ -527,31 +639,35 @@ def get_analytics(request):
         return {
             'current': round(current_avg, 2),
             'previous': round(previous_avg, 2),
+            'p75': current_percentiles[metric_name]['p75'],
             'trend': trend_direction
         }
     
     performance_trends = {
-        'lcp': calculate_cwv_trend(current_metrics, previous_metrics, 'lcp'),
-        'fid': calculate_cwv_trend(current_metrics, previous_metrics, 'fid'),
-        'cls': calculate_cwv_trend(current_metrics, previous_metrics, 'cls')
+        'lcp': calculate_cwv_trend('lcp'),
+        'fid': calculate_cwv_trend('fid'),
+        'cls': calculate_cwv_trend('cls')
     }
     
     # User metrics - calculate from actual metrics data
-    total_metrics_count = metrics.count()
+    total_metrics_count = current_stats['render_time']['count']
     
     # Estimate sessions based on unique timestamps per day (rough approximation)
-    unique_days = metrics.dates('timestamp', 'day').count()
+    unique_days = MetricRollup.objects.filter(
+        project__in=projects,
+        granularity='day',
+        metric='render_time',
+        bucket_start__gte=truncate(start_date, 'day')
+    ).values('bucket_start').distinct().count()
     avg_metrics_per_day = total_metrics_count / max(unique_days, 1)
     estimated_sessions = max(int(avg_metrics_per_day * 0.8), 1)  # 80% of metrics are user sessions
     
     # Calculate bounce rate from component diversity
-    unique_components = metrics.values('component_path').distinct().count()
+    unique_components = current_rollups.values('component_path').distinct().count()
     bounce_rate = min(100, max(0, 100 - (unique_components * 2)))  # Rough calculation
     
     # Average session duration (estimate from render times)
-    avg_session_duration = current_metrics.aggregate(
-        avg_duration=Avg('render_time')
-    )['avg_duration'] or 0
+    avg_session_duration = current_stats['render_time']['mean'] or 0
     
     user_metrics = {
         'total_sessions': estimated_sessions,
@@ -603,11 +719,9 @@ def get_analytics(request):
             impact = 'low'
         
         # Count affected pages (rough estimate)
-        affected_count = PerformanceMetrics.objects.filter(
-            project__in=projects,
-            timestamp__gte=start_date,
-            component_path__icontains=alert.component_path or ''
-        ).count() if alert.component_path else total_metrics_count
+        affected_count = sample_count(
+            current_rollups.filter(component_path__icontains=alert.component_path)
+        ) if alert.component_path else total_metrics_count
         
         top_issues.append({
             'id': str(alert.alert_id),
@@ -619,6 +733,7 @@ def get_analytics(request):
     
     return Response({
         'performance_trends': performance_trends,
+        'percentiles': current_percentiles,
         'user_metrics': user_metrics,
         'optimization_impact': optimization_impact,
         'top_issues': top_issues,
@@ -0,0 +1,181 @@
+"""
+Shared analytics computation for AnalyticsConsumer.
+
+Open analytics sockets used to run their own 30 second polling loop each, so
+the database did one aggregate scan per tab. ``analytics_ticker`` instead
+recomputes the 7-day aggregates of every subscribed project once per
+``REALTIME['ANALYTICS_INTERVAL']`` seconds (two grouped queries, however many
+sockets are open), caches them per project, and pushes each socket the
+combination of its own projects.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from real_time.broadcast import encode_message
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_METRICS = ('lcp', 'fid', 'cls', 'render_time')
+ANALYTICS_WINDOW = timedelta(days=7)
+
+
+def compute_project_analytics(project_ids):
+    """``{project_id: {'metrics': {metric: (count, total)}, 'active_alerts': n}}`` over the analytics window"""
+    from perfmaster.models import PerformanceAlerts  # Import inside function
+    from perfmaster.rollups import rollups_for_range
+
+    results = {project_id: {'metrics': {}, 'active_alerts': 0} for project_id in project_ids}
+    if not results:
+        return results
+
+    rows = rollups_for_range(list(results), timezone.now() - ANALYTICS_WINDOW).filter(
+        metric__in=ANALYTICS_METRICS
+    ).values('project_id', 'metric').annotate(
+        sum_count=Sum('count'),
+        sum_total=Sum('total'),
+    ).order_by()
+    for row in rows:
+        results[row['project_id']]['metrics'][row['metric']] = (row['sum_count'] or 0, row['sum_total'] or 0.0)
+
+    alerts = PerformanceAlerts.objects.filter(
+        project_id__in=list(results),
+        is_resolved=False
+    ).values('project_id').annotate(total=Count('alert_id')).order_by()
+    for row in alerts:
+        results[row['project_id']]['active_alerts'] = row['total']
+
+    return results
+
+
+def combine_project_analytics(project_stats):
+    """Merge per-project aggregates into the payload sent to one analytics socket"""
+    totals = {metric: [0, 0.0] for metric in ANALYTICS_METRICS}
+    active_alerts = 0
+    for stats in project_stats:
+        active_alerts += stats['active_alerts']
+        for metric, (count, total) in stats['metrics'].items():
+            totals[metric][0] += count
+            totals[metric][1] += total
+
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'metrics_count': totals['render_time'][0],
+        'active_alerts': active_alerts,
+        'average_performance': {
+            metric: round(total / count, 2) if count else 0
+            for metric, (count, total) in totals.items()
+        },
+        'projects_active': len(project_stats)
+    }
+
+
+class AnalyticsTicker:
+    """Process-wide analytics loop shared by every AnalyticsConsumer"""
+
+    def __init__(self, interval=30):
+        self.interval = interval
+        self._subscribers = {}
+        self._cache = {}
+        self._task = None
+        self.counters = {
+            'ticks': 0,
+            'failed_ticks': 0,
+            'projects_computed': 0,
+            'messages_sent': 0,
+        }
+
+    def subscribe(self, consumer, project_ids):
+        """Push analytics for ``project_ids`` to ``consumer.push_analytics`` on every tick"""
+        self._subscribers[consumer] = frozenset(project_ids)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self, consumer):
+        self._subscribers.pop(consumer, None)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {**self.counters, 'subscribers': len(self._subscribers), 'cached_projects': len(self._cache)}
+
+    async def _compute(self, project_ids):
+        results = await database_sync_to_async(compute_project_analytics)(project_ids)
+        computed_at = time.monotonic()
+        for project_id, stats in results.items():
+            self._cache[project_id] = (computed_at, stats)
+        self.counters['projects_computed'] += len(results)
+        return results
+
+    async def snapshot(self, project_ids):
+        """Analytics for a set of projects, served from the cache when it is fresh"""
+        now = time.monotonic()
+        stale = [
+            project_id for project_id in project_ids
+            if project_id not in self._cache or now - self._cache[project_id][0] > self.interval
+        ]
+        if stale:
+            await self._compute(stale)
+
+        # A tick running during the await may have evicted projects nobody else watches
+        stats = {}
+        missing = []
+        for project_id in project_ids:
+            cached = self._cache.get(project_id)
+            if cached is None:
+                missing.append(project_id)
+            else:
+                stats[project_id] = cached[1]
+        if missing:
+            stats.update(await self._compute(missing))
+        return combine_project_analytics([stats[project_id] for project_id in project_ids])
+
+    async def tick(self):
+        """Recompute every subscribed project once and fan the results out"""
+        subscribers = list(self._subscribers.items())
+        if not subscribers:
+            return
+
+        project_ids = set().union(*(ids for _, ids in subscribers))
+        await self._compute(project_ids)
+        # Forget projects nobody is watching any more
+        for project_id in set(self._cache) - project_ids:
+            del self._cache[project_id]
+
+        # Sockets watching the same set of projects share one encoded message
+        messages = {}
+        sends = []
+        for consumer, ids in subscribers:
+            if ids not in messages:
+                messages[ids] = encode_message({
+                    'type': 'analytics_update',
+                    'data': combine_project_analytics([self._cache[project_id][1] for project_id in ids])
+                })
+            sends.append(consumer.push_analytics(messages[ids]))
+
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        self.counters['ticks'] += 1
+        self.counters['messages_sent'] += sum(1 for result in results if not isinstance(result, Exception))
+
+    async def _run(self):
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                self.counters['failed_ticks'] += 1
+                logger.error(f"Analytics tick failed: {e}")
+
+
+def analytics_interval():
+    return getattr(settings, 'REALTIME', {}).get('ANALYTICS_INTERVAL', 30)
+
+
+analytics_ticker = AnalyticsTicker(interval=analytics_interval())
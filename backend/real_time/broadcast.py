@@ -0,0 +1,73 @@
+"""
+Encode-once broadcasting for channel layer groups.
+
+A ``group_send`` reaches every consumer in the room, so encoding the payload
+inside each consumer's handler costs one ``json.dumps`` per socket.
+``broadcast_event`` encodes the outgoing WebSocket frame once, before the
+``group_send``, and handlers forward ``event['text']`` unchanged. orjson is
+used for the encoding when it is installed.
+
+Sockets that filter or downsample a performance room need the decoded payload
+instead of the frame. They listen on the room's companion ``filtered_group``,
+and ``room_broadcast`` sends the encoded frame to the room and the raw
+``data`` to the companion group, so no event carries both.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+
+def _default(value):
+    # Same fallback for both encoders: datetimes, UUIDs, Decimals, ...
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_message(payload):
+    """Encode a WebSocket frame to text"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(payload, default=_default)
+
+
+def broadcast_event(handler, payload, **extra):
+    """
+    Build a channel layer event for ``handler`` that carries ``payload`` already
+    encoded as ``text``. Extra keys are passed through to the handler.
+    """
+    return {'type': handler, 'text': encode_message(payload), **extra}
+
+
+def event_text(event, message_type, *keys):
+    """
+    Pre-encoded frame of an event, or an encoding of ``message_type`` plus
+    ``keys`` for events sent without one
+    """
+    text = event.get('text')
+    if text is None:
+        text = encode_message({'type': message_type, **{key: event.get(key) for key in keys}})
+    return text
+
+
+def filtered_group(group):
+    """Companion of ``group`` joined by sockets that filter or downsample its events"""
+    return f'{group}.filtered'
+
+
+def room_events(handler, message_type, data):
+    """``(text_event, data_event)`` for a room and its filtered companion group"""
+    return (
+        broadcast_event(handler, {'type': message_type, 'data': data}),
+        {'type': handler, 'data': data},
+    )
+
+
+async def room_broadcast(channel_layer, group, events):
+    """Send the events built by ``room_events`` to ``group`` and its filtered companion group"""
+    text_event, data_event = events
+    await channel_layer.group_send(group, text_event)
+    await channel_layer.group_send(filtered_group(group), data_event)
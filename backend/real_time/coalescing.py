@@ -0,0 +1,141 @@
+"""
+Per-room coalescing of inbound performance updates.
+
+A page emitting dozens of samples per second used to trigger one
+``group_send`` per sample. ``broadcast_coalescer`` collects the samples of a
+room for ``REALTIME['BROADCAST_WINDOW_MS']`` (overridable per project with
+``performance_config['broadcast_window_ms']``) and broadcasts one
+``performance_summary`` frame per window: count/mean/max per component and
+metric, with the latest value added for gauges. A window that saw a single
+sample is forwarded as the usual raw ``performance_update``.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+from perfmaster.lookups import project_cache
+from real_time.broadcast import room_broadcast, room_events
+from real_time.subscriptions import sample_values
+
+logger = logging.getLogger(__name__)
+
+# Metrics that describe a current level rather than an event; summaries also carry the latest value
+GAUGE_METRICS = ('memory_usage', 'bundle_size', 'dom_nodes')
+MAX_WINDOW_MS = 10000
+
+
+def raw_update_events(data):
+    return room_events('performance_metrics', 'performance_update', data)
+
+
+class CoalescingWindow:
+    """Running aggregate of the samples a room received during one window"""
+
+    def __init__(self, window_ms):
+        self.window_ms = window_ms
+        self.first = None
+        self.count = 0
+        self.components = {}
+
+    def add(self, sample):
+        if self.first is None:
+            self.first = sample
+        self.count += 1
+        component = self.components.setdefault(sample.get('component_path') or 'unknown', {})
+        for metric, value in sample_values(sample):
+            aggregate = component.get(metric)
+            if aggregate is None:
+                component[metric] = [1, value, value, value]
+            else:
+                aggregate[0] += 1
+                aggregate[1] += value
+                aggregate[2] = max(aggregate[2], value)
+                aggregate[3] = value
+
+    def summary(self):
+        components = {}
+        for component_path, metrics in self.components.items():
+            components[component_path] = {}
+            for metric, (count, total, maximum, last) in metrics.items():
+                stats = components[component_path][metric] = {'count': count, 'mean': total / count, 'max': maximum}
+                if metric in GAUGE_METRICS:
+                    stats['last'] = last
+        return {
+            'window_ms': self.window_ms,
+            'samples': self.count,
+            'components': components,
+        }
+
+    def events(self):
+        if self.count == 1:
+            return raw_update_events(self.first)
+        return room_events('performance_summary', 'performance_summary', self.summary())
+
+
+class BroadcastCoalescer:
+    """Process-wide coalescer for every performance room served by this process"""
+
+    def __init__(self, default_window_ms=200):
+        self.default_window_ms = default_window_ms
+        self._windows = {}
+        # The event loop only keeps weak references to tasks
+        self._flush_tasks = set()
+        self.counters = {
+            'received': 0,
+            'broadcasts': 0,
+            'summaries': 0,
+            'failed_broadcasts': 0,
+        }
+
+    def stats(self):
+        return {**self.counters, 'open_windows': len(self._windows)}
+
+    def _project_window_ms(self, project):
+        config = (project or {}).get('performance_config') or {}
+        try:
+            window_ms = int(config.get('broadcast_window_ms', self.default_window_ms))
+        except (TypeError, ValueError):
+            window_ms = self.default_window_ms
+        return min(max(window_ms, 0), MAX_WINDOW_MS)
+
+    async def window_ms(self, project_id):
+        """Coalescing window of a project, from the shared project lookup cache"""
+        return self._project_window_ms(await project_cache.aget(project_id))
+
+    async def submit(self, channel_layer, room, project_id, data):
+        """Queue one inbound sample for the room's next broadcast"""
+        self.counters['received'] += 1
+        window_ms = await self.window_ms(project_id)
+        if not window_ms:
+            await self._send(channel_layer, room, raw_update_events(data))
+            return
+
+        window = self._windows.get(room)
+        if window is None:
+            window = self._windows[room] = CoalescingWindow(window_ms)
+            task = asyncio.get_running_loop().create_task(self._flush_later(channel_layer, room, window))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        window.add(data)
+
+    async def _flush_later(self, channel_layer, room, window):
+        await asyncio.sleep(window.window_ms / 1000)
+        if self._windows.get(room) is window:
+            del self._windows[room]
+        if window.count > 1:
+            self.counters['summaries'] += 1
+        await self._send(channel_layer, room, window.events())
+
+    async def _send(self, channel_layer, room, events):
+        try:
+            await room_broadcast(channel_layer, room, events)
+            self.counters['broadcasts'] += 1
+        except Exception as e:
+            self.counters['failed_broadcasts'] += 1
+            logger.error(f"Failed to broadcast to {room}: {e}")
+
+
+broadcast_coalescer = BroadcastCoalescer(
+    default_window_ms=getattr(settings, 'REALTIME', {}).get('BROADCAST_WINDOW_MS', 200)
+)
@@ -1,7 +1,14 @@
-import json
 import asyncio
+import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from ai_engine.ai_analyzer import ai_analyzer
+from perfmaster.ingest import metric_ingest_buffer
+from perfmaster.lookups import project_cache
+from real_time.analytics import analytics_ticker
+from real_time.broadcast import broadcast_event, encode_message, event_text, filtered_group
+from real_time.coalescing import broadcast_coalescer
+from real_time.subscriptions import Downsampler, MetricSubscription, SubscriptionError
 # Remove these imports from module level:
 # from django.contrib.auth.models import User
 # from perfmaster.models import Project, PerformanceMetrics, PerformanceAlerts
@@ -11,6 +18,9 @@ class PerformanceMonitorConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.project_id = self.scope['url_route']['kwargs']['project_id']
         self.room_group_name = f'performance_{self.project_id}'
+        self.subscription = MetricSubscription()
+        self.downsampler = None
+        self.downsample_task = None
         
         # NO AUTHENTICATION REQUIRED - Accept all connections
         # Join room group directly
@@ -25,12 +35,20 @@ class PerformanceMonitorConsumer(AsyncWebsocketConsumer):
         await self.send_initial_data()
 
     async def disconnect(self, close_code):
+        self.stop_downsampling()
+        
         # Leave room group
         await self.channel_layer.group_discard(
-            self.room_group_name,
+            self.event_group(),
             self.channel_name
         )
 
+    def event_group(self):
+        """Room group for the current subscription; filtering sockets get decoded events"""
+        if self.subscription.filters_events:
+            return filtered_group(self.room_group_name)
+        return self.room_group_name
+
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
@@ -42,6 +60,8 @@ class PerformanceMonitorConsumer(AsyncWebsocketConsumer):
                 await self.handle_performance_update(data)
             elif message_type == 'request_snapshot':
                 await self.handle_snapshot_request(data)
+            elif message_type == 'analyze_metrics':
+                await self.handle_analysis_request(data)
             
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -50,34 +70,60 @@ class PerformanceMonitorConsumer(AsyncWebsocketConsumer):
             }))
 
     async def handle_metrics_subscription(self, data):
-        """Handle subscription to specific metrics"""
-        metrics_types = data.get('metrics', ['all'])
+        """Handle subscription to specific metrics, components, alert severities and downsampling"""
+        try:
+            subscription = MetricSubscription.from_message(data)
+        except SubscriptionError as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': f'Invalid subscription: {str(e)}'
+            }))
+            return
         
-        # Store subscription preferences
-        self.subscribed_metrics = metrics_types
+        # Store subscription preferences; filters are applied in the room handlers
+        previous_group = self.event_group()
+        self.subscription = subscription
+        if self.event_group() != previous_group:
+            await self.channel_layer.group_add(self.event_group(), self.channel_name)
+            await self.channel_layer.group_discard(previous_group, self.channel_name)
+        self.stop_downsampling()
+        if subscription.downsample_ms:
+            self.downsampler = Downsampler(subscription.downsample_ms)
+            self.downsample_task = asyncio.create_task(self.send_downsampled())
         
         await self.send(text_data=json.dumps({
             'type': 'subscription_confirmed',
-            'metrics': metrics_types
+            **subscription.describe()
         }))
 
+    def stop_downsampling(self):
+        if self.downsample_task is not None:
+            self.downsample_task.cancel()
+        self.downsample_task = None
+        self.downsampler = None
+
+    async def send_downsampled(self):
+        """Send one aggregated frame per interval while the socket is downsampled"""
+        downsampler = self.downsampler
+        while True:
+            try:
+                await asyncio.sleep(downsampler.interval)
+                frame = downsampler.drain()
+                if frame:
+                    await self.send(text_data=encode_message(frame))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error sending downsampled metrics: {e}")
+
     async def handle_performance_update(self, data):
         """Handle incoming performance data"""
         try:
             # Save performance metrics to database
             await self.save_performance_metrics(data)
             
-            # Broadcast to all subscribers in the room
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'performance_metrics',
-                    'data': data
-                }
-            )
-            
-            # Check for performance alerts
-            await self.check_performance_alerts(data)
+            # Broadcast to all subscribers in the room, coalesced per window
+            await broadcast_coalescer.submit(self.channel_layer, self.room_group_name, self.project_id, data)
             
         except Exception as e:
             await self.send(text_data=json.dumps({
@@ -101,27 +147,81 @@ class PerformanceMonitorConsumer(AsyncWebsocketConsumer):
                 'message': f'Failed to get snapshot: {str(e)}'
             }))
 
+    async def handle_analysis_request(self, data):
+        """Run the performance models over one metrics sample in the inference pool"""
+        metrics = data.get('metrics')
+        if not isinstance(metrics, dict):
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'analyze_metrics needs a metrics object'
+            }))
+            return
+        
+        result = await ai_analyzer.analyze_performance_metrics({**metrics, 'project_id': self.project_id})
+        await self.send(text_data=encode_message({
+            'type': 'analysis_result',
+            'request_id': data.get('request_id'),
+            'data': result
+        }))
+
     # WebSocket message handlers
     async def performance_metrics(self, event):
         """Send performance metrics to WebSocket"""
-        await self.send(text_data=json.dumps({
+        if self.subscription.passthrough or 'data' not in event:
+            await self.send(text_data=event_text(event, 'performance_update', 'data'))
+            return
+        
+        sample = self.subscription.filter_sample(event['data'])
+        if sample is None:
+            return
+        if self.downsampler is not None:
+            self.downsampler.add(sample)
+            return
+        await self.send(text_data=encode_message({
             'type': 'performance_update',
-            'data': event['data']
+            'data': sample
+        }))
+
+    async def performance_summary(self, event):
+        """Send a coalesced window of performance metrics to WebSocket"""
+        if self.subscription.passthrough or 'data' not in event:
+            await self.send(text_data=event_text(event, 'performance_summary', 'data'))
+            return
+        
+        summary = self.subscription.filter_summary(event['data'])
+        if summary is None:
+            return
+        if self.downsampler is not None:
+            self.downsampler.add_summary(summary)
+            return
+        await self.send(text_data=encode_message({
+            'type': 'performance_summary',
+            'data': summary
         }))
 
     async def performance_alert(self, event):
         """Send performance alert to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'alert',
-            'data': event['data']
+        if not self.subscription.accepts_alert(event.get('data') or {}):
+            return
+        await self.send(text_data=event_text(event, 'alert', 'data'))
+
+    async def anomaly_scores(self, event):
+        """Send streaming anomaly scores to WebSocket"""
+        if self.subscription.passthrough or 'data' not in event:
+            await self.send(text_data=event_text(event, 'anomaly_scores', 'data'))
+            return
+        
+        data = self.subscription.filter_scores(event['data'])
+        if data is None:
+            return
+        await self.send(text_data=encode_message({
+            'type': 'anomaly_scores',
+            'data': data
         }))
 
     async def analysis_complete(self, event):
         """Send analysis completion notification"""
-        await self.send(text_data=json.dumps({
-            'type': 'analysis_complete',
-            'data': event['data']
-        }))
+        await self.send(text_data=event_text(event, 'analysis_complete', 'data'))
 
     # Database operations - Import models inside methods
     @database_sync_to_async
@@ -134,76 +234,13 @@ class PerformanceMonitorConsumer(AsyncWebsocketConsumer):
         except Project.DoesNotExist:
             return False
 
-    @database_sync_to_async
-    def save_performance_metrics(self, data):
-        """Save performance metrics to database"""
-        from perfmaster.models import Project, PerformanceMetrics  # Import inside method
-        try:
-            project = Project.objects.get(project_id=self.project_id)
-            
-            PerformanceMetrics.objects.create(
-                project=project,
-                component_path=data.get('component_path', 'unknown'),
-                render_time=data.get('render_time', 0),
-                memory_usage=data.get('memory_usage', 0),
-                bundle_size=data.get('bundle_size', 0),
-                core_web_vitals=data.get('core_web_vitals', {}),
-                cpu_usage=data.get('cpu_usage', 0),
-                network_requests=data.get('network_requests', 0),
-                dom_nodes=data.get('dom_nodes', 0)
-            )
-            
-        except Exception as e:
-            print(f"Error saving metrics: {e}")
-
-    @database_sync_to_async
-    def check_performance_alerts(self, data):
-        """Check if performance data triggers any alerts"""
-        from perfmaster.models import Project, PerformanceAlerts  # Import inside method
-        try:
-            project = Project.objects.get(project_id=self.project_id)
-            alerts = []
-            
-            # Check render time threshold
-            if data.get('render_time', 0) > 100:  # 100ms threshold
-                alert = PerformanceAlerts.objects.create(
-                    project=project,
-                    alert_type='render_time_spike',
-                    severity='high' if data['render_time'] > 200 else 'medium',
-                    message=f"High render time detected: {data['render_time']}ms in {data.get('component_path', 'unknown')}",
-                    metadata={'render_time': data['render_time'], 'component': data.get('component_path')}
-                )
-                alerts.append(alert)
-            
-            # Check memory usage threshold
-            if data.get('memory_usage', 0) > 100:  # 100MB threshold
-                alert = PerformanceAlerts.objects.create(
-                    project=project,
-                    alert_type='memory_leak',
-                    severity='high' if data['memory_usage'] > 200 else 'medium',
-                    message=f"High memory usage detected: {data['memory_usage']}MB",
-                    metadata={'memory_usage': data['memory_usage']}
-                )
-                alerts.append(alert)
-            
-            # Broadcast alerts
-            for alert in alerts:
-                self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'performance_alert',
-                        'data': {
-                            'alert_id': str(alert.alert_id),
-                            'type': alert.alert_type,
-                            'severity': alert.severity,
-                            'message': alert.message,
-                            'timestamp': alert.created_at.isoformat()
-                        }
-                    }
-                )
-                
-        except Exception as e:
-            print(f"Error checking alerts: {e}")
+    async def save_performance_metrics(self, data):
+        """Queue performance metrics for the buffered bulk insert"""
+        if await project_cache.aget(self.project_id) is None:
+            print(f"Unknown project {self.project_id}, sample not stored")
+            return
+        if not metric_ingest_buffer.submit(self.project_id, data):
+            print(f"Metric buffer full, dropped sample for {self.project_id}")
 
     @database_sync_to_async
     def get_performance_snapshot(self):
@@ -295,11 +332,11 @@ class TeamCollaborationConsumer(AsyncWebsocketConsumer):
         from django.utils import timezone
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
+            broadcast_event('user_joined', {
                 'type': 'user_joined',
                 'user': 'Anonymous',
                 'timestamp': timezone.now().isoformat()
-            }
+            })
         )
 
     async def disconnect(self, close_code):
@@ -307,19 +344,25 @@ class TeamCollaborationConsumer(AsyncWebsocketConsumer):
         from django.utils import timezone
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
+            broadcast_event('user_left', {
                 'type': 'user_left',
                 'user': 'Anonymous',
                 'timestamp': timezone.now().isoformat()
-            }
+            })
         )
         
         # Leave room group
         await self.channel_layer.group_discard(
-            self.room_group_name,
+            self.event_group(),
             self.channel_name
         )
 
+    def event_group(self):
+        """Room group for the current subscription; filtering sockets get decoded events"""
+        if self.subscription.filters_events:
+            return filtered_group(self.room_group_name)
+        return self.room_group_name
+
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
@@ -343,12 +386,12 @@ class TeamCollaborationConsumer(AsyncWebsocketConsumer):
         from django.utils import timezone
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'optimization_update',
+            broadcast_event('optimization_update', {
+                'type': 'optimization_applied',
                 'user': 'Anonymous',
                 'data': data,
                 'timestamp': timezone.now().isoformat()
-            }
+            })
         )
 
     async def handle_analysis_sharing(self, data):
@@ -356,12 +399,12 @@ class TeamCollaborationConsumer(AsyncWebsocketConsumer):
         from django.utils import timezone
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
+            broadcast_event('analysis_shared', {
                 'type': 'analysis_shared',
                 'user': 'Anonymous',
                 'data': data,
                 'timestamp': timezone.now().isoformat()
-            }
+            })
         )
 
     async def handle_comment(self, data):
@@ -369,54 +412,30 @@ class TeamCollaborationConsumer(AsyncWebsocketConsumer):
         from django.utils import timezone
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'team_comment',
+            broadcast_event('team_comment', {
+                'type': 'comment',
                 'user': 'Anonymous',
                 'message': data.get('message', ''),
                 'context': data.get('context', {}),
                 'timestamp': timezone.now().isoformat()
-            }
+            })
         )
 
     # WebSocket message handlers
     async def user_joined(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'user_joined',
-            'user': event['user'],
-            'timestamp': event['timestamp']
-        }))
+        await self.send(text_data=event_text(event, 'user_joined', 'user', 'timestamp'))
 
     async def user_left(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'user_left',
-            'user': event['user'],
-            'timestamp': event['timestamp']
-        }))
+        await self.send(text_data=event_text(event, 'user_left', 'user', 'timestamp'))
 
     async def optimization_update(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'optimization_applied',
-            'user': event['user'],
-            'data': event['data'],
-            'timestamp': event['timestamp']
-        }))
+        await self.send(text_data=event_text(event, 'optimization_applied', 'user', 'data', 'timestamp'))
 
     async def analysis_shared(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'analysis_shared',
-            'user': event['user'],
-            'data': event['data'],
-            'timestamp': event['timestamp']
-        }))
+        await self.send(text_data=event_text(event, 'analysis_shared', 'user', 'data', 'timestamp'))
 
     async def team_comment(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'comment',
-            'user': event['user'],
-            'message': event['message'],
-            'context': event['context'],
-            'timestamp': event['timestamp']
-        }))
+        await self.send(text_data=event_text(event, 'comment', 'user', 'message', 'context', 'timestamp'))
 
     @database_sync_to_async
     def check_project_access(self, user, project_id):
@@ -441,6 +460,7 @@ class AnalyticsConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope.get('user')
         self.room_group_name = 'analytics_global'
+        self.project_ids = None
         
         # Join analytics room
         await self.channel_layer.group_add(
@@ -453,13 +473,13 @@ class AnalyticsConsumer(AsyncWebsocketConsumer):
         # Send initial analytics data
         await self.send_initial_analytics()
         
-        # Start periodic updates
-        self.update_task = asyncio.create_task(self.periodic_updates())
+        # Periodic updates come from the shared analytics ticker
+        if self.project_ids is not None:
+            analytics_ticker.subscribe(self, self.project_ids)
     
     async def disconnect(self, close_code):
         # Stop periodic updates
-        if hasattr(self, 'update_task'):
-            self.update_task.cancel()
+        analytics_ticker.unsubscribe(self)
         
         # Leave analytics room
         await self.channel_layer.group_discard(
@@ -495,20 +515,6 @@ class AnalyticsConsumer(AsyncWebsocketConsumer):
             'metrics': metrics_types
         }))
     
-    async def periodic_updates(self):
-        """Send periodic analytics updates every 30 seconds"""
-        while True:
-            try:
-                await asyncio.sleep(30)  # Update every 30 seconds
-                await self.send_analytics_update()
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                await self.send(text_data=json.dumps({
-                    'type': 'error',
-                    'message': f'Update failed: {str(e)}'
-                }))
-    
     async def send_initial_analytics(self):
         """Send initial analytics data"""
         try:
@@ -544,64 +550,34 @@ class AnalyticsConsumer(AsyncWebsocketConsumer):
     # WebSocket message handlers
     async def performance_alert(self, event):
         """Send performance alert notification"""
-        await self.send(text_data=json.dumps({
-            'type': 'alert',
-            'data': event['data']
-        }))
+        await self.send(text_data=event_text(event, 'alert', 'data'))
     
     async def optimization_update(self, event):
         """Send optimization update notification"""
-        await self.send(text_data=json.dumps({
-            'type': 'optimization_update',
-            'data': event['data']
-        }))
+        await self.send(text_data=event_text(event, 'optimization_update', 'data'))
+    
+    async def push_analytics(self, text):
+        """Send an analytics update encoded by the shared ticker"""
+        await self.send(text_data=text)
     
     @database_sync_to_async
-    def get_analytics_data(self):
-        """Get current analytics data"""
-        from perfmaster.models import Project, PerformanceMetrics, PerformanceAlerts
-        from django.db.models import Q, Avg, Count
-        from django.utils import timezone
-        from datetime import timedelta
+    def get_project_ids(self):
+        """Ids of the projects the user can see, or None for anonymous users"""
+        from perfmaster.models import Project  # Import inside method
+        from django.db.models import Q
         
         if not self.user or not self.user.is_authenticated:
-            return {'error': 'Authentication required'}
+            return None
         
-        # Get user's projects
-        projects = Project.objects.filter(
+        return list(Project.objects.filter(
             Q(created_by=self.user) | Q(team_members=self.user)
-        ).distinct()
-        
-        # Get recent metrics (last 7 days)
-        start_date = timezone.now() - timedelta(days=7)
-        metrics = PerformanceMetrics.objects.filter(
-            project__in=projects,
-            timestamp__gte=start_date
-        )
-        
-        # Calculate current averages
-        current_avg = metrics.aggregate(
-            avg_lcp=Avg('core_web_vitals__lcp'),
-            avg_fid=Avg('core_web_vitals__fid'),
-            avg_cls=Avg('core_web_vitals__cls'),
-            avg_render_time=Avg('render_time')
-        )
-        
-        # Get active alerts
-        active_alerts = PerformanceAlerts.objects.filter(
-            project__in=projects,
-            is_resolved=False
-        ).count()
+        ).distinct().values_list('project_id', flat=True))
+    
+    async def get_analytics_data(self):
+        """Get current analytics data from the shared per-project cache"""
+        if self.project_ids is None:
+            self.project_ids = await self.get_project_ids()
+        if self.project_ids is None:
+            return {'error': 'Authentication required'}
         
-        return {
-            'timestamp': timezone.now().isoformat(),
-            'metrics_count': metrics.count(),
-            'active_alerts': active_alerts,
-            'average_performance': {
-                'lcp': round(current_avg['avg_lcp'] or 0, 2),
-                'fid': round(current_avg['avg_fid'] or 0, 2),
-                'cls': round(current_avg['avg_cls'] or 0, 2),
-                'render_time': round(current_avg['avg_render_time'] or 0, 2)
-            },
-            'projects_active': projects.count()
-        }    
\ No newline at end of file
+        return await analytics_ticker.snapshot(self.project_ids)
@@ -0,0 +1,60 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from real_time import broadcast
+
+
+def sample_update(index):
+    return {
+        'type': 'performance_update',
+        'data': {
+            'component_path': f'src/components/Widget{index % 20}.tsx',
+            'render_time': 12.5 + index % 7,
+            'memory_usage': 48.25,
+            'bundle_size': 231.0,
+            'cpu_usage': 17.5,
+            'network_requests': 14,
+            'dom_nodes': 1820,
+            'core_web_vitals': {'lcp': 2140.0, 'fid': 8.4, 'cls': 0.04, 'fcp': 910.0, 'ttfb': 180.0},
+        }
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare per-consumer JSON encoding of broadcast frames with encoding once per group_send'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--room-sizes', type=int, nargs='+', default=[1, 10, 100, 500, 1000],
+            help='Number of sockets in the room'
+        )
+        parser.add_argument('--messages', type=int, default=200, help='Messages broadcast per room size')
+
+    def handle(self, *args, **options):
+        payloads = [sample_update(index) for index in range(options['messages'])]
+        encoder = 'orjson' if broadcast.orjson is not None else 'json'
+        self.stdout.write(f"{options['messages']} messages per room, encode-once encoder: {encoder}")
+        self.stdout.write(f"{'sockets':>8} {'per-consumer ms':>16} {'encode-once ms':>15} {'speedup':>8}")
+
+        for room_size in options['room_sizes']:
+            # Old path: every consumer's handler encodes the frame itself
+            start = time.perf_counter()
+            for payload in payloads:
+                for _ in range(room_size):
+                    json.dumps(payload)
+            per_consumer = time.perf_counter() - start
+
+            # New path: one encode per group_send, the text is forwarded as-is
+            start = time.perf_counter()
+            for payload in payloads:
+                event = broadcast.broadcast_event('performance_metrics', payload)
+                for _ in range(room_size):
+                    broadcast.event_text(event, 'performance_update', 'data')
+            encode_once = time.perf_counter() - start
+
+            self.stdout.write(
+                f'{room_size:>8} {per_consumer * 1000:>16.2f} {encode_once * 1000:>15.2f} '
+                f'{per_consumer / encode_once if encode_once else 0:>7.1f}x'
+            )
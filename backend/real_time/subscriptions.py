@@ -0,0 +1,208 @@
+"""
+Per-socket subscription filters for PerformanceMonitorConsumer.
+
+Sockets with the default subscription stay in the room group and forward its
+pre-encoded frames (``text``) unchanged. Sockets that asked for a subset
+(metric names, component_path prefixes, a minimum alert severity) move to the
+room's filtered group, which receives the decoded payload (``data``) instead,
+and are filtered before anything is encoded. Sockets that asked for a
+downsampled stream get one aggregated frame per component every
+``downsample_ms`` instead of every raw sample.
+"""
+
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+SAMPLE_METRICS = ('render_time', 'memory_usage', 'bundle_size', 'cpu_usage', 'network_requests', 'dom_nodes')
+# Keys that identify a sample and survive metric filtering
+IDENTITY_KEYS = ('component_path', 'timestamp', 'url', 'session_id')
+MIN_DOWNSAMPLE_MS = 100
+MAX_FILTER_VALUES = 50
+
+
+class SubscriptionError(ValueError):
+    """Raised when a subscribe_metrics message is malformed"""
+
+
+def _string_list(value, field):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise SubscriptionError(f'{field} must be a list of strings')
+    if len(value) > MAX_FILTER_VALUES:
+        raise SubscriptionError(f'{field} accepts at most {MAX_FILTER_VALUES} values')
+    return value
+
+
+def sample_values(sample):
+    """Yield ``(metric, value)`` for the numeric metrics of a raw sample, core web vitals included"""
+    for metric in SAMPLE_METRICS:
+        value = sample.get(metric)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield metric, value
+    core_web_vitals = sample.get('core_web_vitals')
+    if isinstance(core_web_vitals, dict):
+        for metric, value in core_web_vitals.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield metric, value
+
+
+class MetricSubscription:
+    """What one socket wants to receive from its project room"""
+
+    def __init__(self, metrics=None, components=None, min_severity=None, downsample_ms=None):
+        self.metrics = frozenset(metrics) if metrics else None
+        self.components = tuple(components) if components else None
+        self.min_severity = min_severity
+        self.downsample_ms = downsample_ms
+
+    @classmethod
+    def from_message(cls, data):
+        """Build a subscription from a ``subscribe_metrics`` message"""
+        metrics = _string_list(data.get('metrics', ['all']), 'metrics')
+        if 'all' in metrics:
+            metrics = []
+        components = _string_list(data.get('components'), 'components')
+
+        min_severity = data.get('min_severity')
+        if min_severity is not None and min_severity not in SEVERITY_RANK:
+            raise SubscriptionError(f"min_severity must be one of {', '.join(SEVERITY_RANK)}")
+
+        downsample_ms = data.get('downsample_ms')
+        if downsample_ms is not None:
+            if isinstance(downsample_ms, bool) or not isinstance(downsample_ms, (int, float)):
+                raise SubscriptionError('downsample_ms must be a number')
+            downsample_ms = max(int(downsample_ms), MIN_DOWNSAMPLE_MS) if downsample_ms > 0 else None
+
+        return cls(metrics, components, min_severity, downsample_ms)
+
+    @property
+    def passthrough(self):
+        """True when samples can be forwarded as the shared pre-encoded frame"""
+        return self.metrics is None and self.components is None and self.downsample_ms is None
+
+    @property
+    def filters_events(self):
+        """True when the socket needs decoded room events, i.e. belongs in the filtered group"""
+        return not self.passthrough or self.min_severity is not None
+
+    def describe(self):
+        return {
+            'metrics': sorted(self.metrics) if self.metrics else ['all'],
+            'components': list(self.components or []),
+            'min_severity': self.min_severity,
+            'downsample_ms': self.downsample_ms,
+        }
+
+    def accepts_component(self, component_path):
+        if self.components is None:
+            return True
+        return isinstance(component_path, str) and component_path.startswith(self.components)
+
+    def accepts_alert(self, alert):
+        """Alerts at or above ``min_severity`` for a subscribed component; project-wide alerts always match"""
+        component_path = alert.get('component_path')
+        if component_path is not None and not self.accepts_component(component_path):
+            return False
+        if self.min_severity is None:
+            return True
+        return SEVERITY_RANK.get(alert.get('severity'), 0) >= SEVERITY_RANK[self.min_severity]
+
+    def filter_scores(self, data):
+        """``anomaly_scores`` data reduced to subscribed metrics and components, or None"""
+        scores = [
+            score for score in data.get('scores', [])
+            if (self.metrics is None or score.get('metric') in self.metrics)
+            and self.accepts_component(score.get('component_path'))
+        ]
+        return {**data, 'scores': scores} if scores else None
+
+    def filter_sample(self, sample):
+        """The part of ``sample`` this socket subscribed to, or None if nothing matches"""
+        if not isinstance(sample, dict) or not self.accepts_component(sample.get('component_path')):
+            return None
+        if self.metrics is None:
+            return sample
+
+        filtered = {key: sample[key] for key in IDENTITY_KEYS if key in sample}
+        matched = False
+        for metric in SAMPLE_METRICS:
+            if metric in self.metrics and metric in sample:
+                filtered[metric] = sample[metric]
+                matched = True
+        core_web_vitals = sample.get('core_web_vitals')
+        if isinstance(core_web_vitals, dict):
+            vitals = {key: value for key, value in core_web_vitals.items() if key in self.metrics}
+            if vitals:
+                filtered['core_web_vitals'] = vitals
+                matched = True
+        return filtered if matched else None
+
+    def filter_summary(self, summary):
+        """The components and metrics of a coalesced summary this socket subscribed to, or None"""
+        if self.metrics is None and self.components is None:
+            return summary
+
+        components = {}
+        for component_path, metrics in summary.get('components', {}).items():
+            if not self.accepts_component(component_path):
+                continue
+            if self.metrics is not None:
+                metrics = {metric: stats for metric, stats in metrics.items() if metric in self.metrics}
+            if metrics:
+                components[component_path] = metrics
+        if not components:
+            return None
+        return {**summary, 'components': components}
+
+
+class Downsampler:
+    """Folds the samples a socket receives into one aggregate per component and metric"""
+
+    def __init__(self, interval_ms):
+        self.interval_ms = interval_ms
+        self._components = {}
+
+    @property
+    def interval(self):
+        return self.interval_ms / 1000
+
+    def _fold(self, component_path, metric, count, total, maximum, last):
+        component = self._components.setdefault(component_path or 'unknown', {})
+        aggregate = component.get(metric)
+        if aggregate is None:
+            component[metric] = [count, total, maximum, last]
+        else:
+            aggregate[0] += count
+            aggregate[1] += total
+            aggregate[2] = max(aggregate[2], maximum)
+            aggregate[3] = last
+
+    def add(self, sample):
+        for metric, value in sample_values(sample):
+            self._fold(sample.get('component_path'), metric, 1, value, value, value)
+
+    def add_summary(self, summary):
+        """Fold a coalesced ``performance_summary`` frame into the pending aggregate"""
+        for component_path, metrics in summary.get('components', {}).items():
+            for metric, stats in metrics.items():
+                count = stats['count']
+                mean = stats['mean']
+                self._fold(component_path, metric, count, mean * count, stats['max'], stats.get('last', mean))
+
+    def drain(self):
+        """The aggregated frame for everything added since the last drain, or None"""
+        if not self._components:
+            return None
+        components, self._components = self._components, {}
+        return {
+            'type': 'performance_downsampled',
+            'interval_ms': self.interval_ms,
+            'data': {
+                component_path: {
+                    metric: {'count': count, 'mean': total / count, 'max': maximum, 'last': last}
+                    for metric, (count, total, maximum, last) in metrics.items()
+                }
+                for component_path, metrics in components.items()
+            }
+        }
@@ -5,6 +5,12 @@ from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
 from perfmaster.models import Project, PerformanceMetrics, PerformanceAlerts
+from perfmaster.ingest import metric_ingest_buffer
+from perfmaster.alerts import alert_tracker
+from perfmaster.anomaly import anomaly_detector
+from perfmaster.lookups import lookup_stats
+from real_time.analytics import analytics_interval, analytics_ticker
+from real_time.coalescing import broadcast_coalescer
 
 
 @api_view(['GET'])
@@ -28,7 +34,7 @@ def realtime_status(request):
     
     active_alerts = PerformanceAlerts.objects.filter(
         project__in=projects,
-        resolved=False
+        is_resolved=False
     ).count()
     
     return Response({
@@ -36,6 +42,11 @@ def realtime_status(request):
         'projects_monitored': projects.count(),
         'recent_metrics': recent_metrics,
         'active_alerts': active_alerts,
+        'ingest': metric_ingest_buffer.stats(),
+        'broadcast': broadcast_coalescer.stats(),
+        'lookups': lookup_stats(),
+        'alerts': alert_tracker.stats(),
+        'anomaly': anomaly_detector.stats(),
         'websocket_endpoints': {
             'performance': '/ws/performance/{project_id}/',
             'team': '/ws/team/{project_id}/'
@@ -96,7 +107,8 @@ def get_analytics_realtime(request):
     return Response({
         'status': 'active',
         'websocket_endpoint': '/ws/analytics/',
-        'update_interval': 30,  # seconds
+        'update_interval': analytics_interval(),  # seconds
+        'ticker': analytics_ticker.stats(),
         'features': [
             'real_time_metrics',
             'live_alerts',
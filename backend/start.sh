@@ -6,6 +6,18 @@ python manage.py migrate --noinput
 # Collect static files
 python manage.py collectstatic --noinput --clear
 
-# Start both Celery and Gunicorn with ASGI support
-celery -A perfmaster worker --pool=solo --loglevel=info & 
+# One inference server per host; web and Celery processes send it their model requests (AI_INFERENCE_WORKERS processes)
+export AI_INFERENCE_SOCKET="${AI_INFERENCE_SOCKET:-/tmp/perfmaster-inference.sock}"
+python manage.py run_inference_server &
+
+# Start one Celery worker per queue (interactive, batch, maintenance) and Gunicorn with ASGI support.
+# Concurrency per queue: CELERY_INTERACTIVE_CONCURRENCY, CELERY_BATCH_CONCURRENCY, CELERY_MAINTENANCE_CONCURRENCY
+for queue in interactive batch maintenance; do
+    celery -A perfmaster worker -Q "$queue" -n "$queue@%h" --pool="${CELERY_POOL:-prefork}" --loglevel=info &
+done
+# Beat queues the periodic maintenance tasks (CELERY_BEAT_SCHEDULE: metrics retention, stale alerts).
+# Run it in exactly one container; set CELERY_BEAT=false on the others.
+if [ "${CELERY_BEAT:-true}" = "true" ]; then
+    celery -A perfmaster beat --schedule="${CELERY_BEAT_SCHEDULE_FILE:-/tmp/celerybeat-schedule}" --loglevel=info &
+fi
 gunicorn perfmaster.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:${PORT:-8000} --workers 3 --timeout 30
\ No newline at end of file